@@ -1,5 +1,14 @@
+import secrets
+
 import streamlit as st
 from utils.ai_agents import AfricanMusicAIAgent
+from utils.aws_utils import get_bedrock_client
+from utils.config import MARKETING_OPTIONS, METRICS_CONFIG
+from utils.document_analyzer import DocumentAnalyzer
+from utils.metrics import serve as serve_metrics
+from utils.response_cache import ResponseCache
+from utils.retrieval_index import get_retrieval_index
+from utils.session_store import get_session_store
 import logging
 
 # Configure logging
@@ -13,13 +22,53 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_shared_bedrock_client():
+    """One Bedrock runtime client for every browser session on this server."""
+    return get_bedrock_client("bedrock-runtime")
+
+@st.cache_resource
+def get_response_cache():
+    """Advice cache shared by all sessions and persisted under data/."""
+    return ResponseCache()
+
+@st.cache_resource
+def get_shared_retrieval_index():
+    """On-disk index of uploaded documents and market data used to ground answers."""
+    return get_retrieval_index()
+
+@st.cache_resource
+def get_document_analyzer():
+    """Extracts uploaded PDFs and indexes their text for the uploading session."""
+    return DocumentAnalyzer(retrieval_index=get_shared_retrieval_index())
+
+@st.cache_resource
+def get_shared_session_store():
+    """Conversation history kept outside the browser session, so it survives restarts."""
+    return get_session_store()
+
+@st.cache_resource
+def start_metrics_server():
+    """Expose /metrics once per server process when METRICS_CONFIG["port"] is set."""
+    if METRICS_CONFIG["enabled"] and METRICS_CONFIG["port"]:
+        return serve_metrics(METRICS_CONFIG["port"])
+
 def init_session_state():
     """Initialize session state variables."""
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        # Kept in the URL so a reload, restart or another replica resumes the same conversation.
+        # Anyone holding the URL can read and continue the conversation, so treat it like a
+        # password: the id is a 256-bit random token and sessions expire after SESSION_CONFIG's ttl.
+        session_id = st.query_params.get("session") or secrets.token_urlsafe(32)
+        st.query_params["session"] = session_id
+        st.session_state.session_id = session_id
     if "ai_agent" not in st.session_state:
         try:
-            st.session_state.ai_agent = AfricanMusicAIAgent()
+            st.session_state.ai_agent = AfricanMusicAIAgent(
+                get_shared_bedrock_client(), get_response_cache(),
+                retrieval_index=get_shared_retrieval_index(),
+                session_store=get_shared_session_store()
+            )
         except Exception as e:
             logger.error(f"Error initializing AI agent: {str(e)}")
             st.error("Failed to initialize AI assistant. Please try again later.")
@@ -29,17 +78,18 @@ def main():
     st.title("🎵 African Music Marketing Assistant")
     
     # Initialize session state
+    start_metrics_server()
     init_session_state()
     
     # Sidebar with context options
     with st.sidebar:
         st.header("Marketing Context")
         genre = st.selectbox("Music Genre", 
-            ["Afrobeats", "Amapiano", "Highlife", "Bongo Flava", "Other"])
+            MARKETING_OPTIONS["genres"])
         target_market = st.multiselect("Target Markets",
-            ["Nigeria", "South Africa", "Kenya", "Ghana", "Tanzania", "International"])
+            MARKETING_OPTIONS["target_markets"])
         budget = st.select_slider("Marketing Budget",
-            options=["Low", "Medium", "High"])
+            options=MARKETING_OPTIONS["budgets"])
         
         context = {
             "genre": genre,
@@ -47,30 +97,41 @@ def main():
             "budget": budget
         }
 
+        st.header("Reference Documents")
+        uploads = st.file_uploader("Ground advice in your own PDFs", type=["pdf"],
+            accept_multiple_files=True)
+        indexed = st.session_state.setdefault("indexed_uploads", set())
+        for upload in uploads or []:
+            if upload.file_id in indexed:
+                continue
+            # Indexed under this session only; other sessions never see the passages
+            result = get_document_analyzer().process_document(
+                upload, upload.name, fields=("text",), owner=st.session_state.session_id)
+            if result["status"] == "success":
+                indexed.add(upload.file_id)
+                st.caption(f"Indexed {upload.name}: {result['analysis']['summary']}")
+            else:
+                st.warning(result["message"])
+
     # Chat interface
-    for message in st.session_state.messages:
+    for message in get_shared_session_store().messages(st.session_state.session_id):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
     # Chat input
     if prompt := st.chat_input("Ask about African music marketing..."):
-        # Add user message
-        st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get AI response
+        # Stream AI response as it is generated
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = st.session_state.ai_agent.get_advice(prompt, context)
-                if response["status"] == "success":
-                    st.markdown(response["advice"])
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response["advice"]
-                    })
-                else:
-                    st.error(response["advice"])
+            try:
+                # The agent records the exchange in the session store once the answer completes
+                st.write_stream(
+                    st.session_state.ai_agent.stream_advice(prompt, context, st.session_state.session_id)
+                )
+            except Exception as e:
+                st.error(f"I'm currently experiencing technical difficulties: {str(e)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,29 @@
+import fitz
+import pytest
+
+
+def make_pdf(with_table: bool = True) -> bytes:
+    """One-page PDF with a paragraph and, optionally, a ruled 3x3 table"""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "Afrobeats streaming revenue grew strongly in Nigeria last year.")
+    if with_table:
+        rows = [["Platform", "Share", "Users"], ["Boomplay", "40%", "1.2M"], ["Spotify", "25%", "0.8M"]]
+        left, top, width, height = 72, 120, 120, 24
+        for i in range(len(rows) + 1):
+            y = top + i * height
+            page.draw_line((left, y), (left + 3 * width, y))
+        for j in range(4):
+            x = left + j * width
+            page.draw_line((x, top), (x, top + len(rows) * height))
+        for i, row in enumerate(rows):
+            for j, cell in enumerate(row):
+                page.insert_text((left + j * width + 6, top + i * height + 16), cell)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def table_pdf() -> bytes:
+    return make_pdf()
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from utils.ai_agents import AfricanMusicAIAgent
+from utils.llm_engine import LLMEngine
+from utils.resilience import ResilientCaller
+
+CONTEXT = {"genre": "Afrobeats", "target_markets": ["Nigeria"], "budget": "Low"}
+
+
+class StreamFailed(Exception):
+    pass
+
+
+class FakeBedrock:
+    """Local stand-in for the bedrock-runtime client's converse_stream"""
+
+    def __init__(self, deltas, usage=None, fail_after=None, delay=0.0):
+        self.deltas = deltas
+        self.usage = usage or {"inputTokens": 120, "outputTokens": 30}
+        self.fail_after = fail_after
+        self.delay = delay
+        self.requests = []
+
+    def _events(self):
+        yield {"messageStart": {"role": "assistant"}}
+        for i, text in enumerate(self.deltas):
+            if i == self.fail_after:
+                raise StreamFailed("connection reset mid-stream")
+            time.sleep(self.delay)
+            yield {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": text}}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {"usage": self.usage, "metrics": {"latencyMs": 5}}}
+
+    def converse_stream(self, **request):
+        self.requests.append(request)
+        return {"stream": self._events()}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return LLMEngine()
+
+
+def _agent(bedrock, engine):
+    return AfricanMusicAIAgent(bedrock, engine=engine,
+                               resilience=ResilientCaller(hedge=False, fallback_model_ids=[]))
+
+
+def test_stream_advice_yields_deltas_in_order_and_records_timings(engine):
+    bedrock = FakeBedrock(["Start ", "with ", "Boomplay ", "playlists."], delay=0.01)
+    agent = _agent(bedrock, engine)
+
+    deltas = list(agent.stream_advice("How do I launch in Lagos?", CONTEXT))
+
+    assert deltas == ["Start ", "with ", "Boomplay ", "playlists."]
+    metrics = agent.last_metrics
+    assert 0 < metrics["time_to_first_token"] <= metrics["total_latency"]
+    assert (metrics["input_tokens"], metrics["output_tokens"], metrics["cache_hit"]) == (120, 30, False)
+    assert bedrock.requests[0]["messages"][-1]["content"][0]["text"].endswith("How do I launch in Lagos?")
+
+
+def test_stream_advice_reraises_errors_mid_stream(engine):
+    agent = _agent(FakeBedrock(["Start ", "with ", "radio."], fail_after=2), engine)
+    received = []
+
+    with pytest.raises(StreamFailed):
+        for delta in agent.stream_advice("How do I launch in Accra?", CONTEXT):
+            received.append(delta)
+
+    assert received == ["Start ", "with "]
+    assert agent.last_metrics == {}
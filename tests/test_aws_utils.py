@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import aws_utils
+from utils.aws_utils import get_bedrock_client
+from utils.config import AWS_CONFIG
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(aws_utils, "_clients", {})
+    monkeypatch.setattr(aws_utils, "_sessions", {})
+
+
+def test_concurrent_callers_share_one_client():
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        clients = list(pool.map(lambda _: get_bedrock_client("bedrock-runtime", "us-east-1"), range(32)))
+
+    assert all(client is clients[0] for client in clients)
+    assert len(aws_utils._clients) == len(aws_utils._sessions) == 1
+    assert clients[0].meta.config.max_pool_connections == AWS_CONFIG["max_pool_connections"]
+
+
+def test_clients_are_keyed_on_service_region_and_credentials():
+    runtime = get_bedrock_client("bedrock-runtime", "us-east-1")
+
+    assert get_bedrock_client("bedrock-runtime", "eu-west-1") is not runtime
+    assert get_bedrock_client("bedrock", "us-east-1") is not runtime
+    assert get_bedrock_client("bedrock-runtime", "us-east-1", "AKIDEXAMPLE", "secret") is not runtime
+    # One boto3 session per set of credentials, shared by their clients
+    assert len(aws_utils._clients) == 4 and len(aws_utils._sessions) == 2
@@ -0,0 +1,135 @@
+import io
+import json
+import os
+
+from utils.batch_advice import AdviceJob, BedrockBatchBackend, run_batch
+from utils.prompt_templates import PromptAssembler, format_context
+
+JOB_ARN = "arn:aws:bedrock:us-east-1:123456789012:model-invocation-job/job123"
+CONTEXT = {"genre": "Afrobeats", "target_markets": ["Nigeria"], "budget": "Low"}
+
+
+class FakeS3:
+    """In-memory stand-in for the S3 calls BedrockBatchBackend makes"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def list_objects_v2(self, Bucket, Prefix):
+        return {"Contents": [{"Key": key} for bucket, key in self.objects
+                             if bucket == Bucket and key.startswith(Prefix)]}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+class FakeBedrock:
+    """Completes every submitted job at once, writing outputs for all records except ``drop``"""
+
+    def __init__(self, s3, drop=()):
+        self.s3 = s3
+        self.drop = set(drop)
+        self.submitted = []
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig):
+        self.submitted.append(jobName)
+        records = [json.loads(line) for line in
+                   self.s3.objects[("in-bucket", f"in/{jobName}.jsonl")].decode("utf-8").splitlines()]
+        complete(self.s3, [r["recordId"] for r in records if r["recordId"] not in self.drop], records)
+        return {"jobArn": JOB_ARN}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        return {"status": "Completed"}
+
+
+def complete(s3, keys, records=()):
+    """Write batch output lines for ``keys`` where Bedrock puts them"""
+    inputs = {record["recordId"]: record for record in records}
+    lines = [json.dumps({
+        "recordId": key,
+        "modelInput": inputs.get(key, {}).get("modelInput"),
+        "modelOutput": {"content": [{"type": "text", "text": f"advice for {key}"}],
+                        "usage": {"input_tokens": 100, "output_tokens": 20}}
+    }) for key in keys]
+    s3.put_object(Bucket="out-bucket", Key="out/job123/records.jsonl.out", Body="\n".join(lines).encode("utf-8"))
+
+
+def _backend(s3, bedrock):
+    return BedrockBatchBackend("s3://in-bucket/in", "s3://out-bucket/out", "arn:aws:iam::123456789012:role/batch",
+                               bedrock=bedrock, s3=s3, poll_interval=0)
+
+
+def _jobs():
+    return [AdviceJob("Plan a release in Lagos", CONTEXT),
+            AdviceJob("plan a release in lagos!", CONTEXT),
+            AdviceJob("Which playlists should I pitch?", CONTEXT)]
+
+
+def _results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_submits_one_record_per_unique_job(tmp_path):
+    s3 = FakeS3()
+    bedrock = FakeBedrock(s3)
+    output = str(tmp_path / "advice.jsonl")
+
+    summary = run_batch(_jobs(), output, _backend(s3, bedrock))
+
+    assert len(bedrock.submitted) == 1
+    records = [json.loads(line) for line in s3.objects[("in-bucket", f"in/{bedrock.submitted[0]}.jsonl")].splitlines()]
+    assert [r["recordId"] for r in records] == [_jobs()[0].key, _jobs()[2].key]
+    model_input = records[0]["modelInput"]
+    assert model_input["system"].endswith(format_context(CONTEXT))
+    assert model_input["messages"][0]["content"][0]["text"] == PromptAssembler().question_text("Plan a release in Lagos")
+    assert summary["succeeded"] == 2 and summary["duplicates"] == 1 and summary["failed"] == 0
+    assert {r["advice"] for r in _results(output)} == {f"advice for {r['recordId']}" for r in records}
+    assert not os.path.exists(f"{output}.batch_state.json")
+
+
+def test_resumes_a_submitted_job_without_resubmitting(tmp_path):
+    s3 = FakeS3()
+    bedrock = FakeBedrock(s3)
+    output = str(tmp_path / "advice.jsonl")
+    with open(f"{output}.batch_state.json", "w") as f:
+        json.dump({"job_arn": JOB_ARN}, f)
+    jobs = _jobs()
+    complete(s3, [jobs[0].key, jobs[2].key])
+
+    summary = run_batch(jobs, output, _backend(s3, bedrock))
+
+    assert bedrock.submitted == []
+    assert summary["succeeded"] == 2
+    assert not os.path.exists(f"{output}.batch_state.json")
+
+
+def test_records_missing_from_the_output_are_failures(tmp_path):
+    s3 = FakeS3()
+    jobs = _jobs()
+    output = str(tmp_path / "advice.jsonl")
+
+    summary = run_batch(jobs, output, _backend(s3, FakeBedrock(s3, drop=[jobs[2].key])))
+
+    assert summary["succeeded"] == 1 and summary["failed"] == 1
+    failed = [r for r in _results(output) if r["status"] == "error"]
+    assert [(r["key"], r["error"]) for r in failed] == [(jobs[2].key, "missing from batch output")]
+
+
+def test_jobs_already_done_are_not_submitted(tmp_path):
+    s3 = FakeS3()
+    bedrock = FakeBedrock(s3)
+    jobs = _jobs()
+    output = str(tmp_path / "advice.jsonl")
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"key": jobs[0].key, "status": "success", "advice": "earlier"}) + "\n")
+        f.write(json.dumps({"key": jobs[2].key, "status": "error", "error": "throttled"}) + "\n")
+
+    summary = run_batch(jobs, output, _backend(s3, bedrock))
+
+    records = s3.objects[("in-bucket", f"in/{bedrock.submitted[0]}.jsonl")].splitlines()
+    assert [json.loads(r)["recordId"] for r in records] == [jobs[2].key]
+    assert summary["already_done"] == 1 and summary["succeeded"] == 1
@@ -0,0 +1,83 @@
+import json
+import os
+
+from utils import batch_ingest
+from utils.batch_ingest import ingest_folder
+from tests.conftest import make_pdf
+
+
+def _write(folder, name, data: bytes):
+    path = folder / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def _records(output):
+    with open(output) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_duplicates_are_parsed_once_and_reruns_resume(tmp_path):
+    docs = tmp_path / "docs"
+    pdf = make_pdf()
+    _write(docs, "a.pdf", pdf)
+    _write(docs, "copy/a.pdf", pdf)
+    _write(docs, "b.pdf", make_pdf(with_table=False))
+    output = str(tmp_path / "out.jsonl")
+
+    first = ingest_folder(str(docs), output, workers=2)
+
+    assert (first["files"], first["duplicates"], first["skipped"], first["errors"]) == (2, 1, 0, 0)
+    assert first["pages"] == 2
+    assert sorted(os.path.basename(r["path"]) for r in _records(output)) == ["a.pdf", "b.pdf"]
+
+    _write(docs, "c.pdf", make_pdf(with_table=False) + b"\n% distinct copy\n")
+    second = ingest_folder(str(docs), output, workers=2)
+
+    assert (second["files"], second["skipped"], second["duplicates"]) == (1, 3, 0)
+    assert len(_records(output)) == 3
+
+
+def test_failed_files_are_reported_and_retried(tmp_path):
+    docs = tmp_path / "docs"
+    _write(docs, "good.pdf", make_pdf())
+    _write(docs, "broken.pdf", b"not a pdf")
+    output = str(tmp_path / "out.jsonl")
+
+    stats = ingest_folder(str(docs), output, workers=2)
+
+    assert (stats["files"], stats["errors"]) == (1, 1)
+    broken, = [r for r in _records(output) if r["status"] == "error"]
+    assert broken["path"].endswith("broken.pdf") and broken["error"]
+    # Only the good file is in the manifest, so the broken one is tried again
+    assert ingest_folder(str(docs), output, workers=1)["errors"] == 1
+
+
+def _crash(path):
+    os._exit(1)
+
+
+def test_worker_crash_is_recorded_as_an_error(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    _write(docs, "report.docx", b"docx bytes")
+    output = str(tmp_path / "out.jsonl")
+    # Forked workers inherit the patched parser
+    monkeypatch.setattr(batch_ingest, "_extract_docx", _crash)
+
+    stats = ingest_folder(str(docs), output, workers=1)
+
+    assert (stats["files"], stats["errors"]) == (0, 1)
+    record, = _records(output)
+    assert record["status"] == "error" and "worker failed" in record["error"]
+    assert not open(f"{output}.manifest").read()
+
+
+def test_workers_do_not_open_the_extraction_cache(monkeypatch):
+    def fail():
+        raise AssertionError("extraction cache opened in a worker")
+    monkeypatch.setattr("utils.document_analyzer.get_extraction_cache", fail)
+
+    batch_ingest._init_worker()
+
+    assert batch_ingest._analyzer._cache is None
@@ -0,0 +1,81 @@
+from utils.context_builder import ChunkIndex, ContextBuilder, ConversationMemory, count_tokens
+
+SYSTEM = "You are a music marketing advisor."
+
+
+def _turn(index: int) -> str:
+    return f"Turn {index} talks about Lagos radio. " + "More detail follows here. " * 10
+
+
+def _memory(turns: int, **budgets) -> ConversationMemory:
+    memory = ConversationMemory(**budgets)
+    for index in range(turns):
+        memory.add("user" if index % 2 == 0 else "assistant", _turn(index))
+    return memory
+
+
+def test_old_turns_fold_into_a_summary_within_budget():
+    memory = _memory(12, history_tokens=200, summary_tokens=40)
+
+    assert memory.recent_tokens <= 200 and len(memory.turns) >= 2
+    assert memory.messages()[-1]["content"] == _turn(11)
+    assert 0 < memory.summary_tokens_used <= 40
+    # Each folded turn leaves its first sentence; the newest one is kept
+    newest_folded = 11 - len(memory.turns)
+    role = "user" if newest_folded % 2 == 0 else "assistant"
+    assert memory.summary.splitlines()[-1] == f"{role}: Turn {newest_folded} talks about Lagos radio."
+    assert "Turn 0 " not in memory.summary
+
+
+def test_memory_round_trips_without_retokenizing():
+    memory = _memory(8, history_tokens=120, summary_tokens=200)
+
+    restored = ConversationMemory.from_dict(memory.to_dict(), history_tokens=120, summary_tokens=200)
+
+    assert restored.messages() == memory.messages()
+    assert restored.summary == memory.summary
+    assert (restored.recent_tokens, restored.summary_tokens_used) == (memory.recent_tokens,
+                                                                      memory.summary_tokens_used)
+
+
+def test_chunk_index_ranks_and_forgets_documents():
+    index = ChunkIndex(chunk_tokens=20, overlap_tokens=0)
+    index.add_document("radio.txt", "Radio airplay in Lagos drives Afrobeats discovery. " * 3)
+    index.add_document("tour.txt", "Tour logistics for Accra venues and ticketing partners. " * 3)
+
+    assert [chunk.source for _, chunk in index.search("Lagos radio airplay", 5)] == ["radio.txt", "radio.txt"]
+
+    index.remove_document("radio.txt")
+    assert index.search("Lagos radio airplay", 5) == []
+    assert len(index) == len(index.chunks["tour.txt"])
+
+
+def test_prompt_stays_within_the_context_budget():
+    memory = _memory(20, history_tokens=300, summary_tokens=60)
+    index = ChunkIndex(chunk_tokens=40, overlap_tokens=0)
+    index.add_document("radio.txt", "Lagos radio stations favour Afrobeats singles. " * 40)
+    builder = ContextBuilder(max_context_tokens=600, doc_tokens=150, top_k=3)
+
+    messages, info = builder.build(SYSTEM, "Which Lagos radio stations should I target?",
+                                   {"genre": "Afrobeats"}, memory, index)
+
+    assert info["prompt_tokens"] <= 600
+    assert sum(count_tokens(m["content"]) for m in messages) <= 600 + 20  # + the section labels
+    assert 0 < info["passage_tokens"] <= 150 and info["sources"] == ["radio.txt"]
+    assert messages[0] == {"role": "system", "content": SYSTEM}
+    assert messages[1]["content"].startswith("Summary of earlier conversation:")
+    assert messages[-1]["content"].endswith("Query: Which Lagos radio stations should I target?")
+    assert info["history_turns"] == len(memory.turns)
+
+
+def test_recent_turns_are_dropped_oldest_first_for_a_long_query():
+    memory = _memory(6, history_tokens=1000, summary_tokens=60)
+    builder = ContextBuilder(max_context_tokens=count_tokens(SYSTEM) + 250)
+    query = "How should I plan the rollout? " * 20
+
+    messages, info = builder.build(SYSTEM, query, None, memory)
+
+    assert info["prompt_tokens"] <= builder.max_context_tokens
+    assert 0 < info["history_turns"] < len(memory.turns)
+    kept = [m["content"] for m in messages[1:-1]]
+    assert kept == [turn.content for turn in memory.turns[-info["history_turns"]:]]
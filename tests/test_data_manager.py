@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime
+
+from utils.data_manager import DataManager
+from utils.metrics import MetricsRegistry
+from utils.refresh_scheduler import RefreshScheduler
+from tests.test_data_scraper import _previous
+
+
+def test_country_spellings_share_cache_flight_and_store(tmp_path):
+    manager = DataManager(data_dir=str(tmp_path))
+    scraped = []
+
+    async def fake_refresh(country, previous=None):
+        scraped.append(country)
+        await asyncio.sleep(0.05)
+        return replace(_previous(), last_updated=datetime.now())
+    manager.scraper.refresh_market_data = fake_refresh
+
+    async def run():
+        return await asyncio.gather(manager.get_market_data("Nigeria"), manager.get_market_data(" nigeria"),
+                                    manager.refresh_market_data("NIGERIA"))
+    first, second, third = asyncio.run(run())
+
+    assert scraped == ["nigeria"]
+    assert first is second is third
+    assert list(manager.cache) == ["nigeria"]
+    assert manager.store.countries() == ["nigeria"]
+    assert manager.last_updated("Nigeria") == first.last_updated
+    assert RefreshScheduler(manager)._watched_countries() == ["nigeria"]
+    assert RefreshScheduler(manager, countries=["Nigeria", "nigeria"])._watched_countries() == ["nigeria"]
+
+
+
+def test_stale_data_is_served_while_one_background_refresh_runs(tmp_path):
+    manager = DataManager(data_dir=str(tmp_path))
+    stale = _previous()
+    manager.store.save("nigeria", stale)
+    release, scraped = threading.Event(), []
+    fresh = replace(stale, last_updated=datetime.now(), streaming_revenue=75.0)
+
+    async def fake_refresh(country, previous=None):
+        scraped.append(country)
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return fresh
+    manager.scraper.refresh_market_data = fake_refresh
+
+    async def run():
+        return await asyncio.gather(*[manager.get_market_data("Nigeria") for _ in range(3)])
+    served = asyncio.run(run())
+
+    assert [data.streaming_revenue for data in served] == [stale.streaming_revenue] * 3
+    assert manager.flights.in_flight("nigeria")
+    release.set()
+    while manager.flights.in_flight("nigeria"):
+        time.sleep(0.005)
+    assert scraped == ["nigeria"]
+    assert manager.cache["nigeria"] == fresh
+
+def test_scheduler_reports_refreshes_to_the_metrics_registry(tmp_path, monkeypatch):
+    registry = MetricsRegistry(enabled=True)
+    monkeypatch.setattr("utils.refresh_scheduler.get_metrics", lambda: registry)
+    manager = DataManager(data_dir=str(tmp_path))
+    manager.store.save("nigeria", _previous())
+    outcomes = iter([replace(_previous(), last_updated=datetime.now(), streaming_revenue=60.0), None])
+
+    async def fake_refresh(country, previous=None):
+        return next(outcomes)
+    manager.scraper.refresh_market_data = fake_refresh
+    scheduler = RefreshScheduler(manager, countries=["Nigeria"])
+
+    asyncio.run(scheduler.tick())
+    asyncio.run(scheduler.refresh("Nigeria"))
+
+    counters = {(c["name"], c["labels"].get("result")): c["value"] for c in registry.snapshot()["counters"]}
+    assert counters == {("market_refresh_ticks_total", None): 1, ("market_refreshes_total", "changed"): 1,
+                        ("market_refreshes_total", "failed"): 1}
+    lag, = [h for h in registry.snapshot()["histograms"] if h["name"] == "market_refresh_lag_seconds"]
+    assert lag["count"] == 1
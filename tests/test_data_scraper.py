@@ -0,0 +1,197 @@
+import asyncio
+import gc
+import socket
+import threading
+import warnings
+from datetime import datetime, timedelta
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.config import SCRAPER_CONFIG
+from utils.data_scraper import AfricanMusicDataScraper, FetchResult, MarketData, _close_open_sessions
+from utils.single_flight import SingleFlight
+
+
+def _previous() -> MarketData:
+    return MarketData(
+        last_updated=datetime.now() - timedelta(days=30), population=200_000_000,
+        gdp_per_capita=2100.0, internet_penetration=55.0, smartphone_users=90_000_000,
+        streaming_revenue=50.0, digital_payment_penetration=40.0, platforms=[],
+        genre_popularity={"Afrobeats": 60.0}, languages=["English"], artist_demographics={}
+    )
+
+
+def _refresh(scraper, results):
+    async def fake_fetch(url):
+        return results[url.rsplit("/", 1)[0] + "/"]
+    scraper._fetch = fake_fetch
+    return asyncio.run(scraper.refresh_market_data("Nigeria", _previous()))
+
+
+def _scraper():
+    scraper = AfricanMusicDataScraper()
+    scraper.base_urls = {source: f"http://example.test/{source}/" for source in scraper.base_urls}
+    return scraper
+
+
+def test_refresh_bumps_timestamp_only_when_every_source_is_confirmed():
+    scraper = _scraper()
+    results = {url: FetchResult(url, "<html></html>", 304, False) for url in scraper.base_urls.values()}
+
+    data = _refresh(scraper, results)
+
+    assert data is not None
+    assert datetime.now() - data.last_updated < timedelta(minutes=1)
+    assert data.streaming_revenue == 50.0
+
+
+def test_refresh_outage_keeps_snapshot_stale():
+    scraper = _scraper()
+    results = {url: FetchResult(url, None, 0, False) for url in scraper.base_urls.values()}
+
+    assert _refresh(scraper, results) is None
+
+
+def test_refresh_with_a_failed_source_is_not_confirmed():
+    scraper = _scraper()
+    urls = list(scraper.base_urls.values())
+    results = {url: FetchResult(url, "<html></html>", 304, False) for url in urls}
+    results[urls[0]] = FetchResult(urls[0], None, 503, False)
+
+    assert _refresh(scraper, results) is None
+
+
+
+def test_refresh_with_changed_and_failed_sources_keeps_the_old_timestamp(monkeypatch):
+    monkeypatch.setitem(SCRAPER_CONFIG, "parse_executor", "inline")
+    scraper = _scraper()
+    ifpi, worldbank, *others = scraper.base_urls.values()
+    results = {url: FetchResult(url, "<html></html>", 304, False) for url in others}
+    results[ifpi] = FetchResult(ifpi, "<p>Nigeria streaming revenue: $38.5 million</p>", 200, True)
+    results[worldbank] = FetchResult(worldbank, None, 503, False)
+
+    data = _refresh(scraper, results)
+
+    assert data.streaming_revenue == 38_500_000
+    assert data.population == _previous().population
+    assert datetime.now() - data.last_updated > timedelta(days=29)
+
+@pytest.fixture
+def fast_scraper_config(monkeypatch):
+    for key, value in {"min_request_interval": 0, "timeout": 0.5, "connect_timeout": 0.5,
+                       "retries": 1, "retry_backoff": 0}.items():
+        monkeypatch.setitem(SCRAPER_CONFIG, key, value)
+
+
+@pytest.fixture
+def site():
+    """Test server on its own loop thread, so scrapers can run on any number of loops"""
+    requests = []
+
+    async def page(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.Response(text="<p>Nigeria streaming revenue: $38.5 million</p>", headers={"ETag": '"v1"'})
+
+    async def gone(request):
+        return web.Response(status=404)
+
+    async def slow(request):
+        await asyncio.sleep(2)
+        return web.Response(text="too late")
+
+    app = web.Application()
+    app.router.add_get("/ifpi/nigeria", page)
+    app.router.add_get("/slow", slow)
+    app.router.add_get("/gone", gone)
+    loop = asyncio.new_event_loop()
+    server = TestServer(app)
+    loop.run_until_complete(server.start_server())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server, requests
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def _fetch_all(scraper, *urls):
+    async def run():
+        async with scraper:
+            return [await scraper._fetch(url) for url in urls]
+    return asyncio.run(run())
+
+
+def test_fetch_revalidates_with_etag(site, fast_scraper_config):
+    server, requests = site
+    url = str(server.make_url("/ifpi/nigeria"))
+
+    first, second = _fetch_all(AfricanMusicDataScraper(), url, url)
+
+    assert (first.status, first.changed) == (200, True)
+    assert (second.status, second.changed, second.text) == (304, False, first.text)
+    assert requests == [None, '"v1"']
+
+
+def test_fetch_timeout_and_error_status_fail(site, fast_scraper_config):
+    server, _ = site
+
+    slow, gone = _fetch_all(AfricanMusicDataScraper(), str(server.make_url("/slow")),
+                            str(server.make_url("/gone")))
+
+    assert slow.failed and slow.status == 0
+    assert gone.failed and gone.status == 404
+
+
+def test_fetch_connection_refused_fails(fast_scraper_config):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    result, = _fetch_all(AfricanMusicDataScraper(), f"http://127.0.0.1:{port}/ifpi/nigeria")
+
+    assert result.failed and result.status == 0
+
+
+def test_new_event_loop_closes_the_previous_session(site, fast_scraper_config):
+    server, _ = site
+    url = str(server.make_url("/ifpi/nigeria"))
+    scraper = AfricanMusicDataScraper()
+
+    asyncio.run(scraper._fetch(url))
+    first_session = scraper._session
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        _fetch_all(scraper, url)
+        del first_session
+        gc.collect()
+
+    assert scraper._session is None
+    assert not [w for w in caught if "Unclosed client session" in str(w.message)]
+
+
+def test_background_loop_session_is_closed_at_exit():
+    scraper = AfricanMusicDataScraper()
+
+    async def run():
+        return await SingleFlight().run("nigeria", scraper._get_session)
+    session = asyncio.run(run())
+    assert not session.closed and scraper._loop.is_running()
+
+    _close_open_sessions()
+
+    assert session.closed and scraper._session is None
+
+
+def test_save_to_database_uses_data_dir(tmp_path):
+    scraper = AfricanMusicDataScraper(data_dir=str(tmp_path))
+    data = _previous()
+
+    scraper.save_to_database(data, "Nigeria")
+
+    assert (tmp_path / "market_data.sqlite").exists()
+    assert scraper._store.latest("Nigeria") == data
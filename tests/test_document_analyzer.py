@@ -0,0 +1,38 @@
+import io
+import pickle
+
+from utils.document_analyzer import DocumentAnalyzer
+from utils.extraction_cache import ExtractionCache
+
+
+def _analyzer(tmp_path, **kwargs):
+    return DocumentAnalyzer(cache=ExtractionCache(cache_dir=str(tmp_path / "extraction")), **kwargs)
+
+
+def test_iter_pages_extracts_ruled_tables(tmp_path, table_pdf):
+    pages = [record for record in _analyzer(tmp_path).iter_pages(io.BytesIO(table_pdf), "kit.pdf")
+             if record["type"] == "page"]
+
+    assert len(pages) == 1
+    tables = pages[0]["tables"]
+    assert tables == [[["Platform", "Share", "Users"], ["Boomplay", "40%", "1.2M"], ["Spotify", "25%", "0.8M"]]]
+    pickle.dumps(tables)
+
+
+def test_process_document_reports_and_reuses_cached_extraction(tmp_path, table_pdf, monkeypatch):
+    analyzer = _analyzer(tmp_path)
+    calls = []
+    extract = analyzer._extract_all_content
+    monkeypatch.setattr(analyzer, "_extract_all_content", lambda *args: calls.append(1) or extract(*args))
+
+    first = analyzer.process_document(io.BytesIO(table_pdf), "kit.pdf")
+    second = analyzer.process_document(io.BytesIO(table_pdf), "copy_of_kit.pdf")
+
+    assert first["status"] == "success", first.get("message")
+    assert second["status"] == "success"
+    assert len(calls) == 1
+    assert analyzer.cache.stats["hits"] == 1
+    assert second["raw_content"] == first["raw_content"]
+    report = first["analysis"]
+    assert report["statistics"]["table_count"] == 1
+    assert report["mentions"] == {"genres": ["Afrobeats"], "target_markets": ["Nigeria"]}
@@ -0,0 +1,127 @@
+import base64
+import io
+import threading
+import time
+
+import fitz
+from PIL import Image
+
+from utils.epk_analyzer import EPKAnalyzer
+from utils.extraction_cache import ExtractionCache
+from utils.vision_payload import PayloadOptimizer
+from tests.conftest import make_pdf
+
+
+def _old_payload(page) -> str:
+    """How pages were sent before: PIL PNG of the 2x render, base64 encoded"""
+    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
+    buffered = io.BytesIO()
+    Image.frombytes("RGB", (pix.width, pix.height), pix.samples).save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def test_bytes_saved_is_measured_against_the_old_png_payload(tmp_path):
+    pdf = make_pdf()
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        old = len(_old_payload(doc[0]))
+        sent = PayloadOptimizer(measure_baseline=True).encode_page(doc[0])
+    analyzer = EPKAnalyzer("test-key", payload_optimizer=PayloadOptimizer(measure_baseline=True),
+                           cache=ExtractionCache(cache_dir=str(tmp_path)))
+    analyzer._analyze_with_vision = lambda data, form_data, mime_type: {"page": "ok"}
+    analyzer._generate_brief = lambda analysis, form_data: {"brief": analysis}
+
+    payload = analyzer.analyze_epk(io.BytesIO(pdf), {})["payload"]
+
+    assert sent.baseline_bytes == old
+    assert payload["encoded_bytes"] == sent.encoded_bytes == len(sent.data)
+    assert payload["bytes_saved"] == old - len(sent.data)
+
+
+def test_bytes_saved_is_estimated_when_not_measured(tmp_path):
+    pdf = make_pdf()
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        old = len(_old_payload(doc[0]))
+    analyzer = EPKAnalyzer("test-key", payload_optimizer=PayloadOptimizer(measure_baseline=False),
+                           cache=ExtractionCache(cache_dir=str(tmp_path)))
+    analyzer._analyze_with_vision = lambda data, form_data, mime_type: {"page": "ok"}
+    analyzer._generate_brief = lambda analysis, form_data: {"brief": analysis}
+
+    payload = analyzer.analyze_epk(io.BytesIO(pdf), {})["payload"]
+
+    assert payload["baseline_estimated"] is True
+    assert old / 3 < payload["baseline_bytes"] < old * 3
+    assert payload["bytes_saved"] == payload["baseline_bytes"] - payload["encoded_bytes"]
+
+
+def test_encode_error_gives_back_the_page_slot(tmp_path, monkeypatch):
+    semaphores = []
+
+    class RecordingSemaphore(threading.BoundedSemaphore):
+        def __init__(self, value):
+            super().__init__(value)
+            semaphores.append(self)
+
+    monkeypatch.setattr("utils.epk_analyzer.threading.BoundedSemaphore", RecordingSemaphore)
+    optimizer = PayloadOptimizer()
+
+    def broken(page):
+        raise RuntimeError("render failed")
+
+    optimizer.encode_page = broken
+    analyzer = EPKAnalyzer("test-key", payload_optimizer=optimizer, max_pages_in_flight=1,
+                           cache=ExtractionCache(cache_dir=str(tmp_path)))
+
+    result = analyzer.analyze_epk(io.BytesIO(make_pdf()), {})
+
+    assert result == {"error": "render failed"}
+    assert semaphores[0].acquire(blocking=False)
+
+
+def _pages_pdf(count: int) -> bytes:
+    doc = fitz.open()
+    for n in range(count):
+        doc.new_page().insert_text((72, 72 + 20 * n), f"Page {n + 1}: tour dates, press quotes and streaming numbers")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_pages_are_analyzed_concurrently_in_order_and_bounded(tmp_path):
+    optimizer = PayloadOptimizer()
+    encode_page = optimizer.encode_page
+    pages_by_data, state = {}, {"in_flight": 0, "max_in_flight": 0, "running": 0, "max_running": 0}
+    lock = threading.Lock()
+
+    def encode(page):
+        encoded = encode_page(page)
+        with lock:
+            pages_by_data[encoded.data] = encoded.page
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        return encoded
+
+    def vision(data, form_data, mime_type):
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        page = pages_by_data[data]
+        time.sleep(0.02 * (7 - page))  # later pages finish first
+        with lock:
+            state["running"] -= 1
+            state["in_flight"] -= 1
+        return {"page": page}
+
+    optimizer.encode_page = encode
+    analyzer = EPKAnalyzer("test-key", max_workers=2, max_pages_in_flight=3, payload_optimizer=optimizer,
+                           cache=ExtractionCache(cache_dir=str(tmp_path)))
+    analyzer._analyze_with_vision = vision
+    analyzer._generate_brief = lambda analysis, form_data: {"brief": analysis}
+    pdf = _pages_pdf(6)
+
+    first = analyzer.analyze_epk(io.BytesIO(pdf), {})
+    second = analyzer.analyze_epk(io.BytesIO(pdf), {})
+
+    assert first["brief"] == second["brief"] == [{"page": n} for n in range(1, 7)]
+    assert state["max_running"] == 2
+    assert state["max_in_flight"] <= 3
+    assert second["payload"]["cached_pages"] == 6 and second["payload"]["encoded_bytes"] == 0
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.llm_engine import EngineOverloaded, LLMEngine, TokenBucket
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate_per_minute=6000, capacity=5)  # 100 tokens/s
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(take(10))
+
+    # The first five come from the full bucket, the rest at 100 per second
+    assert time.monotonic() - started >= 0.045
+
+
+def test_concurrency_is_capped():
+    engine = LLMEngine(max_concurrency=2, max_queue_size=16, queue_timeout=5, provider_limits={})
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda _: engine.call_blocking("bedrock", call), range(6)))
+
+    assert results == ["ok"] * 6
+    assert peak[0] == 2
+    assert engine.stats["completed"] == 6
+
+
+def test_full_queue_rejects_after_queue_timeout():
+    engine = LLMEngine(max_concurrency=1, max_queue_size=1, queue_timeout=0.05, provider_limits={})
+    release = threading.Event()
+    occupant = threading.Thread(target=lambda: engine.call_blocking("bedrock", release.wait, 5))
+    occupant.start()
+    while engine.stats["in_flight"] == 0:
+        time.sleep(0.005)
+
+    with pytest.raises(EngineOverloaded):
+        engine.call_blocking("bedrock", lambda: "never")
+    release.set()
+    occupant.join()
+
+    assert engine.stats["rejected"] == 1
+    assert engine.call_blocking("bedrock", lambda: "after") == "after"
+
+
+def test_call_blocking_timeout_frees_the_caller_and_the_slot():
+    engine = LLMEngine(max_concurrency=1, max_queue_size=4, queue_timeout=1, provider_limits={})
+    release = threading.Event()
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        engine.call_blocking("bedrock", release.wait, 5, timeout=0.05)
+    assert time.monotonic() - started < 1.0
+
+    release.set()
+    assert engine.call_blocking("bedrock", lambda: "next", timeout=1) == "next"
+    assert engine.stats["in_flight"] == 0
@@ -0,0 +1,44 @@
+import math
+from dataclasses import replace
+from datetime import datetime
+
+from utils.market_analytics import MarketAnalytics
+from utils.market_store import MarketStore
+from tests.test_data_scraper import _previous
+
+
+def _snapshot(when: str, revenue: float, **changes):
+    return replace(_previous(), last_updated=datetime.fromisoformat(when), streaming_revenue=revenue, **changes)
+
+
+def test_growth_is_undefined_across_a_missing_quarter(tmp_path):
+    store = MarketStore(str(tmp_path / "market.sqlite"))
+    for when, revenue in [("2024-02-01", 100.0), ("2024-03-20", 110.0), ("2024-05-10", 132.0),
+                          ("2024-11-05", 150.0)]:
+        store.save("Nigeria", _snapshot(when, revenue))
+
+    trends = MarketAnalytics(store).quarterly_trends(["Nigeria"])
+
+    assert trends["Date"].tolist() == ["2024-Q1", "2024-Q2", "2024-Q4"]
+    assert trends["Revenue"].tolist() == [110.0, 132.0, 150.0]
+    growth = trends["Growth"].tolist()
+    assert math.isnan(growth[0]) and round(growth[1], 6) == 20.0 and math.isnan(growth[2])
+
+
+def test_only_countries_written_since_the_last_build_are_reloaded(tmp_path):
+    store = MarketStore(str(tmp_path / "market.sqlite"))
+    store.save("Nigeria", _snapshot("2024-01-10", 100.0))
+    store.save("Ghana", _snapshot("2024-01-10", 40.0, genre_popularity={"Highlife": 3.0, "Afrobeats": 1.0}))
+    analytics = MarketAnalytics(store)
+    assert analytics.latest()["streaming_revenue"].to_dict() == {"ghana": 40.0, "nigeria": 100.0}
+
+    loaded = []
+    snapshot_dicts = store.snapshot_dicts
+    store.snapshot_dicts = lambda countries=None: loaded.append(countries) or snapshot_dicts(countries)
+    store.save("Ghana", _snapshot("2024-04-10", 60.0))
+
+    assert analytics.latest()["streaming_revenue"].to_dict() == {"ghana": 60.0, "nigeria": 100.0}
+    assert analytics.rankings()["streaming_revenue"].to_dict() == {"ghana": 2, "nigeria": 1}
+    assert analytics.quarterly_trends(["Ghana"])["Growth"].round(6).tolist()[1] == 50.0
+    assert analytics.genre_share()["Popularity"].tolist() == [100.0, 100.0]
+    assert loaded == [["ghana"]]
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from dataclasses import replace
+
+import pytest
+
+from utils.data_manager import DataManager
+from utils.data_scraper import StreamingPlatformData
+from utils.market_analyzer import MarketAnalyzer
+from tests.test_data_scraper import _previous
+
+
+def _platform(name: str, share: float) -> StreamingPlatformData:
+    return StreamingPlatformData(name, share, 0, False, [])
+
+
+def test_platform_share_averages_over_countries_with_data(tmp_path):
+    manager = DataManager(data_dir=str(tmp_path))
+    manager.store.save("Nigeria", replace(_previous(), platforms=[_platform("Boomplay", 60), _platform("Spotify", 40)]))
+    manager.store.save("Ghana", replace(_previous(), platforms=[_platform("Boomplay", 20), _platform("Spotify", 80)]))
+    manager.store.save("Kenya", _previous())
+
+    shares = MarketAnalyzer(manager).get_platform_share(["Nigeria", "Ghana", "Kenya", "Uganda"])
+
+    assert dict(zip(shares["Platform"], shares["Share"])) == {"Spotify": 60.0, "Boomplay": 40.0}
+
+
+def _analyzer(tmp_path, country_timeout=1.0, analysis_timeout=1.0):
+    manager = DataManager(data_dir=str(tmp_path))
+    nigeria = replace(_previous(), platforms=[_platform("Boomplay", 60), _platform("Spotify", 40)])
+    manager.store.save("Nigeria", nigeria)
+
+    async def get_market_data(country):
+        if country == "Ghana":
+            await asyncio.sleep(5)
+        if country == "Kenya":
+            raise ConnectionError("source unreachable")
+        return nigeria if country == "Nigeria" else None
+    manager.get_market_data = get_market_data
+    analyzer = MarketAnalyzer(manager)
+    analyzer.country_timeout, analyzer.analysis_timeout = country_timeout, analysis_timeout
+    return analyzer
+
+
+def test_slow_and_failing_countries_are_left_out(tmp_path):
+    analyzer = _analyzer(tmp_path, country_timeout=0.05)
+
+    report = asyncio.run(analyzer.analyze_markets(["Nigeria", "Ghana", "Kenya", "Uganda"],
+                                                  ["Cultural Fit", "Competitive Analysis"]))
+
+    assert report["missing_countries"] == {"Ghana": "timed out", "Kenya": "source unreachable",
+                                           "Uganda": "no data available"}
+    assert report["errors"] == {}
+    assert [row["Country"] for row in report["results"]["Competitive Analysis"]["data"]] == ["Nigeria"]
+    assert set(report["timings"]["fetch_by_country"]) == {"Nigeria", "Ghana", "Kenya", "Uganda"}
+
+
+def test_a_failing_or_slow_analysis_does_not_affect_the_others(tmp_path):
+    analyzer = _analyzer(tmp_path, analysis_timeout=1.0)
+
+    def broken(countries, market_data):
+        raise ValueError("bad frame")
+
+    def slow(countries, market_data):
+        time.sleep(1.3)
+        return {}
+    analyzer._analyses["Market Overview"] = broken
+    analyzer._analyses["Cultural Fit"] = slow
+
+    report = asyncio.run(analyzer.analyze_markets(["Nigeria"], ["Market Overview", "Cultural Fit",
+                                                                "Competitive Analysis"]))
+
+    assert report["errors"] == {"Market Overview": "bad frame", "Cultural Fit": "Cultural Fit timed out"}
+    assert list(report["results"]) == ["Competitive Analysis"]
+    single = asyncio.run(analyzer.analyze_market(["Nigeria"], "Market Overview"))
+    assert single["status"] == "error" and single["error"] == "bad frame"
+
+
+def test_unknown_analysis_or_no_data(tmp_path):
+    analyzer = _analyzer(tmp_path)
+
+    with pytest.raises(ValueError):
+        asyncio.run(analyzer.analyze_markets(["Nigeria"], ["Vibes"]))
+    report = asyncio.run(analyzer.analyze_markets(["Uganda"], ["Cultural Fit"]))
+    assert report["results"] == {}
+    assert report["errors"] == {"Cultural Fit": "No market data available for the selected countries"}
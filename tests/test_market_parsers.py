@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from utils.market_parsers import HAS_LXML, parse_page, parse_source
+from utils.parse_benchmark import DEFAULT_FIXTURES, load_fixtures, run_benchmark
+
+PARSERS = [True, False] if HAS_LXML else [False]
+
+
+def _fixture(name: str) -> str:
+    return (Path(DEFAULT_FIXTURES) / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("use_lxml", PARSERS)
+def test_fixture_values(use_lxml):
+    assert parse_source("ifpi", _fixture("ifpi_nigeria.html"), use_lxml) == {"streaming_revenue": 38.5e6}
+    assert parse_source("worldbank", _fixture("worldbank_nigeria.html"), use_lxml) == {
+        "population": 223_800_000, "gdp_per_capita": 1621.1}
+    assert parse_source("gsma", _fixture("gsma_africa.html"), use_lxml) == {
+        "internet_penetration": 0.27, "smartphone_users": 495_000_000, "digital_payment_penetration": 0.43}
+    statista = parse_source("statista", _fixture("statista_kenya.html"), use_lxml)
+    assert statista["genre_popularity"]["Bongo Flava"] == 0.22
+    assert [p["name"] for p in statista["platforms"] if p["local"]] == ["Boomplay", "Mdundo", "Audiomack"]
+
+
+@pytest.mark.parametrize("use_lxml", PARSERS)
+@pytest.mark.parametrize("html", ["", "  \n\t", "<!-- removed -->\n<!-- maintenance -->"])
+def test_empty_pages_parse_to_nothing(html, use_lxml):
+    page = parse_page(html, use_lxml)
+    assert page.text == "" and page.tables == []
+    assert parse_source("gsma", html, use_lxml)["internet_penetration"] == 0.0
+
+
+@pytest.mark.parametrize("use_lxml", PARSERS)
+def test_xhtml_with_encoding_declaration(use_lxml):
+    assert parse_source("ifpi", _fixture("ifpi_ghana_xhtml.html"), use_lxml) == {"streaming_revenue": 6.2e6}
+    assert "Coupé-Décalé" in parse_page(_fixture("ifpi_ghana_xhtml.html"), use_lxml).text
+
+
+def test_benchmark_runs_on_bundled_fixtures():
+    fixtures = load_fixtures(str(DEFAULT_FIXTURES))
+    stats = run_benchmark(fixtures, HAS_LXML, executor="inline", repeat=1)
+    assert stats["pages"] == len(fixtures) >= 5
+
+
+@pytest.mark.parametrize("use_lxml", PARSERS)
+@pytest.mark.parametrize("source, html, expected", [
+    ("worldbank", "<p>Population (2023): 223.8 million</p>", {"population": 223_800_000}),
+    ("worldbank", "<p>Population 2023 estimate: 53,005,614. GDP per capita (current US$, 2023) 1621.1</p>",
+     {"population": 53_005_614, "gdp_per_capita": 1621.1}),
+    ("ifpi", "<p>Streaming revenue in 2023 grew 30% to $40.5 million</p>", {"streaming_revenue": 40.5e6}),
+    ("ifpi", "<p>Digital revenue for 2022 was 12,400,000</p>", {"streaming_revenue": 12.4e6}),
+])
+def test_years_and_growth_rates_are_not_values(source, html, expected, use_lxml):
+    parsed = parse_source(source, html, use_lxml)
+    assert {field: parsed[field] for field in expected} == expected
+
+
+@pytest.mark.parametrize("use_lxml", PARSERS)
+def test_percent_fields_still_read_percentages_after_a_year(use_lxml):
+    parsed = parse_source("gsma", "<p>Internet penetration in 2023: 27%. Mobile money reached 43% of adults.</p>",
+                          use_lxml)
+    assert (parsed["internet_penetration"], parsed["digital_payment_penetration"]) == (0.27, 0.43)
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import memory_cache
+from utils.memory_cache import BoundedCache, approximate_size
+from tests.test_data_scraper import _previous
+
+
+def test_evicts_least_recently_used_beyond_max_entries():
+    cache = BoundedCache(max_entries=2)
+    cache["nigeria"] = 1
+    cache["ghana"] = 2
+    assert cache["nigeria"] == 1  # ghana is now least recently used
+    cache["kenya"] = 3
+
+    assert cache.keys() == ["nigeria", "kenya"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_limit_uses_sizes_recorded_on_insert():
+    sizes = {"a": 40, "b": 40, "c": 50, "huge": 500}
+    cache = BoundedCache(max_entries=None, max_bytes=100, sizeof=lambda value: sizes[value])
+    for key in ("a", "b", "c"):
+        cache[key] = key
+
+    assert cache.keys() == ["b", "c"] and cache.stats()["bytes"] == 90
+    cache["huge"] = "huge"
+    # An entry larger than the limit on its own is still kept
+    assert cache.keys() == ["huge"] and cache.stats()["bytes"] == 500
+    del cache["huge"]
+    assert cache.stats()["bytes"] == 0
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(memory_cache.time, "monotonic", lambda: now[0])
+    cache = BoundedCache(ttl_seconds=10)
+    cache["nigeria"] = "old"
+    cache.put("ghana", "short", ttl_seconds=1)
+
+    now[0] += 5
+    assert "ghana" not in cache and cache.get("nigeria") == "old"
+    now[0] += 10
+    assert cache.purge_expired() == 1
+    assert len(cache) == 0 and cache.stats()["expirations"] == 2
+    with pytest.raises(KeyError):
+        cache["nigeria"]
+
+
+def test_concurrent_writers_keep_counts_consistent():
+    cache = BoundedCache(max_entries=50, sizeof=lambda value: 10)
+    start = threading.Barrier(8)
+
+    def write(worker):
+        start.wait()
+        for n in range(500):
+            cache[(worker, n % 80)] = n
+            cache.get((worker, (n * 7) % 80))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(8)))
+
+    stats = cache.stats()
+    assert stats["entries"] == len(cache.keys()) == 50
+    assert stats["bytes"] == 500
+    assert stats["hits"] + stats["misses"] == 8 * 500
+
+
+def test_approximate_size_walks_market_data():
+    data = _previous()
+
+    assert approximate_size(data) > approximate_size(data.genre_popularity) > 0
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from utils.metrics import Histogram, MetricsRegistry, estimate_cost
+
+SONNET = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+
+def test_histogram_buckets_are_inclusive_upper_bounds():
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert (histogram.count, histogram.sum) == (4, pytest.approx(2.65))
+    assert histogram.quantile(0.5) == pytest.approx(0.1)
+    assert histogram.quantile(0.75) == pytest.approx(1.0)
+    assert histogram.quantile(1.0) == 1.0
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry(enabled=True, buckets=[1, 0.1], namespace="test")
+    registry.inc("requests_total", 2, model='say "hi"')
+    registry.observe("stage_latency_seconds", 0.05, stage="advice")
+    registry.observe("stage_latency_seconds", 5, stage="advice")
+
+    assert registry.to_prometheus().splitlines() == [
+        "# TYPE test_requests_total counter",
+        'test_requests_total{model="say \\"hi\\""} 2',
+        "# TYPE test_stage_latency_seconds histogram",
+        'test_stage_latency_seconds_bucket{stage="advice",le="0.1"} 1',
+        'test_stage_latency_seconds_bucket{stage="advice",le="1"} 1',
+        'test_stage_latency_seconds_bucket{stage="advice",le="+Inf"} 2',
+        'test_stage_latency_seconds_sum{stage="advice"} 5.05',
+        'test_stage_latency_seconds_count{stage="advice"} 2',
+    ]
+
+
+def test_estimate_cost_applies_cache_and_batch_multipliers():
+    usage = {"uncached_input_tokens": 1000, "cache_read_input_tokens": 1000,
+             "cache_write_input_tokens": 1000, "output_tokens": 1000}
+
+    # 0.003 input + 0.1 * 0.003 cache read + 1.25 * 0.003 cache write + 0.015 output
+    assert estimate_cost(SONNET, usage) == pytest.approx(0.02205)
+    assert estimate_cost(SONNET, usage, batch=True) == pytest.approx(0.011025)
+    assert estimate_cost("unpriced-model", usage) == 0.0
+
+
+def test_timed_records_sync_and_async_calls_and_errors():
+    registry = MetricsRegistry(enabled=True)
+
+    @registry.timed("sync")
+    def fail():
+        raise ValueError("boom")
+
+    @registry.timed("async")
+    async def succeed():
+        return "ok"
+
+    with pytest.raises(ValueError):
+        fail()
+    assert asyncio.run(succeed()) == "ok"
+
+    snapshot = registry.snapshot()
+    assert [(h["labels"]["stage"], h["count"]) for h in snapshot["histograms"]] == [("async", 1), ("sync", 1)]
+    assert [(c["name"], c["labels"], c["value"]) for c in snapshot["counters"]] == [
+        ("stage_errors_total", {"stage": "sync"}, 1)
+    ]
@@ -0,0 +1,17 @@
+from utils.prompt_templates import PromptAssembler
+
+CONTEXT = {"genre": "Afrobeats", "target_markets": ["Nigeria", "Ghana"], "budget": "Medium"}
+
+
+def test_no_cache_point_for_the_current_model_or_short_prefixes():
+    prompts = PromptAssembler()
+
+    assert "cache_model_families" in prompts.caching_inactive_reason("anthropic.claude-3-sonnet-20240229-v1:0")
+    assert "min_cache_tokens" in prompts.caching_inactive_reason("anthropic.claude-3-7-sonnet-20250219-v1:0", CONTEXT)
+    assert not any("cachePoint" in block for block in prompts.system(CONTEXT, "anthropic.claude-3-7-sonnet-20250219-v1:0"))
+
+
+def test_cache_point_follows_the_static_prefix_when_long_enough():
+    blocks = PromptAssembler(min_cache_tokens=100).system(CONTEXT, "anthropic.claude-3-7-sonnet-20250219-v1:0", "earlier")
+
+    assert [next(iter(block)) for block in blocks] == ["text", "text", "cachePoint", "text"]
@@ -0,0 +1,183 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.resilience import CircuitOpenError, ResilientCaller
+
+
+class Throttled(Exception):
+    def __init__(self):
+        super().__init__("slow down")
+        self.response = {"Error": {"Code": "ThrottlingException"}}
+
+
+class Invalid(Exception):
+    def __init__(self):
+        super().__init__("bad request")
+        self.response = {"Error": {"Code": "ValidationException"}}
+
+
+class FaultyModel:
+    """Stub model call that replays a script of latencies and faults"""
+
+    def __init__(self, script=None, latency=0.0):
+        self.script = list(script or [])
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, model_id):
+        with self._lock:
+            self.calls.append(model_id)
+            step = self.script.pop(0) if self.script else None
+        delay, error = step if step is not None else (self.latency, None)
+        time.sleep(delay)
+        if error is not None:
+            raise error()
+        return {"model": model_id}
+
+
+def _caller(**kwargs):
+    kwargs.setdefault("sleep", lambda seconds: None)
+    kwargs.setdefault("fallback_model_ids", ["fallback"])
+    return ResilientCaller(**kwargs)
+
+
+def _warm(caller, operation="call", samples=20):
+    tracker = caller.latency("primary", operation)
+    for _ in range(samples):
+        tracker.record(0.01)
+
+
+def test_retries_retryable_errors():
+    model = FaultyModel([(0, Throttled), (0, Throttled)])
+    assert _caller(hedge=False).call("primary", model) == {"model": "primary"}
+    assert model.calls == ["primary"] * 3
+
+
+def test_non_retryable_errors_fail_fast():
+    model = FaultyModel([(0, Invalid)])
+    with pytest.raises(Invalid):
+        _caller(hedge=False).call("primary", model)
+    assert model.calls == ["primary"]
+
+
+def test_falls_back_and_opens_circuit():
+    model = FaultyModel([(0, Throttled)] * 2)
+    caller = _caller(hedge=False, max_attempts=2, failure_threshold=2)
+
+    assert caller.call("primary", model) == {"model": "fallback"}
+    assert caller.breaker("primary").state == "open"
+    # The open primary is skipped outright
+    assert caller.call("primary", model) == {"model": "fallback"}
+    assert model.calls.count("primary") == 2
+
+
+def test_all_circuits_open():
+    caller = _caller(hedge=False, fallback_model_ids=[], failure_threshold=1, max_attempts=1)
+    with pytest.raises(Throttled):
+        caller.call("primary", FaultyModel([(0, Throttled)]))
+    with pytest.raises(CircuitOpenError):
+        caller.call("primary", FaultyModel())
+
+
+def test_fast_calls_under_load_are_not_duplicated():
+    caller = _caller(hedge_budget=1.0)
+    _warm(caller)
+    model = FaultyModel(latency=0.005)
+
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        list(pool.map(lambda _: caller.call("primary", model), range(64)))
+
+    # Hedge delay (p95 = 10ms) isn't consumed by queueing, so no duplicates
+    assert len(model.calls) == 64
+    assert caller.stats["hedges"] == 0
+
+
+def test_slow_concurrent_calls_stay_within_hedge_budget():
+    caller = _caller(hedge_budget=0.05, hedge_workers=4)
+    _warm(caller)
+    model = FaultyModel(latency=0.1)
+
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        list(pool.map(lambda _: caller.call("primary", model), range(64)))
+
+    # Starting burst (one token per hedge worker) plus 5% of the calls
+    assert 0 < caller.stats["hedges"] <= 4 + 64 * 0.05
+    assert len(model.calls) == 64 + caller.stats["hedges"]
+
+
+def test_hedge_takes_over_when_slow_primary_fails():
+    caller = _caller(hedge_budget=1.0)
+    _warm(caller)
+    model = FaultyModel([(0.2, Throttled), (0.01, None)])
+
+    assert caller.call("primary", model) == {"model": "primary"}
+    assert len(model.calls) == 2
+    assert caller.stats["hedge_wins"] == 1
+
+
+def test_losing_duplicate_stream_is_closed():
+    class Stream:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    streams = []
+
+    def open_stream(model_id):
+        stream = Stream()
+        streams.append(stream)
+        time.sleep(0.1 if len(streams) == 1 else 0.01)
+        return {"stream": stream}
+
+    caller = _caller(hedge_budget=1.0)
+    _warm(caller)
+    result = caller.call("primary", open_stream)
+    time.sleep(0.05)
+
+    assert len(streams) == 2
+    assert result["stream"] is streams[0]
+    assert not streams[0].closed and streams[1].closed
+
+
+def test_streams_are_not_hedged_and_use_their_own_latency_window():
+    caller = _caller(hedge_budget=1.0)
+    _warm(caller, operation="converse")
+    model = FaultyModel(latency=0.05)
+
+    caller.call("primary", model, operation="converse_stream", hedge=False)
+
+    assert len(model.calls) == 1
+    assert len(caller.latency("primary", "converse_stream").samples) == 1
+    assert len(caller.latency("primary", "converse").samples) == 20
+
+
+def test_deadline_bounds_retries():
+    slept = []
+    caller = _caller(hedge=False, fallback_model_ids=[], max_attempts=10, sleep=slept.append)
+    model = FaultyModel([(0.03, Throttled)] * 10)
+
+    with pytest.raises(TimeoutError):
+        caller.call("primary", model, deadline=0.1)
+    assert len(model.calls) < 10
+
+
+def test_attempts_get_the_time_left_before_the_deadline():
+    timeouts = []
+
+    def slow(model_id, timeout):
+        timeouts.append(timeout)
+        time.sleep(min(timeout, 1.0))
+        raise TimeoutError("attempt timed out")
+
+    caller = _caller(hedge=False, fallback_model_ids=[], max_attempts=3)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        caller.call("primary", slow, deadline=0.2, attempt_timeout=True)
+
+    assert time.monotonic() - started < 1.0
+    assert timeouts[0] <= 0.2 and all(later <= 0.05 for later in timeouts[1:])
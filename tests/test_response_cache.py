@@ -0,0 +1,56 @@
+from utils.response_cache import ResponseCache
+
+CONTEXT = {"genre": "Afrobeats", "target_markets": ["Nigeria"], "budget": "Low"}
+TIKTOK = "How much should I spend on TikTok ads for my new single?"
+
+
+def test_exact_lookup_is_the_default():
+    cache = ResponseCache(path=None)
+    cache.put(TIKTOK, CONTEXT, "tiktok answer")
+
+    assert cache.get("how much should i spend on tiktok ads for my new single", CONTEXT) == "tiktok answer"
+    assert cache.get("How much should I spend on radio ads for my new single?", CONTEXT) is None
+    assert cache.get("How much should I spend on TikTok ads for my new single?", dict(CONTEXT, budget="High")) is None
+
+
+def test_similar_prompts_must_ask_about_the_same_things():
+    cache = ResponseCache(path=None, similarity_threshold=0.5)
+    cache.put(TIKTOK, CONTEXT, "tiktok answer")
+
+    for prompt in ("How much should I spend on radio ads for my new single?",
+                   "How much should I spend on Instagram ads for my new single?",
+                   "How much should I not spend on TikTok ads for my new single?"):
+        assert cache.get(prompt, CONTEXT) is None, prompt
+
+    assert cache.get("How much should we spend on TikTok ads for our new single?", CONTEXT) == "tiktok answer"
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    ResponseCache(path=path).put(TIKTOK, CONTEXT, "tiktok answer")
+
+    assert ResponseCache(path=path).get(TIKTOK, CONTEXT) == "tiktok answer"
+
+
+def test_rephrasings_match_but_reordered_topics_do_not():
+    cache = ResponseCache(path=None, similarity_threshold=0.9)
+    cache.put("What are the best ways to promote my singles on radio?", CONTEXT, "radio answer")
+    cache.put("Should I tour Nigeria before Ghana?", CONTEXT, "nigeria first")
+
+    assert cache.get("How do I promote my single on radio", CONTEXT) == "radio answer"
+    assert cache.get("Should I tour Ghana before Nigeria?", CONTEXT) is None
+
+
+def test_hits_write_last_access_at_most_once_per_interval(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"), touch_interval=300)
+    cache.put(TIKTOK, CONTEXT, "tiktok answer")
+    writes = cache._db.total_changes
+
+    for _ in range(5):
+        assert cache.get(TIKTOK, CONTEXT) == "tiktok answer"
+    assert cache._db.total_changes == writes
+
+    cache.touch_interval = 0
+    cache.get(TIKTOK, CONTEXT)
+    assert cache._db.total_changes == writes + 1
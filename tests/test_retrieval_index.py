@@ -0,0 +1,62 @@
+import zlib
+
+import numpy as np
+
+from utils.retrieval_index import RetrievalIndex
+from utils.context_builder import tokenize
+
+
+def _embedder(texts):
+    """Deterministic bag-of-words vectors, enough to exercise the vector path"""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for term in tokenize(text):
+            vectors[row, zlib.crc32(term.encode()) % 64] += 1
+    return vectors
+
+
+def _docs(results):
+    return sorted({(passage.owner, passage.doc_id) for _, passage in results})
+
+
+def test_uploads_are_scoped_to_their_owner(tmp_path):
+    index = RetrievalIndex(path=str(tmp_path))
+    index.add_document("market:ghana", "Ghana streaming revenue and highlife playlists")
+    index.add_document("report.pdf", "Ghana highlife tour budget for alice", owner="alice")
+    index.add_document("report.pdf", "Ghana highlife label contract for bob", owner="bob")
+
+    assert _docs(index.search("ghana highlife", 10, owner="alice")) == [("", "market:ghana"), ("alice", "report.pdf")]
+    assert _docs(index.scoped("bob").search("ghana highlife", 10)) == [("", "market:ghana"), ("bob", "report.pdf")]
+    assert _docs(index.search("ghana highlife", 10)) == [("", "market:ghana")]
+
+    index.delete("report.pdf", owner="alice")
+    assert _docs(index.search("ghana highlife", 10, owner="bob")) == [("", "market:ghana"), ("bob", "report.pdf")]
+
+
+def test_sees_documents_written_by_another_process(tmp_path):
+    reader = RetrievalIndex(path=str(tmp_path), embedder=_embedder)
+    writer = RetrievalIndex(path=str(tmp_path), embedder=_embedder)
+    assert reader.search("kenya gengetone") == []
+
+    writer.add_document("market:kenya", "Kenya gengetone and bongo flava streaming")
+    writer.add_document("notes.txt", "Kenya gengetone release plan", owner="carol")
+    results = reader.search("kenya gengetone", owner="carol")
+
+    assert _docs(results) == [("", "market:kenya"), ("carol", "notes.txt")]
+    assert len(reader._vector_rows) == len(writer._vector_rows) == 2
+
+    reader.delete("notes.txt", owner="carol")
+    assert writer.documents(owner="carol") == ["market:kenya"]
+
+
+def test_scores_ignore_other_owners_passages(tmp_path):
+    index = RetrievalIndex(path=str(tmp_path))
+    index.add_document("market:nigeria", "Nigeria afrobeats streaming on Boomplay and Audiomack")
+    index.add_document("plan.txt", "Afrobeats radio tour across Lagos and Abuja", owner="alice")
+    before = [(round(score, 9), passage.doc_id) for score, passage in index.search("afrobeats lagos", owner="alice")]
+
+    for n in range(5):
+        index.add_document(f"notes-{n}.txt", "afrobeats afrobeats lagos " * (n + 1), owner="bob")
+    after = [(round(score, 9), passage.doc_id) for score, passage in index.search("afrobeats lagos", owner="alice")]
+
+    assert after == before
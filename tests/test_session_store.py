@@ -0,0 +1,53 @@
+import pytest
+
+from utils.session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    kwargs = {"history_tokens": 100, "summary_tokens": 40, "max_transcript_turns": 8}
+    if request.param == "memory":
+        return InMemorySessionStore(**kwargs)
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), **kwargs)
+
+
+def test_transcript_keeps_turns_that_history_compacts(store):
+    for i in range(3):
+        store.append_exchange("s1", f"Question {i}: " + "word " * 60, f"Answer {i}. " + "detail " * 60)
+
+    history = store.load("s1")
+    transcript = store.messages("s1")
+
+    assert len(history.turns) < 6 and history.summary
+    assert [m["role"] for m in transcript] == ["user", "assistant"] * 3
+    assert transcript[0]["content"].startswith("Question 0:")
+
+
+def test_transcript_is_bounded_and_sessions_are_separate(store):
+    for i in range(6):
+        store.append_exchange("s1", f"q{i}", f"a{i}")
+    store.append_exchange("s2", "other", "reply")
+
+    assert [m["content"] for m in store.messages("s1")] == ["q2", "a2", "q3", "a3", "q4", "a4", "q5", "a5"]
+    assert store.messages("s2") == [{"role": "user", "content": "other"}, {"role": "assistant", "content": "reply"}]
+
+    store.delete("s1")
+    assert store.messages("s1") == [] and not store.load("s1").turns
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoTranscript(SessionStore):
+        def _read(self, session_id):
+            return None
+
+        def _update(self, session_id, change, turns):
+            return change(None)
+
+        def delete(self, session_id):
+            pass
+
+        def purge_expired(self):
+            return 0
+
+    with pytest.raises(TypeError, match="_transcript"):
+        NoTranscript()
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_callers_on_different_loops_share_one_call():
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    async def work():
+        calls.append(1)
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return "result"
+
+    def caller():
+        return asyncio.run(flights.run("nigeria", work))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(caller) for _ in range(4)]
+        while flights.stats["calls"] + flights.stats["coalesced"] < 4:
+            time.sleep(0.005)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["result"] * 4
+    assert calls == [1]
+    assert flights.stats == {"calls": 1, "coalesced": 3}
+    assert len(flights) == 0
+
+
+def test_errors_reach_every_waiter_and_the_next_call_retries():
+    flights = SingleFlight()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.02)
+        if len(attempts) == 1:
+            raise RuntimeError("scrape failed")
+        return "ok"
+
+    async def run_twice():
+        return await asyncio.gather(flights.run("ghana", flaky), flights.run("ghana", flaky),
+                                    return_exceptions=True)
+
+    first, second = asyncio.run(run_twice())
+    assert isinstance(first, RuntimeError) and first is second
+
+    assert asyncio.run(flights.run("ghana", flaky)) == "ok"
+    assert len(attempts) == 2
+
+
+def test_a_caller_giving_up_does_not_cancel_the_shared_work():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        impatient = asyncio.ensure_future(flights.run("kenya", slow))
+        patient = asyncio.ensure_future(flights.run("kenya", slow))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_spawn_joins_the_running_call():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    async def work():
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        return "refreshed"
+
+    first = flights.spawn("senegal", work)
+    second = flights.spawn("senegal", work)
+    assert first is second and flights.in_flight("senegal")
+
+    release.set()
+    assert first.result(timeout=5) == "refreshed"
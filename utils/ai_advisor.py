@@ -1,23 +1,61 @@
 from typing import Dict, List, Optional
 import openai
 from datetime import datetime
-import pandas as pd
 from pathlib import Path
 import docx
 import PyPDF2
-import json
+import io
+import secrets
+
+from .context_builder import ChunkIndex, ContextBuilder, ConversationMemory
+from .extraction_cache import ExtractionCache, content_hash, get_extraction_cache
+from .llm_engine import LLMEngine, get_engine
+
+SYSTEM_PROMPT = """You are an expert AI advisor for the African music industry. 
+You provide advice based on market data, cultural context, and industry best practices.
+Always consider cultural authenticity and ethical implications in your recommendations."""
 
 class AIAdvisor:
-    def __init__(self, openai_key: str):
-        self.openai_client = openai.OpenAI(api_key=openai_key)
-        self.conversation_history = []
+    def __init__(self, openai_key: str, engine: Optional[LLMEngine] = None,
+                 cache: Optional[ExtractionCache] = None, retrieval_index=None,
+                 owner: Optional[str] = None):
+        self.openai_client = openai.AsyncOpenAI(api_key=openai_key)
+        self.engine = engine or get_engine()
+        self.cache = cache or get_extraction_cache()
+        self.memory = ConversationMemory()
+        # A shared RetrievalIndex also grounds answers in market data; uploads are stored under
+        # owner (random per advisor by default) so other users' searches never see them
+        self.owner = owner or secrets.token_hex(16)
+        self.doc_index = retrieval_index.scoped(self.owner) if retrieval_index is not None else ChunkIndex()
+        self.context_builder = ContextBuilder()
         self.uploaded_docs = {}
+
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Recent turns kept verbatim; older ones live in memory.summary"""
+        return self.memory.messages()
         
     def process_document(self, file, filename: str) -> Dict:
         """Process uploaded documents and extract content"""
-        content = ""
         file_type = Path(filename).suffix.lower()
+        data = file.read()
+        key = content_hash(data) + file_type
+        content = self.cache.get("advisor_text", key)
+        if content is None:
+            content = self._extract_text(io.BytesIO(data), file_type)
+            self.cache.put("advisor_text", key, content)
         
+        self.uploaded_docs[filename] = {
+            'content': content,
+            'uploaded_at': datetime.now().isoformat(),
+            'type': file_type
+        }
+        self.doc_index.add_document(filename, content)
+        
+        return {'status': 'success', 'message': f'Processed {filename}'}
+
+    def _extract_text(self, file, file_type: str) -> str:
+        content = ""
         if file_type == '.pdf':
             pdf_reader = PyPDF2.PdfReader(file)
             for page in pdf_reader.pages:
@@ -27,53 +65,40 @@ class AIAdvisor:
             content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
         elif file_type == '.txt':
             content = file.read().decode('utf-8')
-        
-        self.uploaded_docs[filename] = {
-            'content': content,
-            'uploaded_at': datetime.now().isoformat(),
-            'type': file_type
-        }
-        
-        return {'status': 'success', 'message': f'Processed {filename}'}
+        return content
 
     async def get_advice(self, query: str, context: Optional[Dict] = None) -> Dict:
         """Get AI advice based on query and context"""
         
-        # Build the context prompt
-        context_prompt = ""
-        if context:
-            context_prompt += f"\nMarket Context: {json.dumps(context)}\n"
-        
-        # Add document context if referenced
-        if "document" in query.lower() or "file" in query.lower():
-            context_prompt += "\nUploaded Documents:\n"
-            for filename, doc in self.uploaded_docs.items():
-                context_prompt += f"\n{filename} content:\n{doc['content'][:1000]}..."
-
-        messages = [
-            {"role": "system", "content": """You are an expert AI advisor for the African music industry. 
-             You provide advice based on market data, cultural context, and industry best practices.
-             Always consider cultural authenticity and ethical implications in your recommendations."""},
-            {"role": "user", "content": f"{context_prompt}\n\nQuery: {query}"}
-        ]
-        
-        # Add relevant conversation history
-        messages.extend(self.conversation_history[-5:])  # Last 5 exchanges
+        # History, summary and only the most relevant document passages, within the token budget
+        messages, info = self.context_builder.build(
+            SYSTEM_PROMPT, query, context, self.memory, self.doc_index
+        )
         
-        response = await self.openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            temperature=0.7
+        response = await self.engine.run(
+            "openai",
+            lambda: self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                temperature=0.7
+            ),
+            estimated_tokens=info["prompt_tokens"]
         )
         
         advice = response.choices[0].message.content
         
         # Update conversation history
-        self.conversation_history.append({"role": "user", "content": query})
-        self.conversation_history.append({"role": "assistant", "content": advice})
+        self.memory.add("user", query)
+        self.memory.add("assistant", advice)
         
         return {
             "advice": advice,
-            "context_used": bool(context_prompt),
-            "docs_referenced": len(self.uploaded_docs)
-        } 
\ No newline at end of file
+            "context_used": bool(context) or bool(info["sources"]),
+            "docs_referenced": len(info["sources"]),
+            "sources": info["sources"],
+            "prompt_tokens": info["prompt_tokens"]
+        } 
+
+    def get_advice_sync(self, query: str, context: Optional[Dict] = None) -> Dict:
+        """Blocking wrapper for synchronous callers such as Streamlit scripts"""
+        return self.engine.run_sync(self.get_advice(query, context))
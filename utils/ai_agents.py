@@ -1,99 +1,251 @@
-"""Configuration settings for the application."""
-
-# AWS Configuration
-AWS_CONFIG = {
-    "region_name": "us-east-1",
-    "model_id": "anthropic.claude-3-sonnet-20240229-v1:0",
-    "max_tokens": 1000,
-    "temperature": 0.7
-}
-
-# Logging Configuration
-LOGGING_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "standard": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        },
-    },
-    "handlers": {
-        "file": {
-            "class": "logging.FileHandler",
-            "filename": "app.log",
-            "formatter": "standard"
-        },
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "standard"
-        }
-    },
-    "loggers": {
-        "": {
-            "handlers": ["console", "file"],
-            "level": "INFO",
-        }
-    }
-}
-
-# Streamlit Configuration
-STREAMLIT_CONFIG = {
-    "page_title": "African Music Marketing Assistant",
-    "page_icon": "🎵",
-    "layout": "wide",
-    "initial_sidebar_state": "expanded"
-}
-
-import boto3
 import json
-from typing import Dict, Optional
+import time
+from typing import Dict, Iterator, List, Optional
 import logging
 
+from .aws_utils import get_bedrock_client
+from .config import RETRIEVAL_CONFIG
+from .context_builder import ConversationMemory
+from .llm_engine import LLMEngine, estimate_tokens, get_engine
+from .metrics import get_metrics, span, timed
+from .prompt_templates import PromptAssembler, format_context, usage_metrics
+from .resilience import ResilientCaller, get_resilient_caller
+from .response_cache import ResponseCache
+from .session_store import SessionStore
+
 logger = logging.getLogger(__name__)
 
 class AfricanMusicAIAgent:
-    def __init__(self):
-        self.bedrock = boto3.client('bedrock-runtime')
+    def __init__(self, bedrock_client=None, response_cache: Optional[ResponseCache] = None,
+                 engine: Optional[LLMEngine] = None, resilience: Optional[ResilientCaller] = None,
+                 retrieval_index=None, prompts: Optional[PromptAssembler] = None,
+                 session_store: Optional[SessionStore] = None):
+        # A pre-built client (or a local fake exposing converse/converse_stream) can be injected;
+        # otherwise every agent shares the process-wide runtime client and its connection pool
+        self.bedrock = bedrock_client or get_bedrock_client('bedrock-runtime')
         self.model_id = "anthropic.claude-3-sonnet-20240229-v1:0"
+        self.inference_config = {
+            "maxTokens": 4096,
+            "temperature": 0.7
+        }
+        # All Bedrock calls are admitted through the shared engine's concurrency and rate limits
+        self.engine = engine or get_engine()
+        # Retries, hedging, circuit breaking and fallback to cheaper models
+        self.resilience = resilience or get_resilient_caller()
+        # Shared across sessions by the app; None disables caching
+        self.response_cache = response_cache
+        # Optional RetrievalIndex; its most relevant passages are added to each prompt
+        self.retrieval_index = retrieval_index
+        # System prompt + context form a stable, cacheable prefix; see utils.prompt_templates
+        self.prompts = prompts or PromptAssembler()
+        inactive = self.prompts.caching_inactive_reason(self.model_id)
+        if inactive:
+            logger.info(f"Bedrock prompt caching is inactive: {inactive}")
+        # Optional server-side history; calls with a session_id continue that conversation
+        self.session_store = session_store
+        # Timing and token usage of the most recent call (latencies in seconds)
+        self.last_metrics: Dict = {}
 
-    def get_advice(self, prompt, context):
-        try:
-            # Format context into string
-            context_str = "\n".join([f"{k}: {v}" for k,v in context.items()])
-            
-            # Create the conversation messages
-            conversation = [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "text": f"As an AI expert in African music marketing and promotion, please provide advice based on this context:\n\n{context_str}\n\nQuestion: {prompt}"
-                        }
-                    ]
-                }
-            ]
+    @timed("advice.retrieve")
+    def _retrieve(self, prompt: str, context: Dict, session_id: Optional[str] = None) -> List:
+        """Top shared and session-owned passages for the question, within the grounding token budget"""
+        if self.retrieval_index is None:
+            return []
+        query = " ".join([prompt, str(context.get("genre", "")),
+                          *map(str, context.get("target_markets") or [])])
+        passages, used = [], 0
+        for _, passage in self.retrieval_index.search(query, RETRIEVAL_CONFIG["top_k"], owner=session_id):
+            if used + passage.tokens > RETRIEVAL_CONFIG["grounding_tokens"]:
+                continue
+            passages.append(passage)
+            used += passage.tokens
+        return passages
+
+    def _cache_context(self, context: Dict, passages: List) -> Dict:
+        """Cache answers per prompt version and, when grounded, per set of passages"""
+        cache_context = dict(context, prompt_version=self.prompts.template.version)
+        if passages:
+            cache_context["grounding"] = [passage.chunk_id for passage in passages]
+        return cache_context
+
+    def _load_history(self, session_id: Optional[str]) -> Optional[ConversationMemory]:
+        """The session's compacted history, or None for a new or unknown session"""
+        if self.session_store is None or session_id is None:
+            return None
+        memory = self.session_store.load(session_id)
+        return memory if memory.turns or memory.summary else None
+
+    def _record_exchange(self, session_id: Optional[str], prompt: str, advice: str):
+        if self.session_store is not None and session_id is not None and advice:
+            self.session_store.append_exchange(session_id, prompt, advice)
+
+    def _build_conversation(self, prompt: str, passages: List = (),
+                            history: Optional[ConversationMemory] = None) -> List[Dict]:
+        """Per-call part of the prompt: recent turns, reference passages and the question"""
+        return self.prompts.messages(prompt, passages, history.turns if history else ())
 
+    def _cached_advice(self, prompt: str, context: Dict, start: float) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        cached = self.response_cache.get(prompt, context)
+        get_metrics().record_cache("response", cached is not None)
+        if cached is not None:
+            total = time.perf_counter() - start
+            self.last_metrics = {
+                "time_to_first_token": total,
+                "total_latency": total,
+                "cache_hit": True
+            }
+        return cached
+
+    def _store_advice(self, prompt: str, context: Dict, advice: str):
+        if self.response_cache is not None and advice:
+            self.response_cache.put(prompt, context, advice)
+
+    def _call_bedrock(self, operation, messages: List[Dict], context: Dict,
+                      history: Optional[ConversationMemory] = None):
+        summary = history.summary if history else ""
+        estimated = estimate_tokens(
+            self.prompts.template.system + format_context(context) + summary + json.dumps(messages),
+            self.inference_config["maxTokens"]
+        )
+        served_by = {"model_id": self.model_id}
+        name = getattr(operation, "__name__", "call")
+
+        def attempt(model_id: str, timeout: Optional[float] = None):
+            served_by["model_id"] = model_id
+            with span(f"bedrock.{name}", model=model_id):
+                return self.engine.call_blocking(
+                    "bedrock",
+                    operation,
+                    modelId=model_id,
+                    # Built per candidate: only some models accept cache points
+                    system=self.prompts.system(context, model_id, summary),
+                    messages=messages,
+                    inferenceConfig=self.inference_config,
+                    estimated_tokens=estimated,
+                    # The rest of the overall deadline, so one slow attempt can't outlive it
+                    timeout=timeout
+                )
+
+        # Each attempt is admitted separately so backoff sleeps don't hold an engine slot
+        # A hedged stream would pay for two generations, so only whole responses are hedged
+        response = self.resilience.call(self.model_id, attempt, operation=name,
+                                        hedge=name != "converse_stream", attempt_timeout=True)
+        # The model that answered (a fallback after retries), for per-model token and cost metrics
+        return response, served_by["model_id"]
+
+    @timed("advice.get_advice")
+    def get_advice(self, prompt, context, session_id: Optional[str] = None):
+        start = time.perf_counter()
+        history = self._load_history(session_id)
+        passages = self._retrieve(prompt, context, session_id)
+        cache_context = self._cache_context(context, passages)
+        # Follow-up answers depend on the conversation: don't serve or store them in the cache
+        cached = None if history else self._cached_advice(prompt, cache_context, start)
+        if cached is not None:
+            self._record_exchange(session_id, prompt, cached)
+            return {
+                "status": "success",
+                "advice": cached
+            }
+        try:
             # Use the converse API
-            response = self.bedrock.converse(
-                modelId=self.model_id,
-                messages=conversation,
-                inferenceConfig={
-                    "maxTokens": 4096,
-                    "temperature": 0.7
-                }
+            response, model_id = self._call_bedrock(
+                self.bedrock.converse, self._build_conversation(prompt, passages, history), context, history
             )
-            
+
             # Extract response text
             response_text = response["output"]["message"]["content"][0]["text"]
-            
+
+            total = time.perf_counter() - start
+            self.last_metrics = {
+                "time_to_first_token": total,
+                "total_latency": total,
+                "cache_hit": False,
+                "model_id": model_id,
+                "prompt_version": self.prompts.template.version,
+                "history_turns": len(history.turns) if history else 0,
+                **usage_metrics(response.get("usage"))
+            }
+            get_metrics().record_usage(model_id, self.last_metrics)
+            if history is None:
+                self._store_advice(prompt, cache_context, response_text)
+            self._record_exchange(session_id, prompt, response_text)
+
             return {
                 "status": "success",
                 "advice": response_text
             }
-                
+
         except Exception as e:
             logger.error(f"Error getting advice: {str(e)}")
             return {
-                "status": "error", 
+                "status": "error",
                 "advice": f"I'm currently experiencing technical difficulties: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+    def stream_advice(self, prompt: str, context: Dict, session_id: Optional[str] = None) -> Iterator[str]:
+        """Yield advice text deltas as they arrive from the converse-stream API.
+
+        Errors are logged and re-raised so the caller can decide how to show them.
+        Timings are written to ``last_metrics`` once the stream is exhausted.
+        """
+        start = time.perf_counter()
+        history = self._load_history(session_id)
+        passages = self._retrieve(prompt, context, session_id)
+        cache_context = self._cache_context(context, passages)
+        cached = None if history else self._cached_advice(prompt, cache_context, start)
+        if cached is not None:
+            self._record_exchange(session_id, prompt, cached)
+            yield cached
+            return
+
+        first_token: Optional[float] = None
+        chunks: List[str] = []
+        usage: Optional[Dict] = None
+        self.last_metrics = {}
+        try:
+            # Only opening the stream is admitted through the engine; deltas are read here
+            response, model_id = self._call_bedrock(
+                self.bedrock.converse_stream, self._build_conversation(prompt, passages, history), context, history
+            )
+
+            for event in response["stream"]:
+                if "contentBlockDelta" in event:
+                    text = event["contentBlockDelta"]["delta"].get("text")
+                    if text:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        chunks.append(text)
+                        yield text
+                elif "metadata" in event:
+                    usage = event["metadata"].get("usage")
+        except Exception as e:
+            logger.error(f"Error streaming advice: {str(e)}")
+            get_metrics().inc("stage_errors_total", stage="advice.stream_advice")
+            raise
+
+        self.last_metrics = {
+            "time_to_first_token": first_token,
+            "total_latency": time.perf_counter() - start,
+            "cache_hit": False,
+            "model_id": model_id,
+            "prompt_version": self.prompts.template.version,
+            "history_turns": len(history.turns) if history else 0,
+            **usage_metrics(usage)
+        }
+        metrics = get_metrics()
+        metrics.record_usage(model_id, self.last_metrics)
+        metrics.observe("stage_latency_seconds", self.last_metrics["total_latency"], stage="advice.stream_advice")
+        if first_token is not None:
+            metrics.observe("time_to_first_token_seconds", first_token, model=model_id)
+        advice = "".join(chunks)
+        if history is None:
+            self._store_advice(prompt, cache_context, advice)
+        self._record_exchange(session_id, prompt, advice)
+        logger.info(
+            f"Streamed advice: first token after {first_token if first_token is not None else float('nan'):.2f}s, "
+            f"total {self.last_metrics['total_latency']:.2f}s, "
+            f"{self.last_metrics['cache_read_input_tokens']}/{self.last_metrics['input_tokens']} input tokens from prompt cache"
+        )
@@ -1,37 +1,97 @@
 import boto3
-from botocore.exceptions import ClientError
+from botocore.config import Config
 import logging
 import json
 import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from .config import AWS_CONFIG
+from .resilience import get_resilient_caller
 
 logger = logging.getLogger(__name__)
 
+# Process-wide client registry. boto3 clients are thread-safe once built, but
+# sessions are not, so creation happens under a lock and every caller shares
+# the same client (and its HTTP connection pool) per service/region/credentials.
+_registry_lock = threading.Lock()
+_sessions: Dict[Tuple, boto3.session.Session] = {}
+_clients: Dict[Tuple, object] = {}
+
+
+def _client_config() -> Config:
+    return Config(
+        max_pool_connections=AWS_CONFIG["max_pool_connections"],
+        tcp_keepalive=AWS_CONFIG["tcp_keepalive"],
+        connect_timeout=AWS_CONFIG["connect_timeout"],
+        read_timeout=AWS_CONFIG["read_timeout"]
+    )
+
+
+def get_bedrock_client(service_name: str = "bedrock-runtime",
+                       region_name: Optional[str] = None,
+                       aws_access_key_id: Optional[str] = None,
+                       aws_secret_access_key: Optional[str] = None):
+    """Return the shared boto3 client for a service, creating it on first use"""
+    key = (service_name, region_name, aws_access_key_id, aws_secret_access_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            session_key = (aws_access_key_id, aws_secret_access_key)
+            session = _sessions.get(session_key)
+            if session is None:
+                session = boto3.session.Session(
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key
+                )
+                _sessions[session_key] = session
+            client = session.client(
+                service_name,
+                region_name=region_name,
+                config=_client_config()
+            )
+            _clients[key] = client
+            logger.info(f"Created shared {service_name} client (region={region_name or 'default'})")
+        return client
+
+
+def clear_client_registry():
+    """Drop all shared clients, e.g. after rotating credentials"""
+    with _registry_lock:
+        _clients.clear()
+        _sessions.clear()
+
+
 class BedrockClients:
     def __init__(self, region_name: str = "us-east-1"):
         """Initialize Bedrock clients with basic IAM credentials"""
         # Get basic credentials
         access_key = os.getenv('AWS_ACCESS_KEY_ID')
         secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        
+
         if not access_key or not secret_key:
             raise ValueError(
                 "Missing required AWS credentials: AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY "
                 "must be set in your environment variables."
             )
-        
-        # Initialize clients with basic credentials
-        self.bedrock = boto3.client(
+
+        # Reuse the process-wide clients for these credentials
+        self.bedrock = get_bedrock_client(
             "bedrock",
+            region_name=region_name,
             aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name=region_name
+            aws_secret_access_key=secret_key
         )
-        
-        self.runtime = boto3.client(
+
+        self.runtime = get_bedrock_client(
             "bedrock-runtime",
+            region_name=region_name,
             aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name=region_name
+            aws_secret_access_key=secret_key
         )
 
     def invoke_model(self, prompt: str, model_id: str, max_tokens: int = 1000, temperature: float = 0.7):
@@ -43,15 +103,19 @@ class BedrockClients:
                 "messages": [{"role": "user", "content": prompt}],
                 "temperature": temperature
             }
-            
-            response = self.runtime.invoke_model(
-                modelId=model_id,
-                body=json.dumps(body)
+
+            response = get_resilient_caller().call(
+                model_id,
+                lambda candidate: self.runtime.invoke_model(
+                    modelId=candidate,
+                    body=json.dumps(body)
+                ),
+                operation="invoke_model"
             )
-            
+
             response_body = json.loads(response['body'].read())
             return response_body['content'][0]['text']
-            
+
         except Exception as e:
             logger.error(f"Error invoking model: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,359 @@
+"""Batch advice generation for campaign planning.
+
+Usage:
+    python -m utils.batch_advice -o advice.jsonl [--jobs jobs.jsonl] [--concurrency N]
+    python -m utils.batch_advice -o advice.jsonl --backend bedrock-batch \\
+        --input-s3 s3://bucket/in/ --output-s3 s3://bucket/out/ --role-arn arn:aws:iam::...
+
+Without ``--jobs`` every genre x target market x budget combination from
+MARKETING_OPTIONS is generated. Identical jobs (after prompt/context
+normalization) run once. Results are appended to the output file as they
+finish, and jobs already recorded there as successful are skipped, so an
+interrupted run resumes where it stopped.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .config import AWS_CONFIG, BATCH_ADVICE_CONFIG, MARKETING_OPTIONS
+from .metrics import estimate_cost, get_metrics
+from .prompt_templates import PromptAssembler, format_context
+from .response_cache import normalize_context, normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AdviceJob:
+    prompt: str
+    context: Dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        """Same key for jobs that differ only in case, punctuation or list order"""
+        text = f"{normalize_prompt(self.prompt)}\x00{normalize_context(self.context)}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def campaign_jobs(prompt: str = BATCH_ADVICE_CONFIG["prompt"],
+                  genres: Iterable[str] = MARKETING_OPTIONS["genres"],
+                  markets: Iterable[str] = MARKETING_OPTIONS["target_markets"],
+                  budgets: Iterable[str] = MARKETING_OPTIONS["budgets"]) -> List[AdviceJob]:
+    """One job per genre x market x budget, with the same context shape as app.py"""
+    return [
+        AdviceJob(prompt.format(genre=genre, market=market, budget=budget.lower()),
+                  {"genre": genre, "target_markets": [market], "budget": budget})
+        for genre, market, budget in itertools.product(genres, markets, budgets)
+    ]
+
+
+def load_jobs(path: str) -> List[AdviceJob]:
+    """Read {"prompt": ..., "context": {...}} lines"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [AdviceJob(record["prompt"], record.get("context") or {})
+                for record in map(json.loads, filter(str.strip, f))]
+
+
+class RealtimeBackend:
+    """Runs jobs through AfricanMusicAIAgent.get_advice on a thread pool.
+
+    Each worker thread gets its own agent (they share the Bedrock client,
+    response cache and LLM engine), so per-call metrics don't interleave. The
+    engine's provider limits pace the actual requests.
+    """
+
+    batch = False
+
+    def __init__(self, agent_factory: Optional[Callable] = None,
+                 concurrency: int = BATCH_ADVICE_CONFIG["concurrency"]):
+        self.agent_factory = agent_factory or _default_agent
+        self.concurrency = concurrency
+        self._local = threading.local()
+        self.model_id = AWS_CONFIG["model_id"]
+
+    def _agent(self):
+        if not hasattr(self._local, "agent"):
+            self._local.agent = self.agent_factory()
+            self.model_id = self._local.agent.model_id
+        return self._local.agent
+
+    def _run_one(self, job: AdviceJob) -> Dict:
+        start = time.perf_counter()
+        agent = self._agent()
+        agent.last_metrics = {}
+        result = agent.get_advice(job.prompt, job.context)
+        record = {"status": result["status"]}
+        if result["status"] == "success":
+            record["advice"] = result["advice"]
+        else:
+            record["error"] = result["advice"]
+        record.update({k: v for k, v in agent.last_metrics.items() if k.endswith("tokens")})
+        record["cache_hit"] = agent.last_metrics.get("cache_hit", False)
+        record["seconds"] = time.perf_counter() - start
+        return record
+
+    def run(self, jobs: List[AdviceJob], on_result: Callable[[AdviceJob, Dict], None], state_path: str):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch-advice") as pool:
+            futures = {pool.submit(self._run_one, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {"status": "error", "error": str(e)}
+                on_result(job, record)
+
+
+class BedrockBatchBackend:
+    """Bedrock batch inference: JSONL in S3, one model invocation job, results read back.
+
+    ``bedrock`` and ``s3`` only need the boto3 methods used here
+    (create_model_invocation_job / get_model_invocation_job, put_object /
+    list_objects_v2 / get_object), so local stubs can stand in for testing.
+    The submitted job ARN is saved to ``state_path`` and polled again on resume
+    instead of being resubmitted. Bedrock requires a minimum number of records
+    per job (100 for Anthropic models at the time of writing).
+    """
+
+    batch = True
+    _terminal = ("Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired")
+
+    def __init__(self, input_s3_uri: str, output_s3_uri: str, role_arn: str,
+                 model_id: str = AWS_CONFIG["model_id"], bedrock=None, s3=None,
+                 prompts: Optional[PromptAssembler] = None,
+                 max_tokens: int = 4096,
+                 poll_interval: float = BATCH_ADVICE_CONFIG["poll_interval"]):
+        from .aws_utils import get_bedrock_client
+        self.input_s3_uri = input_s3_uri.rstrip("/") + "/"
+        self.output_s3_uri = output_s3_uri.rstrip("/") + "/"
+        self.role_arn = role_arn
+        self.model_id = model_id
+        self.bedrock = bedrock or get_bedrock_client("bedrock")
+        self.s3 = s3 or get_bedrock_client("s3")
+        self.prompts = prompts or PromptAssembler()
+        self.max_tokens = max_tokens
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def _split_uri(uri: str):
+        bucket, _, key = uri[len("s3://"):].partition("/")
+        return bucket, key
+
+    def _record(self, job: AdviceJob) -> Dict:
+        system = "\n\n".join(filter(None, [self.prompts.template.system, format_context(job.context)]))
+        text = self.prompts.question_text(job.prompt)
+        return {
+            "recordId": job.key,
+            "modelInput": {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": self.max_tokens,
+                "system": system,
+                "messages": [{"role": "user", "content": [{"type": "text", "text": text}]}]
+            }
+        }
+
+    def _submit(self, jobs: List[AdviceJob]) -> str:
+        name = f"advice-{int(time.time())}"
+        bucket, prefix = self._split_uri(self.input_s3_uri)
+        body = "\n".join(json.dumps(self._record(job)) for job in jobs).encode("utf-8")
+        self.s3.put_object(Bucket=bucket, Key=f"{prefix}{name}.jsonl", Body=body)
+        response = self.bedrock.create_model_invocation_job(
+            jobName=name,
+            roleArn=self.role_arn,
+            modelId=self.model_id,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"{self.input_s3_uri}{name}.jsonl"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": self.output_s3_uri}}
+        )
+        logger.info(f"Submitted Bedrock batch job {response['jobArn']} with {len(jobs)} records")
+        return response["jobArn"]
+
+    def _wait(self, job_arn: str) -> str:
+        while True:
+            status = self.bedrock.get_model_invocation_job(jobIdentifier=job_arn)["status"]
+            if status in self._terminal:
+                return status
+            logger.info(f"Bedrock batch job {job_arn} is {status}")
+            time.sleep(self.poll_interval)
+
+    def _outputs(self, job_arn: str) -> Iterable[Dict]:
+        bucket, prefix = self._split_uri(self.output_s3_uri)
+        job_prefix = f"{prefix}{job_arn.rsplit('/', 1)[-1]}/"
+        listing = self.s3.list_objects_v2(Bucket=bucket, Prefix=job_prefix)
+        for item in listing.get("Contents", []):
+            if item["Key"].endswith(".jsonl.out"):
+                body = self.s3.get_object(Bucket=bucket, Key=item["Key"])["Body"].read().decode("utf-8")
+                yield from map(json.loads, filter(str.strip, body.splitlines()))
+
+    def run(self, jobs: List[AdviceJob], on_result: Callable[[AdviceJob, Dict], None], state_path: str):
+        state = {}
+        if os.path.exists(state_path):
+            with open(state_path, "r") as f:
+                state = json.load(f)
+        job_arn = state.get("job_arn")
+        if job_arn is None:
+            job_arn = self._submit(jobs)
+            with open(state_path, "w") as f:
+                json.dump({"job_arn": job_arn}, f)
+
+        start = time.perf_counter()
+        status = self._wait(job_arn)
+        if status not in ("Completed", "PartiallyCompleted"):
+            raise RuntimeError(f"Bedrock batch job {job_arn} ended as {status}")
+
+        by_key = {job.key: job for job in jobs}
+        seen = set()
+        for output in self._outputs(job_arn):
+            job = by_key.get(output.get("recordId"))
+            if job is None:
+                continue
+            seen.add(job.key)
+            model_output = output.get("modelOutput")
+            if model_output is None:
+                on_result(job, {"status": "error", "error": json.dumps(output.get("error"))})
+                continue
+            usage = model_output.get("usage", {})
+            on_result(job, {
+                "status": "success",
+                "advice": "".join(block.get("text", "") for block in model_output.get("content", [])),
+                "input_tokens": usage.get("input_tokens", 0),
+                "uncached_input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "seconds": time.perf_counter() - start
+            })
+        for job in jobs:
+            if job.key not in seen:
+                on_result(job, {"status": "error", "error": "missing from batch output"})
+        # Finished jobs are in the results file; a rerun should submit a fresh batch
+        os.remove(state_path)
+
+
+def _default_agent():
+    from .ai_agents import AfricanMusicAIAgent
+    return AfricanMusicAIAgent(response_cache=_shared_response_cache())
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def _shared_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                from .response_cache import ResponseCache
+                _response_cache = ResponseCache()
+    return _response_cache
+
+
+def _load_done(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {record["key"] for record in map(json.loads, filter(str.strip, f))
+                if record.get("status") == "success"}
+
+
+def run_batch(jobs: List[AdviceJob], output: str, backend=None) -> Dict:
+    """Dedupe jobs, run the ones not already in ``output`` and append their results.
+
+    Returns a summary with job counts, throughput, token totals and estimated cost.
+    """
+    backend = backend or RealtimeBackend()
+    done = _load_done(output)
+    unique: Dict[str, AdviceJob] = {}
+    for job in jobs:
+        unique.setdefault(job.key, job)
+    pending = [job for key, job in unique.items() if key not in done]
+
+    summary = {
+        "jobs": len(jobs),
+        "unique": len(unique),
+        "duplicates": len(jobs) - len(unique),
+        "already_done": len(unique) - len(pending),
+        "succeeded": 0,
+        "failed": 0,
+        "cache_hits": 0,
+        "input_tokens": 0,
+        "cache_read_input_tokens": 0,
+        "output_tokens": 0,
+        "cost_usd": 0.0
+    }
+    lock = threading.Lock()
+
+    start = time.perf_counter()
+    with open(output, "a", encoding="utf-8") as results:
+        def on_result(job: AdviceJob, record: Dict):
+            record = {"key": job.key, "prompt": job.prompt, "context": job.context, **record}
+            record["cost_usd"] = estimate_cost(backend.model_id, record, backend.batch)
+            if backend.batch and record["status"] == "success":
+                # Realtime calls are already counted by the agent
+                get_metrics().record_usage(backend.model_id, record, batch=True)
+            with lock:
+                results.write(json.dumps(record, default=str) + "\n")
+                results.flush()
+                if record["status"] == "success":
+                    summary["succeeded"] += 1
+                else:
+                    summary["failed"] += 1
+                    logger.error(f"Advice job {job.key} failed: {record.get('error')}")
+                summary["cache_hits"] += bool(record.get("cache_hit"))
+                for name in ("input_tokens", "cache_read_input_tokens", "output_tokens", "cost_usd"):
+                    summary[name] += record.get(name, 0)
+
+        if pending:
+            backend.run(pending, on_result, f"{output}.batch_state.json")
+
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = elapsed
+    summary["jobs_per_second"] = summary["succeeded"] / elapsed if elapsed else 0.0
+    summary["cost_per_job_usd"] = summary["cost_usd"] / summary["succeeded"] if summary["succeeded"] else 0.0
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate marketing advice for many prompts at once")
+    parser.add_argument("-o", "--output", required=True, help="Results file (.jsonl); also the resume checkpoint")
+    parser.add_argument("--jobs", default=None, help="JSONL of {prompt, context}; default: all sidebar combinations")
+    parser.add_argument("--prompt", default=BATCH_ADVICE_CONFIG["prompt"],
+                        help="Template for generated jobs ({genre}, {market}, {budget})")
+    parser.add_argument("--backend", choices=["realtime", "bedrock-batch"], default="realtime")
+    parser.add_argument("--concurrency", type=int, default=BATCH_ADVICE_CONFIG["concurrency"])
+    parser.add_argument("--input-s3", help="S3 prefix for batch input (bedrock-batch)")
+    parser.add_argument("--output-s3", help="S3 prefix for batch output (bedrock-batch)")
+    parser.add_argument("--role-arn", help="IAM role Bedrock assumes to read/write S3 (bedrock-batch)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    jobs = load_jobs(args.jobs) if args.jobs else campaign_jobs(args.prompt)
+    if args.backend == "bedrock-batch":
+        if not (args.input_s3 and args.output_s3 and args.role_arn):
+            parser.error("--backend bedrock-batch needs --input-s3, --output-s3 and --role-arn")
+        backend = BedrockBatchBackend(args.input_s3, args.output_s3, args.role_arn)
+    else:
+        backend = RealtimeBackend(concurrency=args.concurrency)
+
+    summary = run_batch(jobs, args.output, backend)
+    print(
+        f"{summary['succeeded']} succeeded, {summary['failed']} failed "
+        f"({summary['jobs']} jobs, {summary['duplicates']} duplicates, {summary['already_done']} already done) "
+        f"in {summary['seconds']:.1f}s: {summary['jobs_per_second']:.2f} jobs/s; "
+        f"{summary['input_tokens']} input tokens ({summary['cache_read_input_tokens']} from prompt cache), "
+        f"{summary['output_tokens']} output tokens, {summary['cache_hits']} response cache hits; "
+        f"estimated cost ${summary['cost_usd']:.4f} (${summary['cost_per_job_usd']:.4f}/job)"
+    )
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Batch ingestion of EPKs and market reports across a process pool.
+
+Usage:
+    python -m utils.batch_ingest <folder> -o results.jsonl [--workers N] [--format jsonl|parquet]
+
+Results are streamed to the output file as each document finishes. Files are
+hashed before they are queued: a document already in the manifest next to the
+output, or already queued under another path in this run, is not parsed again,
+so an interrupted run picks up where it left off.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .document_analyzer import EXTRACTION_FIELDS, DocumentAnalyzer
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+PARQUET_BATCH_SIZE = 256
+
+
+def file_hash(path: str) -> str:
+    """BLAKE2b of the file contents, read in chunks (matches extraction_cache.content_hash)"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extract_docx(path: str) -> Dict:
+    import docx
+    doc = docx.Document(path)
+    text = "\n".join(paragraph.text for paragraph in doc.paragraphs)
+    tables = [[[cell.text for cell in row.cells] for row in table.rows] for table in doc.tables]
+    return {
+        "text_content": [{"page": 1, "content": text}] if text.strip() else [],
+        "metadata": {
+            "title": doc.core_properties.title or "",
+            "author": doc.core_properties.author or "",
+            "subject": doc.core_properties.subject or "",
+            "keywords": doc.core_properties.keywords or "",
+            "page_count": 0
+        },
+        "tables": [{"page": 1, "tables": tables}] if tables else [],
+        "images": [],
+        "statistics": {
+            "word_count": len(text.split()),
+            "page_count": 0,
+            "image_count": 0,
+            "table_count": len(tables)
+        }
+    }
+
+
+# Per-worker-process state, set up by _init_worker
+_analyzer: Optional[DocumentAnalyzer] = None
+
+
+def _init_worker():
+    global _analyzer
+    # Deduplication happens in the parent, so workers never touch the extraction cache
+    _analyzer = DocumentAnalyzer()
+
+
+def _ingest_file(path: str, sha: str, fields: List[str]) -> Dict:
+    """Worker entry point: parse one file the parent has already hashed"""
+    start = time.perf_counter()
+    record = {"path": path, "sha": sha, "status": "success"}
+    try:
+        if path.lower().endswith(".pdf"):
+            # Opened by path so PyMuPDF reads pages on demand
+            record["extracted"] = _analyzer.extract(path, path, fields)
+        else:
+            record["extracted"] = _extract_docx(path)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+class _JsonlWriter:
+    def __init__(self, path: str):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict):
+        self.file.write(json.dumps(record, default=str) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Buffers flattened rows and appends them as Parquet row groups"""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.rows: List[Dict] = []
+        self.writer = None
+        self.part = 0
+
+    def write(self, record: Dict):
+        extracted = record.get("extracted") or {}
+        stats = extracted.get("statistics", {})
+        self.rows.append({
+            "path": record["path"],
+            "sha": record["sha"],
+            "status": record["status"],
+            "error": record.get("error"),
+            "seconds": record.get("seconds"),
+            "page_count": stats.get("page_count", 0),
+            "word_count": stats.get("word_count", 0),
+            "table_count": stats.get("table_count", 0),
+            "image_count": stats.get("image_count", 0),
+            "text": "\n".join(page["content"] for page in extracted.get("text_content", [])),
+            "extracted_json": json.dumps(extracted, default=str)
+        })
+        if len(self.rows) >= PARQUET_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = self.pa.Table.from_pylist(self.rows)
+        if self.writer is None:
+            # Resumed runs write a new part file rather than rewriting the old one
+            path = self.path
+            while os.path.exists(path):
+                self.part += 1
+                path = f"{self.path}.part{self.part}"
+            self.writer = self.pq.ParquetWriter(path, table.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _load_manifest(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def find_documents(folder: str, extensions: Iterable[str] = SUPPORTED_EXTENSIONS) -> List[str]:
+    extensions = tuple(ext.lower() for ext in extensions)
+    return sorted(
+        str(path) for path in Path(folder).rglob("*")
+        if path.is_file() and path.suffix.lower() in extensions
+    )
+
+
+def ingest_paths(paths: List[str],
+                 output: str,
+                 output_format: str = "jsonl",
+                 workers: Optional[int] = None,
+                 manifest: Optional[str] = None,
+                 fields: Iterable[str] = EXTRACTION_FIELDS) -> Dict:
+    """Parse documents on a process pool and stream results to ``output``.
+
+    Returns throughput statistics (files/s and pages/s over the parsed files).
+    """
+    workers = workers or os.cpu_count() or 1
+    manifest = manifest or f"{output}.manifest"
+    done_hashes = _load_manifest(manifest)
+    writer = _ParquetWriter(output) if output_format == "parquet" else _JsonlWriter(output)
+    stats = {"files": 0, "skipped": 0, "duplicates": 0, "errors": 0, "pages": 0}
+    fields = list(fields)
+    queued: Set[str] = set()
+
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool, \
+                open(manifest, "a") as manifest_file:
+            pending: Dict = {}
+            # Keep a bounded window of submitted files so memory stays flat on huge folders
+            for path in paths:
+                try:
+                    sha = file_hash(path)
+                except OSError as e:
+                    _record_error(writer, stats, {"path": path, "sha": None, "status": "error", "error": str(e)})
+                    continue
+                if sha in done_hashes:
+                    stats["skipped"] += 1
+                    continue
+                if sha in queued:
+                    stats["duplicates"] += 1
+                    continue
+                queued.add(sha)
+                pending[pool.submit(_ingest_file, path, sha, fields)] = (path, sha)
+                if len(pending) >= workers * 4:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    _collect(finished, pending, writer, manifest_file, stats)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(finished, pending, writer, manifest_file, stats)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = elapsed
+    stats["files_per_second"] = stats["files"] / elapsed if elapsed else 0.0
+    stats["pages_per_second"] = stats["pages"] / elapsed if elapsed else 0.0
+    return stats
+
+
+def _record_error(writer, stats: Dict, record: Dict):
+    writer.write(record)
+    stats["errors"] += 1
+    logger.error(f"Failed to ingest {record['path']}: {record['error']}")
+
+
+def _collect(finished, pending: Dict[object, Tuple[str, str]], writer, manifest_file, stats: Dict):
+    for future in finished:
+        path, sha = pending.pop(future)
+        try:
+            record = future.result()
+        except Exception as e:
+            # The worker itself died (e.g. a crash inside a parser), not just the extraction
+            record = {"path": path, "sha": sha, "status": "error", "error": f"worker failed: {str(e)}"}
+        if record["status"] == "error":
+            _record_error(writer, stats, record)
+            continue
+        writer.write(record)
+        stats["files"] += 1
+        stats["pages"] += record["extracted"]["statistics"]["page_count"]
+        # Only successful files are marked done so failures are retried on the next run
+        manifest_file.write(record["sha"] + "\n")
+        manifest_file.flush()
+
+
+def ingest_folder(folder: str, output: str, **kwargs) -> Dict:
+    """Ingest every supported document under ``folder``; see ingest_paths"""
+    return ingest_paths(find_documents(folder), output, **kwargs)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batch-ingest EPKs and market reports")
+    parser.add_argument("folder", help="Folder to scan for .pdf/.docx files")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.jsonl or .parquet)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None,
+                        help="Output format (defaults to the output file's extension)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--manifest", default=None, help="Manifest of processed hashes (default: <output>.manifest)")
+    parser.add_argument("--fields", default=",".join(EXTRACTION_FIELDS),
+                        help="Comma-separated fields to extract: text,images,tables,metadata")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    stats = ingest_folder(
+        args.folder,
+        args.output,
+        output_format=output_format,
+        workers=args.workers,
+        manifest=args.manifest,
+        fields=[f.strip() for f in args.fields.split(",") if f.strip()]
+    )
+    print(
+        f"Ingested {stats['files']} files ({stats['pages']} pages) in {stats['seconds']:.1f}s: "
+        f"{stats['files_per_second']:.2f} files/s, {stats['pages_per_second']:.2f} pages/s; "
+        f"{stats['skipped']} already done, {stats['duplicates']} duplicates, {stats['errors']} errors"
+    )
+    return 0 if stats["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
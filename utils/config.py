@@ -4,8 +4,186 @@
 AWS_CONFIG = {
     "region_name": "us-east-1",
     "model_id": "anthropic.claude-3-sonnet-20240229-v1:0",
+    # Cheaper models tried in order when the primary is throttled or its circuit is open
+    "fallback_model_ids": ["anthropic.claude-3-haiku-20240307-v1:0"],
     "max_tokens": 1000,
-    "temperature": 0.7
+    "temperature": 0.7,
+    # Shared client pool (see utils.aws_utils.get_bedrock_client)
+    "max_pool_connections": 50,
+    "tcp_keepalive": True,
+    "connect_timeout": 5,
+    "read_timeout": 120
+}
+
+# Retries, hedging and circuit breaking for model calls (see utils.resilience)
+RESILIENCE_CONFIG = {
+    "max_attempts": 4,
+    "base_delay": 0.5,
+    "max_delay": 8.0,
+    "hedge": True,
+    "hedge_percentile": 0.95,
+    "hedge_budget": 0.05,  # at most ~5% of calls get a duplicate
+    "hedge_workers": 8,
+    "deadline": 120.0,  # seconds for a whole call, retries and fallbacks included
+    "failure_threshold": 5,
+    "reset_timeout": 30.0
+}
+
+# Shared LLM execution engine (see utils.llm_engine)
+LLM_ENGINE_CONFIG = {
+    "max_concurrency": 16,
+    "max_queue_size": 256,
+    "queue_timeout": 30,
+    "providers": {
+        "bedrock": {"requests_per_minute": 100, "tokens_per_minute": 400000},
+        "openai": {"requests_per_minute": 500, "tokens_per_minute": 300000}
+    }
+}
+
+# EPK page analysis pipeline (see utils.epk_analyzer)
+EPK_CONFIG = {
+    "max_workers": 4,
+    "max_pages_in_flight": 6,
+    # Upper bound on render scale; pages are scaled down further to fit max_pixels
+    "render_scale": 2,
+    "max_pixels": 1_600_000,
+    "image_format": "jpeg",  # jpeg, webp or png
+    "image_quality": 80,
+    # Fraction of background-coloured thumbnail pixels above which a page is skipped
+    "blank_threshold": 0.995,
+    # bytes_saved compares with the old payload (PNG at render_scale). By default its size is
+    # extrapolated from a PNG of a baseline_sample_scale thumbnail; measure_baseline repeats
+    # the old, slower encode for an exact figure, so leave it off outside benchmarks
+    "measure_baseline": False,
+    "baseline_sample_scale": 0.5
+}
+
+# Content-addressed cache of document extraction results (see utils.extraction_cache)
+EXTRACTION_CACHE_CONFIG = {
+    "cache_dir": "data/extraction_cache",
+    "max_bytes": 512 * 1024 * 1024
+}
+
+# Market data scraper HTTP settings (see utils.data_scraper)
+SCRAPER_CONFIG = {
+    "max_connections": 20,
+    "max_connections_per_host": 2,
+    "dns_cache_ttl": 300,
+    "min_request_interval": 1.0,  # seconds between requests to one host
+    "timeout": 30,
+    "connect_timeout": 10,
+    "retries": 2,
+    "retry_backoff": 1.0,
+    "parse_executor": "thread",  # "thread", "process" (spawned workers) or "inline"
+    "parse_workers": 2
+}
+
+# Background market data refresh (see utils.refresh_scheduler)
+REFRESH_CONFIG = {
+    "check_interval": 300,  # seconds between scans for due countries
+    "refresh_margin": 2 * 3600,  # refresh this many seconds before cache_duration expires
+    "batch_size": 4
+}
+
+# In-memory market data cache (per DataManager)
+MARKET_CACHE_CONFIG = {
+    "max_entries": 256,  # countries kept in memory
+    "max_bytes": 32 * 1024 * 1024,  # approximate, measured on insert
+    "ttl_seconds": 7 * 24 * 3600  # stale entries stay long enough to serve while revalidating
+}
+
+# Cached dashboard figures
+FIGURE_CACHE_CONFIG = {
+    "max_entries": 128,
+    "max_bytes": 64 * 1024 * 1024,
+    "webgl_threshold": 1000,  # points per trace before switching to Scattergl
+    "max_points_per_trace": 2000  # decimate larger series to about this many points
+}
+
+# MarketAnalyzer pipeline
+ANALYSIS_CONFIG = {
+    "country_timeout": 20,  # seconds to wait for one country's data before leaving it out
+    "analysis_timeout": 30  # seconds per analysis type
+}
+
+# Conversation context budgets (tokens)
+CONTEXT_CONFIG = {
+    "max_context_tokens": 6000,  # whole prompt
+    "history_tokens": 1500,  # recent turns kept verbatim
+    "summary_tokens": 400,  # rolling summary of older turns
+    "doc_tokens": 2000,  # document passages per request
+    "top_k": 4,
+    "chunk_tokens": 200,
+    "chunk_overlap_tokens": 40
+}
+
+# Local retrieval index over documents and market data
+RETRIEVAL_CONFIG = {
+    "path": "data/retrieval_index",
+    "embedding_model": None,  # e.g. "all-MiniLM-L6-v2" (needs sentence-transformers); None = BM25 only
+    "top_k": 4,
+    "chunk_tokens": 200,
+    "chunk_overlap_tokens": 40,
+    "grounding_tokens": 1500  # passages added to a Bedrock prompt
+}
+
+# Prompt templates and Bedrock prompt caching
+# Prompt caching is currently inert: the agent's model (anthropic.claude-3-sonnet-20240229)
+# is not in cache_model_families, and the v2 system prompt plus context is ~300 tokens, well
+# under min_cache_tokens. No cachePoint is sent until the agent moves to a listed model family
+# and the static prefix grows past min_cache_tokens; the agent logs which condition is missing.
+PROMPT_CONFIG = {
+    "versions": {"advice": "v2"},  # pinned template version per prompt
+    "cache_points": True,
+    # Bedrock ignores cache points on shorter prefixes (1,024 tokens for Claude Sonnet)
+    "min_cache_tokens": 1024,
+    # Model ids containing one of these accept cachePoint blocks
+    "cache_model_families": ["anthropic.claude-3-7-sonnet", "anthropic.claude-3-5-haiku",
+                             "anthropic.claude-sonnet-4", "anthropic.claude-opus-4", "amazon.nova"]
+}
+
+# Server-side conversation history (see utils.session_store)
+SESSION_CONFIG = {
+    "backend": "sqlite",  # "sqlite" (shared by every Streamlit worker on the host) or "memory"
+    "path": "data/sessions.sqlite",
+    "history_tokens": 1500,  # recent turns sent verbatim to converse
+    "summary_tokens": 400,  # rolling summary of older turns
+    "max_turn_chars": 8000,  # longer messages are truncated before storing
+    "max_transcript_turns": 500,  # verbatim turns kept for redisplaying the chat
+    "max_sessions": 1000,  # memory backend only
+    "ttl_seconds": 7 * 24 * 3600  # idle sessions are purged after this long
+}
+
+# Campaign planning options (app.py sidebar and utils.batch_advice)
+MARKETING_OPTIONS = {
+    "genres": ["Afrobeats", "Amapiano", "Highlife", "Bongo Flava", "Other"],
+    "target_markets": ["Nigeria", "South Africa", "Kenya", "Ghana", "Tanzania", "International"],
+    "budgets": ["Low", "Medium", "High"]
+}
+
+# USD per 1,000 tokens, used for batch cost summaries
+MODEL_PRICING = {
+    "anthropic.claude-3-sonnet-20240229-v1:0": {"input": 0.003, "output": 0.015},
+    "anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.00025, "output": 0.00125},
+    "anthropic.claude-3-7-sonnet-20250219-v1:0": {"input": 0.003, "output": 0.015},
+    "gpt-4": {"input": 0.03, "output": 0.06},
+    "gpt-4-vision-preview": {"input": 0.01, "output": 0.03}
+}
+# Prompt-cache reads/writes relative to the input price, and the batch inference discount
+PRICING_MULTIPLIERS = {"cache_read": 0.1, "cache_write": 1.25, "batch": 0.5}
+
+BATCH_ADVICE_CONFIG = {
+    "concurrency": 8,  # threads submitting to the LLM engine (which enforces rate limits)
+    "poll_interval": 60,  # seconds between Bedrock batch job status checks
+    "prompt": "Create a release marketing plan for a {genre} single targeting {market} on a {budget} budget."
+}
+
+# Latency histograms and token/cost counters (see utils.metrics)
+METRICS_CONFIG = {
+    "enabled": True,
+    "namespace": "music_assistant",
+    "latency_buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+    "port": None  # e.g. 9100 to serve /metrics and /metrics.json from the app process
 }
 
 # Logging Configuration
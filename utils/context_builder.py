@@ -0,0 +1,256 @@
+"""Token-budgeted prompt assembly: rolling history summary and document passages."""
+
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .config import CONTEXT_CONFIG
+from .llm_engine import estimate_tokens
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken is optional (and needs its encoding file); fall back to ~4 chars per token
+    _ENCODING = None
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def split_passages(text: str,
+                   chunk_tokens: int = CONTEXT_CONFIG["chunk_tokens"],
+                   overlap_tokens: int = CONTEXT_CONFIG["chunk_overlap_tokens"]) -> List[str]:
+    """Overlapping word windows sized from the ~0.75 words per token ratio"""
+    words = text.split()
+    size = max(1, int(chunk_tokens * 0.75))
+    step = max(1, size - int(overlap_tokens * 0.75))
+    return [" ".join(words[start:start + size]) for start in range(0, len(words), step)]
+
+
+@dataclass
+class Turn:
+    role: str
+    content: str
+    tokens: int
+
+
+class ConversationMemory:
+    """Recent turns verbatim plus a rolling summary of everything older.
+
+    Token counts are computed once per turn, so the running total is updated
+    incrementally. When recent turns exceed ``history_tokens`` the oldest are
+    folded into the summary (their first sentence each), and the summary keeps
+    only its newest lines within ``summary_tokens``.
+    """
+
+    def __init__(self,
+                 history_tokens: int = CONTEXT_CONFIG["history_tokens"],
+                 summary_tokens: int = CONTEXT_CONFIG["summary_tokens"]):
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.turns: List[Turn] = []
+        self.recent_tokens = 0
+        self._summary_lines: List[Tuple[str, int]] = []
+        self._summary_total = 0
+
+    def add(self, role: str, content: str):
+        turn = Turn(role, content, count_tokens(content))
+        self.turns.append(turn)
+        self.recent_tokens += turn.tokens
+        # Keep at least the latest exchange verbatim
+        while self.recent_tokens > self.history_tokens and len(self.turns) > 2:
+            self._fold(self.turns.pop(0))
+
+    def _fold(self, turn: Turn):
+        self.recent_tokens -= turn.tokens
+        first_sentence = _SENTENCE_END.split(turn.content.strip(), 1)[0][:300]
+        line = f"{turn.role}: {first_sentence}"
+        tokens = count_tokens(line)
+        self._summary_lines.append((line, tokens))
+        self._summary_total += tokens
+        while self._summary_total > self.summary_tokens and len(self._summary_lines) > 1:
+            _, dropped = self._summary_lines.pop(0)
+            self._summary_total -= dropped
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(line for line, _ in self._summary_lines)
+
+    @property
+    def summary_tokens_used(self) -> int:
+        return self._summary_total
+
+    def messages(self) -> List[Dict[str, str]]:
+        return [{"role": turn.role, "content": turn.content} for turn in self.turns]
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable state, token counts included so loading doesn't re-tokenize"""
+        return {
+            "turns": [[turn.role, turn.content, turn.tokens] for turn in self.turns],
+            "summary": [[line, tokens] for line, tokens in self._summary_lines]
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict, **kwargs) -> "ConversationMemory":
+        memory = cls(**kwargs)
+        memory.turns = [Turn(role, content, tokens) for role, content, tokens in state.get("turns", [])]
+        memory.recent_tokens = sum(turn.tokens for turn in memory.turns)
+        memory._summary_lines = [(line, tokens) for line, tokens in state.get("summary", [])]
+        memory._summary_total = sum(tokens for _, tokens in memory._summary_lines)
+        return memory
+
+    def clear(self):
+        self.turns = []
+        self.recent_tokens = 0
+        self._summary_lines = []
+        self._summary_total = 0
+
+
+@dataclass
+class Chunk:
+    source: str
+    text: str
+    tokens: int
+    term_counts: Counter
+    length: int
+
+
+class ChunkIndex:
+    """In-memory BM25 index over fixed-size, overlapping passages of uploaded documents"""
+
+    def __init__(self,
+                 chunk_tokens: int = CONTEXT_CONFIG["chunk_tokens"],
+                 overlap_tokens: int = CONTEXT_CONFIG["chunk_overlap_tokens"],
+                 k1: float = 1.5, b: float = 0.75):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.k1, self.b = k1, b
+        self.chunks: Dict[str, List[Chunk]] = {}
+        self._doc_freq: Counter = Counter()
+        self._total_length = 0
+        self._count = 0
+
+    def add_document(self, source: str, text: str):
+        """Index (or re-index) one document's passages"""
+        self.remove_document(source)
+        chunks = []
+        for passage in split_passages(text, self.chunk_tokens, self.overlap_tokens):
+            terms = tokenize(passage)
+            chunk = Chunk(source, passage, count_tokens(passage), Counter(terms), len(terms))
+            self._doc_freq.update(chunk.term_counts.keys())
+            self._total_length += chunk.length
+            chunks.append(chunk)
+        self._count += len(chunks)
+        self.chunks[source] = chunks
+
+    def remove_document(self, source: str):
+        for chunk in self.chunks.pop(source, []):
+            self._doc_freq.subtract(chunk.term_counts.keys())
+            self._total_length -= chunk.length
+            self._count -= 1
+        self._doc_freq = +self._doc_freq
+
+    def search(self, query: str, k: int) -> List[Tuple[float, Chunk]]:
+        """Top-k passages by BM25 score; passages sharing no query terms are skipped"""
+        terms = set(tokenize(query))
+        if not terms or not self._count:
+            return []
+        average_length = self._total_length / self._count
+        idf = {term: math.log(1 + (self._count - self._doc_freq[term] + 0.5) / (self._doc_freq[term] + 0.5))
+               for term in terms if self._doc_freq[term]}
+        scored = []
+        for chunks in self.chunks.values():
+            for chunk in chunks:
+                score = 0.0
+                for term, weight in idf.items():
+                    tf = chunk.term_counts.get(term)
+                    if tf:
+                        norm = self.k1 * (1 - self.b + self.b * chunk.length / average_length)
+                        score += weight * tf * (self.k1 + 1) / (tf + norm)
+                if score > 0:
+                    scored.append((score, chunk))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:k]
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class ContextBuilder:
+    """Assembles chat messages that fit ``max_context_tokens``.
+
+    Layout: system prompt, rolling summary of older turns, recent turns in
+    chronological order, then the new user turn carrying the market context,
+    the top-k document passages and the query. Passages are trimmed first, then
+    the oldest recent turns, when the total would exceed the budget.
+    """
+
+    def __init__(self,
+                 max_context_tokens: int = CONTEXT_CONFIG["max_context_tokens"],
+                 doc_tokens: int = CONTEXT_CONFIG["doc_tokens"],
+                 top_k: int = CONTEXT_CONFIG["top_k"]):
+        self.max_context_tokens = max_context_tokens
+        self.doc_tokens = doc_tokens
+        self.top_k = top_k
+
+    def build(self, system_prompt: str, query: str, context: Optional[Dict],
+              memory: ConversationMemory, index=None) -> Tuple[List[Dict], Dict]:
+        """Return (messages, info) where info records token usage and passages used.
+
+        ``index`` is a ChunkIndex or RetrievalIndex (anything whose search(query, k)
+        returns (score, passage) pairs with source/text/tokens).
+        """
+        context_text = f"Market Context: {json.dumps(context)}\n\n" if context else ""
+        fixed_tokens = count_tokens(system_prompt) + count_tokens(context_text) + count_tokens(query)
+        summary = memory.summary
+        summary_tokens = memory.summary_tokens_used
+
+        turns = list(memory.turns)
+        history_tokens = sum(turn.tokens for turn in turns)
+        doc_budget = min(self.doc_tokens,
+                         self.max_context_tokens - fixed_tokens - summary_tokens - history_tokens)
+        passages, passage_tokens = [], 0
+        if index is not None and doc_budget > 0:
+            for _, chunk in index.search(query, self.top_k):
+                if passage_tokens + chunk.tokens > doc_budget:
+                    continue
+                passages.append(chunk)
+                passage_tokens += chunk.tokens
+
+        # Still over budget (e.g. a very long query): drop the oldest recent turns
+        while turns and fixed_tokens + summary_tokens + history_tokens + passage_tokens > self.max_context_tokens:
+            history_tokens -= turns.pop(0).tokens
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of earlier conversation:\n{summary}"})
+        messages.extend({"role": turn.role, "content": turn.content} for turn in turns)
+
+        documents = "".join(f"\n[{chunk.source}]\n{chunk.text}\n" for chunk in passages)
+        user_content = context_text
+        if documents:
+            user_content += f"Relevant passages from uploaded documents:{documents}\n"
+        messages.append({"role": "user", "content": f"{user_content}Query: {query}"})
+
+        info = {
+            "prompt_tokens": fixed_tokens + summary_tokens + history_tokens + passage_tokens,
+            "history_turns": len(turns),
+            "summary_tokens": summary_tokens,
+            "passage_tokens": passage_tokens,
+            "sources": sorted({chunk.source for chunk in passages})
+        }
+        return messages, info
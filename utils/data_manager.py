@@ -1,71 +1,110 @@
-from typing import Dict, List, Optional
+from typing import List, Optional
 import pandas as pd
 from datetime import datetime, timedelta
-import json
+import logging
 import os
+from .config import MARKET_CACHE_CONFIG
 from .data_scraper import AfricanMusicDataScraper, MarketData
-import glob
+from .market_analytics import MarketAnalytics
+from .market_store import MarketStore, country_key
+from .memory_cache import BoundedCache
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 class DataManager:
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", stale_while_revalidate: bool = True,
+                 cache: Optional[BoundedCache] = None, retrieval_index=None):
         self.data_dir = data_dir
-        self.scraper = AfricanMusicDataScraper()
-        self.cache: Dict[str, MarketData] = {}
+        self.scraper = AfricanMusicDataScraper(data_dir)
+        # Pass a shared BoundedCache to share market data between managers
+        self.cache = cache if cache is not None else BoundedCache(**MARKET_CACHE_CONFIG)
         self.cache_duration = timedelta(days=1)
+        # Serve the previous snapshot immediately while a refresh runs in the background
+        self.stale_while_revalidate = stale_while_revalidate
+        # One scrape per country at a time, shared by every waiting caller
+        self.flights = SingleFlight()
+        # Optional RetrievalIndex kept current with the latest snapshot per country
+        self.retrieval_index = retrieval_index
         
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
 
+        self.store = MarketStore(os.path.join(data_dir, "market_data.sqlite"))
+        if not self.store.countries():
+            # One-time migration of the old per-day JSON snapshots
+            self.store.import_legacy_json(data_dir)
+        self.analytics = MarketAnalytics(self.store)
+
     async def get_market_data(self, country: str) -> Optional[MarketData]:
         """Get market data for a country, using cache if available and fresh"""
-        if self._is_cache_valid(country):
-            return self.cache[country]
+        country = country_key(country)
+        data = self.cache.get(country)
+        if data and self._is_data_fresh(data):
+            return data
             
-        # Try to load from file first
-        data = self._load_from_file(country)
+        # Try the local store first
+        data = data or self._load_from_store(country)
         if data and self._is_data_fresh(data):
             self.cache[country] = data
             return data
+
+        if data and self.stale_while_revalidate:
+            self.cache[country] = data
+            self._revalidate(country)
+            return data
             
-        # If no fresh data available, scrape new data
-        data = await self.scraper.scrape_market_data(country)
+        # If no data available at all, wait for the shared scrape
+        return await self.refresh_market_data(country)
+
+    async def refresh_market_data(self, country: str) -> Optional[MarketData]:
+        """Re-scrape a country now; concurrent callers for the same country share one scrape"""
+        country = country_key(country)
+        return await self.flights.run(country, lambda: self._scrape_and_store(country))
+
+    def _revalidate(self, country: str):
+        """Start a background refresh for country unless one is already running"""
+        future = self.flights.spawn(country, lambda: self._scrape_and_store(country))
+
+        def log_failure(done):
+            if not done.cancelled() and done.exception() is not None:
+                logger.error(f"Background refresh of {country} failed: {str(done.exception())}")
+        future.add_done_callback(log_failure)
+
+    async def _scrape_and_store(self, country: str) -> Optional[MarketData]:
+        """Scrape (reusing unchanged sources from the last snapshot) and persist"""
+        previous = self.cache.get(country) or self._load_from_store(country)
+        data = await self.scraper.refresh_market_data(country, previous)
         if data:
             self.cache[country] = data
-            self.scraper.save_to_database(data, country)
+            self.store.save(country, data)
+            if self.retrieval_index is not None:
+                self.retrieval_index.add_market_data(country, data)
         return data
 
+    def last_updated(self, country: str) -> Optional[datetime]:
+        country = country_key(country)
+        data = self.cache.get(country) or self._load_from_store(country)
+        return data.last_updated if data else None
+
     def _is_cache_valid(self, country: str) -> bool:
-        if country not in self.cache:
-            return False
-        return self._is_data_fresh(self.cache[country])
+        data = self.cache.get(country_key(country))
+        return data is not None and self._is_data_fresh(data)
 
     def _is_data_fresh(self, data: MarketData) -> bool:
         age = datetime.now() - data.last_updated
         return age < self.cache_duration
 
-    def _load_from_file(self, country: str) -> Optional[MarketData]:
-        """Load most recent data file for country"""
-        pattern = f"market_data_{country.lower()}_*.json"
-        files = sorted(glob.glob(os.path.join(self.data_dir, pattern)), reverse=True)
-        
-        if not files:
-            return None
-            
-        with open(files[0], 'r') as f:
-            data = json.load(f)
-            return MarketData(**data)
+    def _load_from_store(self, country: str) -> Optional[MarketData]:
+        """Load the most recent snapshot for country"""
+        return self.store.latest(country)
+
+    def get_market_history(self, country: str,
+                           start: Optional[datetime] = None,
+                           end: Optional[datetime] = None) -> List[MarketData]:
+        """Stored snapshots for a country within an optional time range"""
+        return self.store.history(country, start, end)
 
     def get_market_summary(self, countries: List[str]) -> pd.DataFrame:
         """Generate summary dataframe for multiple countries"""
-        data = []
-        for country in countries:
-            if country in self.cache:
-                market = self.cache[country]
-                data.append({
-                    'Country': country,
-                    'Population': market.population,
-                    'Streaming Revenue': market.streaming_revenue,
-                    'Internet Penetration': market.internet_penetration,
-                    'Smartphone Users': market.smartphone_users
-                })
-        return pd.DataFrame(data) 
\ No newline at end of file
+        return self.analytics.summary(countries)
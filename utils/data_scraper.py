@@ -1,15 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 from typing import Dict, List, Optional
 import logging
 from datetime import datetime
-import json
+import os
 import aiohttp
 import asyncio
-from dataclasses import dataclass
+import atexit
+import multiprocessing
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, replace
+from urllib.parse import urlparse
 from fake_useragent import UserAgent
 
+from .config import SCRAPER_CONFIG
+from .market_parsers import SOURCE_FIELDS, parse_source
+from .metrics import get_metrics, span, timed
+
 @dataclass
 class StreamingPlatformData:
     name: str
@@ -32,30 +41,253 @@ class MarketData:
     languages: List[str]
     artist_demographics: Dict[str, float]
 
+    def to_dict(self) -> Dict:
+        """JSON-ready dict with an ISO timestamp and plain platform dicts"""
+        data = asdict(self)
+        data['last_updated'] = self.last_updated.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MarketData':
+        """Rebuild typed MarketData from to_dict() output or legacy JSON files"""
+        data = dict(data)
+        if isinstance(data['last_updated'], str):
+            data['last_updated'] = datetime.fromisoformat(data['last_updated'])
+        # Legacy JSON files stored platforms as repr strings; those can't be rebuilt
+        data['platforms'] = [
+            p if isinstance(p, StreamingPlatformData) else StreamingPlatformData(**p)
+            for p in data.get('platforms') or []
+            if isinstance(p, (StreamingPlatformData, dict))
+        ]
+        return cls(**data)
+
+@dataclass
+class FetchResult:
+    url: str
+    text: Optional[str]
+    status: int
+    # False when the server answered 304 or returned the same body as last time
+    changed: bool
+
+    @property
+    def failed(self) -> bool:
+        """No usable body: network error, timeout or an error status"""
+        return self.text is None
+
+COUNTRY_LANGUAGES = {
+    'nigeria': ['English', 'Hausa', 'Yoruba', 'Igbo', 'Nigerian Pidgin'],
+    'ghana': ['English', 'Akan', 'Ewe', 'Ga'],
+    'kenya': ['English', 'Swahili'],
+    'tanzania': ['Swahili', 'English'],
+    'uganda': ['English', 'Swahili', 'Luganda'],
+    'south africa': ['English', 'Zulu', 'Xhosa', 'Afrikaans', 'Sotho', 'Tswana'],
+    'senegal': ['French', 'Wolof'],
+    "cote d'ivoire": ['French', 'Dioula'],
+    'cameroon': ['French', 'English'],
+    'democratic republic of the congo': ['French', 'Lingala', 'Swahili'],
+    'ethiopia': ['Amharic', 'Oromo', 'Tigrinya'],
+    'egypt': ['Arabic'],
+    'morocco': ['Arabic', 'Berber', 'French'],
+    'zimbabwe': ['English', 'Shona', 'Ndebele'],
+    'zambia': ['English', 'Bemba', 'Nyanja'],
+    'rwanda': ['Kinyarwanda', 'French', 'English', 'Swahili'],
+    'angola': ['Portuguese'],
+    'mozambique': ['Portuguese'],
+    'mali': ['French', 'Bambara']
+}
+
+_parse_executor: Optional[Executor] = None
+_parse_executor_lock = threading.Lock()
+
+
+def get_parse_executor() -> Optional[Executor]:
+    """Shared pool that runs HTML parsing off the event loop (None means parse inline)"""
+    global _parse_executor
+    kind = SCRAPER_CONFIG["parse_executor"]
+    if kind == "inline":
+        return None
+    if _parse_executor is None:
+        with _parse_executor_lock:
+            if _parse_executor is None:
+                if kind == "process":
+                    # Spawn, not fork: forking the multithreaded Streamlit server can deadlock
+                    _parse_executor = ProcessPoolExecutor(max_workers=SCRAPER_CONFIG["parse_workers"],
+                                                          mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    _parse_executor = ThreadPoolExecutor(max_workers=SCRAPER_CONFIG["parse_workers"])
+    return _parse_executor
+
+
+def _reset_parse_executor():
+    global _parse_executor
+    with _parse_executor_lock:
+        _parse_executor = None
+
+
+# Scrapers that have opened a session, so one still open at exit can be closed on its loop
+_open_scrapers: "weakref.WeakSet[AfricanMusicDataScraper]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_sessions(timeout: float = 5.0):
+    """Close sessions whose loop is still running at exit, such as the SingleFlight background loop"""
+    for scraper in list(_open_scrapers):
+        loop, session = scraper._loop, scraper._session
+        if session is None or session.closed or loop is None or not loop.is_running():
+            continue
+        try:
+            asyncio.run_coroutine_threadsafe(scraper.close(), loop).result(timeout)
+        except Exception as e:
+            scraper.logger.warning(f"Could not close scraper session at exit: {str(e)}")
+
 class AfricanMusicDataScraper:
-    def __init__(self):
+    def __init__(self, data_dir: str = "data"):
         self.logger = logging.getLogger(__name__)
+        self.data_dir = data_dir
         self.ua = UserAgent()
+        # Pick one user agent per scraper instead of a new one per request
+        self.user_agent = self.ua.random
         self.base_urls = {
             'ifpi': 'https://www.ifpi.org/resources/',
             'worldbank': 'https://data.worldbank.org/country/',
             'gsma': 'https://www.gsma.com/mobileeconomy/africa/',
             'statista': 'https://www.statista.com/markets/422/topic/494/music/#overview'
         }
-        
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_last_request: Dict[str, float] = {}
+        # url -> {"etag", "last_modified", "body"} for conditional GETs
+        self._validators: Dict[str, Dict[str, Optional[str]]] = {}
+        self._store = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _bind_to_running_loop(self):
+        """Sessions and semaphores belong to one event loop; rebuild them on a new loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            stale, stale_loop = self._session, self._loop
+            self._loop = loop
+            self._session = None
+            self._host_slots.clear()
+            self._host_locks.clear()
+            if stale is not None and not stale.closed:
+                await self._close_stale_session(stale, stale_loop)
+
+    @staticmethod
+    async def _close_stale_session(session: aiohttp.ClientSession,
+                                   loop: Optional[asyncio.AbstractEventLoop]):
+        """Close a session left by another event loop, on that loop if it is still running"""
+        if loop is not None and loop.is_running():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+        else:
+            await session.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        await self._bind_to_running_loop()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=SCRAPER_CONFIG["max_connections"],
+                limit_per_host=SCRAPER_CONFIG["max_connections_per_host"],
+                ttl_dns_cache=SCRAPER_CONFIG["dns_cache_ttl"]
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=SCRAPER_CONFIG["timeout"],
+                    connect=SCRAPER_CONFIG["connect_timeout"]
+                ),
+                headers={'User-Agent': self.user_agent}
+            )
+            _open_scrapers.add(self)
+        return self._session
+
+    async def _wait_for_host(self, host: str):
+        """Polite rate limit: space out request starts to the same host"""
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._host_last_request.get(host, 0) + SCRAPER_CONFIG["min_request_interval"] - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_last_request[host] = time.monotonic()
+
+    async def _fetch(self, url: str) -> FetchResult:
+        """GET with per-host limits, retries and ETag/Last-Modified revalidation"""
+        revalidating = url in self._validators
+        with span("scraper.fetch"):
+            result = await self._fetch_with_retries(url)
+        metrics = get_metrics()
+        metrics.inc("scraper_responses_total", status=result.status)
+        if revalidating and result.status in (200, 304):
+            metrics.record_cache("http_revalidation", result.status == 304)
+        return result
+
+    async def _fetch_with_retries(self, url: str) -> FetchResult:
+        session = await self._get_session()
+        host = urlparse(url).netloc
+        slots = self._host_slots.setdefault(
+            host, asyncio.Semaphore(SCRAPER_CONFIG["max_connections_per_host"])
+        )
+        cached = self._validators.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers['If-None-Match'] = cached["etag"]
+            if cached.get("last_modified"):
+                headers['If-Modified-Since'] = cached["last_modified"]
+
+        retries = SCRAPER_CONFIG["retries"]
+        for attempt in range(retries + 1):
+            delay = SCRAPER_CONFIG["retry_backoff"] * (2 ** attempt)
+            try:
+                async with slots:
+                    await self._wait_for_host(host)
+                    async with session.get(url, headers=headers) as response:
+                        if response.status == 304 and cached:
+                            return FetchResult(url, cached["body"], 304, False)
+                        if response.status == 200:
+                            text = await response.text()
+                            etag = response.headers.get('ETag')
+                            last_modified = response.headers.get('Last-Modified')
+                            if etag or last_modified:
+                                self._validators[url] = {
+                                    "etag": etag,
+                                    "last_modified": last_modified,
+                                    "body": text
+                                }
+                            changed = cached is None or cached["body"] != text
+                            return FetchResult(url, text, 200, changed)
+                        if response.status not in (429, 500, 502, 503, 504):
+                            self.logger.error(f"Failed to fetch {url}: Status {response.status}")
+                            return FetchResult(url, None, response.status, False)
+                        retry_after = response.headers.get('Retry-After', '')
+                        if retry_after.isdigit():
+                            delay = max(delay, float(retry_after))
+                        self.logger.warning(f"Fetching {url} returned {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.warning(f"Error fetching {url}: {str(e)}")
+
+            if attempt < retries:
+                await asyncio.sleep(delay)
+
+        self.logger.error(f"Giving up on {url} after {retries + 1} attempts")
+        return FetchResult(url, None, 0, False)
+
     async def _fetch_page(self, url: str) -> Optional[str]:
-        headers = {'User-Agent': self.ua.random}
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.text()
-                    self.logger.error(f"Failed to fetch {url}: Status {response.status}")
-                    return None
-        except Exception as e:
-            self.logger.error(f"Error fetching {url}: {str(e)}")
-            return None
+        return (await self._fetch(url)).text
 
+    @timed("scraper.scrape_market_data")
     async def scrape_market_data(self, country: str) -> Optional[MarketData]:
         tasks = []
         for source, url in self.base_urls.items():
@@ -66,29 +298,87 @@ class AfricanMusicDataScraper:
         if not any(results):
             return None
             
-        return self._parse_market_data(country, results)
+        return await self._parse_market_data(country, results)
+
+    async def refresh_market_data(self, country: str,
+                                  previous: Optional[MarketData]) -> Optional[MarketData]:
+        """Re-scrape a country, re-parsing only the sources whose content changed.
 
-    def _parse_market_data(self, country: str, raw_data: List[str]) -> MarketData:
-        # Implementation of parsing logic for each data source
-        # This is a simplified version - real implementation would be more complex
+        Fields from unchanged sources (304 or identical body) and from sources
+        that failed to fetch are carried over from ``previous``. ``last_updated``
+        only moves when every source was fetched: if nothing changed and any
+        fetch failed the snapshot can't be confirmed, so None is returned; if
+        some sources changed and others failed, the new fields are returned
+        with the old timestamp. Either way the snapshot stays stale and is
+        retried.
+        """
+        if previous is None:
+            return await self.scrape_market_data(country)
+
+        results = await asyncio.gather(*[
+            self._fetch(f"{url}{country.lower()}") for url in self.base_urls.values()
+        ])
+        changed = {source for source, result in zip(self.base_urls, results) if result.changed}
+        failed = [source for source, result in zip(self.base_urls, results) if result.failed]
+        if not changed:
+            if failed:
+                self.logger.warning(f"Could not confirm {country} data is current; failed sources: {failed}")
+                return None
+            return replace(previous, last_updated=datetime.now())
+        data = await self._parse_market_data(
+            country, [result.text for result in results], previous=previous, changed_sources=changed
+        )
+        if failed:
+            # The carried-over fields are only as fresh as the previous snapshot
+            self.logger.warning(f"Keeping previous {country} fields and timestamp for failed sources: {failed}")
+            data = replace(data, last_updated=previous.last_updated)
+        return data
+
+    async def _parse_market_data(self, country: str, raw_data: List[str],
+                                 previous: Optional[MarketData] = None,
+                                 changed_sources: Optional[set] = None) -> MarketData:
+        """Parse changed sources in the parse pool; each page is parsed once for all its fields"""
+        pages = dict(zip(self.base_urls, raw_data))
         market_data = {
             'last_updated': datetime.now(),
-            'population': self._extract_population(raw_data[1]),  # WorldBank data
-            'gdp_per_capita': self._extract_gdp(raw_data[1]),
-            'internet_penetration': self._extract_internet_stats(raw_data[2]),  # GSMA data
-            'smartphone_users': self._extract_smartphone_stats(raw_data[2]),
-            'streaming_revenue': self._extract_streaming_revenue(raw_data[0]),  # IFPI data
-            'digital_payment_penetration': self._extract_payment_stats(raw_data[2]),
-            'platforms': self._extract_platform_data(raw_data[3]),  # Statista data
-            'genre_popularity': self._extract_genre_data(raw_data[3]),
-            'languages': self._get_country_languages(country),
-            'artist_demographics': self._extract_artist_data(raw_data[3])
+            'languages': self._get_country_languages(country)
         }
-        
-        return MarketData(**market_data)
+        to_parse = []
+        for source, fields in SOURCE_FIELDS.items():
+            if previous is not None and changed_sources is not None and source not in changed_sources:
+                market_data.update({field: getattr(previous, field) for field in fields})
+            else:
+                to_parse.append(source)
+
+        for fields in await asyncio.gather(*[self._parse_source(source, pages[source]) for source in to_parse]):
+            market_data.update(fields)
+        return MarketData.from_dict(market_data)
+
+    async def _parse_source(self, source: str, html: Optional[str]) -> Dict:
+        with span("scraper.parse", source=source):
+            return await self._run_parser(source, html)
+
+    async def _run_parser(self, source: str, html: Optional[str]) -> Dict:
+        executor = get_parse_executor()
+        if executor is None:
+            return parse_source(source, html)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, parse_source, source, html)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool next time and parse this page on a thread
+            self.logger.warning("Parse pool broke; recreating it")
+            _reset_parse_executor()
+            return await loop.run_in_executor(None, parse_source, source, html)
+
+    def _get_country_languages(self, country: str) -> List[str]:
+        return list(COUNTRY_LANGUAGES.get(country.strip().lower(), []))
 
-    def save_to_database(self, data: MarketData, country: str):
-        """Save scraped data to local JSON database"""
-        filename = f"data/market_data_{country.lower()}_{data.last_updated.strftime('%Y%m%d')}.json"
-        with open(filename, 'w') as f:
-            json.dump(data.__dict__, f, default=str)
\ No newline at end of file
+    def save_to_database(self, data: MarketData, country: str, store=None):
+        """Save scraped data to the market data store under data_dir"""
+        if store is None:
+            if self._store is None:
+                from .market_store import MarketStore
+                self._store = MarketStore(os.path.join(self.data_dir, "market_data.sqlite"))
+            store = self._store
+        store.save(country, data)
\ No newline at end of file
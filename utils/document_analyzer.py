@@ -1,15 +1,49 @@
 import fitz  # PyMuPDF
-import pandas as pd
+import io
+import logging
+import re
+from collections import Counter
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from .config import MARKETING_OPTIONS
+from .extraction_cache import ExtractionCache, content_hash, get_extraction_cache
+from .metrics import get_metrics, span, timed
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_FIELDS = ("text", "images", "tables", "metadata")
+
+_REPORT_STOPWORDS = frozenset(
+    "this that with from have were will your their they them there than then what when which "
+    "also into more most over such only other some these those been being about after before".split()
+)
 
 class DocumentAnalyzer:
-    def __init__(self):
+    def __init__(self, cache: Optional[ExtractionCache] = None, retrieval_index=None):
         self.uploaded_docs = set()
+        # Resolved on first use, so extraction-only callers never open the cache directory
+        self._cache = cache
+        # Page text is indexed here, per owner, so advice can be grounded in it later
+        self.retrieval_index = retrieval_index
         
-    def process_document(self, file, filename):
+    @property
+    def cache(self) -> ExtractionCache:
+        if self._cache is None:
+            self._cache = get_extraction_cache()
+        return self._cache
+
+    @timed("document.process")
+    def process_document(self, file, filename, fields: Iterable[str] = EXTRACTION_FIELDS,
+                         owner: Optional[str] = None):
         try:
-            # Extract content using Python tools
-            extracted_data = self._extract_all_content(file, filename)
+            # Extract content using Python tools, reusing results for identical uploads
+            extracted_data = self._extract_cached(file, filename, fields)
+            # Indexed per owner (the chat session id) so one user's upload never grounds another's advice
+            if self.retrieval_index is not None and owner and extracted_data.get("text_content"):
+                with span("document.index"):
+                    self.retrieval_index.add_extraction(filename, extracted_data, owner)
             
             # Generate a basic analysis report without OpenAI
             analysis_report = self._generate_basic_report(extracted_data)
@@ -22,12 +56,135 @@ class DocumentAnalyzer:
             }
             
         except Exception as e:
+            get_metrics().inc("stage_errors_total", stage="document.process")
             return {
                 "status": "error",
                 "message": f"Error processing document: {str(e)}"
             }
 
-    def _extract_all_content(self, file, filename):
+    def _extract_cached(self, file, filename, fields: Iterable[str] = EXTRACTION_FIELDS):
+        """Look up extraction results by content hash before parsing the file"""
+        fields = tuple(sorted(fields))
+        # Hash the upload's buffer in place when possible instead of copying it
+        data = file.getbuffer() if hasattr(file, "getbuffer") else file.read()
+        key = f"{content_hash(data)}{Path(filename).suffix.lower()}-{'+'.join(fields)}"
+        if isinstance(data, memoryview):
+            data.release()
+        extracted_data = self.cache.get("document", key)
+        get_metrics().record_cache("extraction", extracted_data is not None)
+        if extracted_data is None:
+            source = file if hasattr(file, "getbuffer") else io.BytesIO(data)
+            source.seek(0)
+            with span("document.extract", type=Path(filename).suffix.lower().lstrip(".") or "unknown"):
+                extracted_data = self._extract_all_content(source, filename, fields)
+            self.cache.put("document", key, extracted_data)
+        return extracted_data
+
+    def extract(self, file, filename, fields: Iterable[str] = EXTRACTION_FIELDS) -> Dict:
+        """Extract a PDF without the cache, for callers that deduplicate by content hash themselves"""
+        return self._extract_all_content(file, filename, fields)
+
+    def _open_pdf(self, file):
+        """Open a path or file-like object without an extra full read where possible"""
+        if isinstance(file, (str, Path)):
+            return fitz.open(str(file))
+        if isinstance(file, io.BytesIO):
+            return fitz.open(stream=file, filetype="pdf")
+        return fitz.open(stream=file.read(), filetype="pdf")
+
+    def iter_pages(self, file, filename, fields: Iterable[str] = EXTRACTION_FIELDS) -> Iterator[Dict]:
+        """Yield extraction results page by page as they are produced.
+
+        A ``{"type": "metadata", ...}`` record comes first when "metadata" is
+        requested, followed by one ``{"type": "page", "page": n, ...}`` record per
+        page holding only the requested fields ("text", "images", "tables").
+        Table detection only runs on pages that look tabular.
+        """
+        if not str(filename).lower().endswith('.pdf'):
+            return
+        fields = set(fields)
+        doc = self._open_pdf(file)
+        try:
+            if "metadata" in fields:
+                yield {
+                    "type": "metadata",
+                    "title": doc.metadata.get("title", ""),
+                    "author": doc.metadata.get("author", ""),
+                    "subject": doc.metadata.get("subject", ""),
+                    "keywords": doc.metadata.get("keywords", ""),
+                    "page_count": len(doc)
+                }
+
+            for page_num in range(len(doc)):
+                page = doc[page_num]
+                record = {"type": "page", "page": page_num + 1}
+
+                if "text" in fields:
+                    record["text"] = page.get_text()
+
+                if "images" in fields:
+                    record["images"] = []
+                    for img_index, img in enumerate(page.get_images()):
+                        try:
+                            record["images"].append({
+                                "page": page_num + 1,
+                                "image_index": img_index,
+                                "width": img[2],
+                                "height": img[3],
+                                "colorspace": img[5],
+                                "size_bytes": img[7] if len(img) > 7 else None
+                            })
+                        except Exception as e:
+                            logger.warning(f"Error extracting image {img_index} on page {page_num + 1}: {str(e)}")
+
+                if "tables" in fields:
+                    record["tables"] = self._extract_tables(page) if self._may_have_tables(page) else []
+
+                yield record
+        finally:
+            doc.close()
+
+    def _extract_tables(self, page) -> list:
+        """Detected tables as lists of rows, so results stay picklable and cacheable"""
+        return [table.extract() for table in page.find_tables().tables]
+
+    def _may_have_tables(self, page) -> bool:
+        """Cheap check for ruling lines or grid-aligned text before full table detection"""
+        horizontal = vertical = 0
+        for drawing in page.get_drawings():
+            for item in drawing["items"]:
+                if item[0] == "l":
+                    p1, p2 = item[1], item[2]
+                    if abs(p1.y - p2.y) < 1:
+                        horizontal += 1
+                    elif abs(p1.x - p2.x) < 1:
+                        vertical += 1
+                elif item[0] == "re":
+                    rect = item[1]
+                    if rect.height < 2:
+                        horizontal += 1
+                    elif rect.width < 2:
+                        vertical += 1
+                    else:
+                        # Cell borders drawn as rectangles count both ways
+                        horizontal += 2
+                        vertical += 2
+            if horizontal >= 3 and vertical >= 2:
+                return True
+
+        # Grid-aligned text: three or more left edges each shared by a good share of
+        # the rows. Running prose only lines up on the margin, so it stays below this.
+        rows_by_x = {}
+        all_rows = set()
+        for x0, y0, *_ in page.get_text("words"):
+            row = round(y0 / 3)
+            rows_by_x.setdefault(round(x0 / 3), set()).add(row)
+            all_rows.add(row)
+        min_rows = max(3, len(all_rows) // 4)
+        columns = sum(1 for rows in rows_by_x.values() if len(rows) >= min_rows)
+        return columns >= 3
+
+    def _extract_all_content(self, file, filename, fields: Iterable[str] = EXTRACTION_FIELDS):
         extracted_data = {
             "text_content": [],
             "metadata": {},
@@ -41,58 +198,52 @@ class DocumentAnalyzer:
             }
         }
         
-        if filename.lower().endswith('.pdf'):
-            pdf_content = file.read()
-            doc = fitz.open(stream=pdf_content, filetype="pdf")
-            
-            # Get metadata
-            extracted_data["metadata"] = {
-                "title": doc.metadata.get("title", ""),
-                "author": doc.metadata.get("author", ""),
-                "subject": doc.metadata.get("subject", ""),
-                "keywords": doc.metadata.get("keywords", ""),
-                "page_count": len(doc)
-            }
-            
-            extracted_data["statistics"]["page_count"] = len(doc)
-            
-            # Process each page
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Extract text
-                text = page.get_text()
-                if text.strip():
-                    extracted_data["text_content"].append({
-                        "page": page_num + 1,
-                        "content": text
-                    })
-                    extracted_data["statistics"]["word_count"] += len(text.split())
-                
-                # Extract images - Fixed version
-                for img_index, img in enumerate(page.get_images()):
-                    try:
-                        xref = img[0]  # xref number
-                        image_info = {
-                            "page": page_num + 1,
-                            "image_index": img_index,
-                            "width": img[2],
-                            "height": img[3],
-                            "colorspace": img[5],
-                            "size_bytes": img[7] if len(img) > 7 else None
-                        }
-                        extracted_data["images"].append(image_info)
-                        extracted_data["statistics"]["image_count"] += 1
-                    except Exception as e:
-                        print(f"Error extracting image: {str(e)}")
-                
-                # Extract tables
-                tables = page.get_tables()
-                if tables:
-                    extracted_data["tables"].append({
-                        "page": page_num + 1,
-                        "tables": tables
-                    })
-                    extracted_data["statistics"]["table_count"] += 1
+        for record in self.iter_pages(file, filename, fields):
+            if record["type"] == "metadata":
+                extracted_data["metadata"] = {k: v for k, v in record.items() if k != "type"}
+                continue
+
+            page_num = record["page"]
+            extracted_data["statistics"]["page_count"] = page_num
+
+            text = record.get("text", "")
+            if text.strip():
+                extracted_data["text_content"].append({
+                    "page": page_num,
+                    "content": text
+                })
+                extracted_data["statistics"]["word_count"] += len(text.split())
+
+            images = record.get("images", [])
+            extracted_data["images"].extend(images)
+            extracted_data["statistics"]["image_count"] += len(images)
+
+            tables = record.get("tables")
+            if tables:
+                extracted_data["tables"].append({
+                    "page": page_num,
+                    "tables": tables
+                })
+                extracted_data["statistics"]["table_count"] += 1
         
-        return extracted_data 
\ No newline at end of file
+        return extracted_data 
+
+    def _generate_basic_report(self, extracted_data: Dict) -> Dict:
+        """Summary statistics, frequent terms and the genres/markets a document mentions"""
+        stats = extracted_data["statistics"]
+        text = " ".join(page["content"] for page in extracted_data["text_content"])
+        lowered = text.lower()
+        words = [word for word in re.findall(r"[a-z][a-z']{3,}", lowered) if word not in _REPORT_STOPWORDS]
+        mentions = {
+            group: [name for name in MARKETING_OPTIONS[group]
+                    if name not in ("Other", "International") and name.lower() in lowered]
+            for group in ("genres", "target_markets")
+        }
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "summary": (f"{stats['page_count']} pages, {stats['word_count']} words, "
+                        f"{stats['table_count']} pages with tables, {stats['image_count']} images"),
+            "statistics": stats,
+            "top_terms": Counter(words).most_common(10),
+            "mentions": mentions
+        }
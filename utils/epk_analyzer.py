@@ -1,53 +1,132 @@
-from typing import Dict
-import base64
+from typing import Dict, Optional
 from pathlib import Path
 import fitz  # PyMuPDF for PDF handling
-from PIL import Image
-import io
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from openai import OpenAI
 
+from .config import EPK_CONFIG
+from .extraction_cache import ExtractionCache, content_hash, get_extraction_cache
+from .metrics import get_metrics, span, timed
+from .vision_payload import EncodedPage, PayloadOptimizer
+
+def _record_openai_usage(model: str, response):
+    """Token and cost counters for a chat completion, under the requested model name"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    get_metrics().record_usage(model, {
+        "uncached_input_tokens": usage.prompt_tokens,
+        "output_tokens": usage.completion_tokens
+    })
+
 class EPKAnalyzer:
-    def __init__(self, openai_key: str):
+    def __init__(self, openai_key: str,
+                 max_workers: int = EPK_CONFIG["max_workers"],
+                 max_pages_in_flight: int = EPK_CONFIG["max_pages_in_flight"],
+                 payload_optimizer: Optional[PayloadOptimizer] = None,
+                 cache: Optional[ExtractionCache] = None):
         self.client = OpenAI(api_key=openai_key)
-        
+        self.max_workers = max_workers
+        self.max_pages_in_flight = max_pages_in_flight
+        self.payload_optimizer = payload_optimizer or PayloadOptimizer()
+        # Per-page vision results, keyed on the PDF's content hash
+        self.cache = cache or get_extraction_cache()
+
+    @timed("epk.analyze")
     def analyze_epk(self, epk_file, form_data: Dict) -> Dict:
         """Analyze EPK using Vision API"""
         try:
-            # Convert PDF pages to images
-            images = self._pdf_to_images(epk_file)
-            
-            # Analyze each page with Vision API
-            analysis = []
-            for img in images:
-                encoded_image = self._encode_image(img)
-                vision_analysis = self._analyze_with_vision(encoded_image, form_data)
-                analysis.append(vision_analysis)
-            
+            started = time.perf_counter()
+            timings = {"render_encode": 0.0, "analyze": 0.0, "brief": 0.0}
+            payload = {"pages": 0, "cached_pages": 0, "skipped_blank": 0, "encoded_bytes": 0,
+                       "baseline_bytes": 0, "baseline_estimated": not self.payload_optimizer.measure_baseline}
+
+            # Render, encode and analyze pages as a bounded concurrent pipeline
+            analysis = self._analyze_pages(epk_file, form_data, timings, payload)
+            # Against the old PNG/base64 payload of the pages encoded in this run
+            payload["bytes_saved"] = payload["baseline_bytes"] - payload["encoded_bytes"]
+
             # Combine analyses into marketing brief
-            return self._generate_brief(analysis, form_data)
+            brief_start = time.perf_counter()
+            with span("epk.brief"):
+                result = self._generate_brief(analysis, form_data)
+            timings["brief"] = time.perf_counter() - brief_start
+            timings["total"] = time.perf_counter() - started
+            result["timings"] = timings
+            result["payload"] = payload
+            return result
         except Exception as e:
+            get_metrics().inc("stage_errors_total", stage="epk.analyze")
             return {"error": str(e)}
 
-    def _pdf_to_images(self, pdf_file) -> list:
-        """Convert PDF pages to images"""
-        pdf_document = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        images = []
-        
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x scale for better quality
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            images.append(img)
-            
-        return images
+    def _analyze_pages(self, epk_file, form_data: Dict, timings: Dict, payload: Dict) -> list:
+        """Render/encode pages on this thread and analyze them on a worker pool.
+
+        MuPDF objects stay on the calling thread; workers only see the encoded
+        payload. At most ``max_pages_in_flight`` encoded pages exist at once, so
+        rendering blocks until a worker finishes. Near-blank pages are skipped and
+        pages already analyzed for identical PDF bytes are served from the cache.
+        """
+        pdf_bytes = epk_file.read()
+        optimizer = self.payload_optimizer
+        page_key = (f"{content_hash(pdf_bytes)}-{optimizer.image_format}"
+                    f"{optimizer.quality}-{optimizer.max_pixels}-p")
+        in_flight = threading.BoundedSemaphore(self.max_pages_in_flight)
+        timings_lock = threading.Lock()
+        metrics = get_metrics()
+
+        def process(page: EncodedPage) -> Dict:
+            try:
+                start = time.perf_counter()
+                with span("epk.vision"):
+                    vision_analysis = self._analyze_with_vision(page.data, form_data, page.mime_type)
+                with timings_lock:
+                    timings["analyze"] += time.perf_counter() - start
+                self.cache.put("epk_page", f"{page_key}{page.page}", vision_analysis)
+                return vision_analysis
+            finally:
+                in_flight.release()
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+            try:
+                for page_num in range(pdf_document.page_count):
+                    cached = self.cache.get("epk_page", f"{page_key}{page_num + 1}")
+                    metrics.record_cache("epk_page", cached is not None)
+                    if cached is not None:
+                        payload["pages"] += 1
+                        payload["cached_pages"] += 1
+                        results.append(cached)
+                        continue
+
+                    in_flight.acquire()
+                    start = time.perf_counter()
+                    try:
+                        with span("epk.render_encode"):
+                            page = self.payload_optimizer.encode_page(pdf_document[page_num])
+                    except BaseException:
+                        # process() never runs for this page, so give its slot back here
+                        in_flight.release()
+                        raise
+                    with timings_lock:
+                        timings["render_encode"] += time.perf_counter() - start
+                    payload["pages"] += 1
+                    if page is None:
+                        payload["skipped_blank"] += 1
+                        in_flight.release()
+                        continue
+                    payload["encoded_bytes"] += page.encoded_bytes
+                    payload["baseline_bytes"] += page.baseline_bytes
+                    results.append(pool.submit(process, page))
+            finally:
+                pdf_document.close()
 
-    def _encode_image(self, image: Image) -> str:
-        """Convert PIL Image to base64"""
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        return [r.result() if isinstance(r, Future) else r for r in results]
 
-    def _analyze_with_vision(self, encoded_image: str, form_data: Dict) -> Dict:
+    def _analyze_with_vision(self, encoded_image: str, form_data: Dict, mime_type: str = "image/png") -> Dict:
         """Analyze image using OpenAI Vision API"""
         response = self.client.chat.completions.create(
             model="gpt-4-vision-preview",
@@ -66,7 +145,7 @@ class EPKAnalyzer:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{encoded_image}"
+                                "url": f"data:{mime_type};base64,{encoded_image}"
                             }
                         }
                     ]
@@ -74,6 +153,7 @@ class EPKAnalyzer:
             ],
             max_tokens=500
         )
+        _record_openai_usage("gpt-4-vision-preview", response)
         
         return {"content": response.choices[0].message.content}
 
@@ -95,6 +175,7 @@ class EPKAnalyzer:
             ]
         )
         
+        _record_openai_usage("gpt-4", response)
         return {
             "brief": response.choices[0].message.content,
             "analyses": analyses
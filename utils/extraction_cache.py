@@ -0,0 +1,124 @@
+"""Content-addressed on-disk cache for document extraction results."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from typing import Any, Optional
+
+from .config import EXTRACTION_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data) -> str:
+    """BLAKE2b digest of raw file bytes (bytes, bytearray or memoryview)"""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class ExtractionCache:
+    """Stores extraction results as zlib-compressed JSON, one file per entry.
+
+    Entries live under ``<cache_dir>/<namespace>/<aa>/<digest>.json.z``. Reads
+    bump the file's mtime so eviction (oldest mtime first) behaves like LRU once
+    the total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self,
+                 cache_dir: str = EXTRACTION_CACHE_CONFIG["cache_dir"],
+                 max_bytes: int = EXTRACTION_CACHE_CONFIG["max_bytes"]):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        # exist_ok: batch ingestion workers create the shared cache concurrently
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.cache_dir, namespace, key[:2], f"{key}.json.z")
+
+    def _scan(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.z"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                value = json.loads(zlib.decompress(f.read()))
+            os.utime(path)
+        except FileNotFoundError:
+            self.stats["misses"] += 1
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {str(e)}")
+            self._delete(path)
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return value
+
+    def put(self, namespace: str, key: str, value: Any):
+        payload = zlib.compress(
+            json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"), 6
+        )
+        path = self._path(namespace, key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += len(payload) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _delete(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Remove least recently used entries until under 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        for path, size, _ in sorted(self._scan(), key=lambda entry: entry[2]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Process-wide cache shared by the document and EPK analyzers"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExtractionCache()
+    return _cache
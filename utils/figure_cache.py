@@ -0,0 +1,72 @@
+"""Memoized, pre-serialized Plotly figures for the market dashboards."""
+
+import logging
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+import plotly.graph_objects as go
+
+from .config import FIGURE_CACHE_CONFIG
+from .memory_cache import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+
+def decimate(x: Sequence, y: Sequence, max_points: int):
+    """Min/max decimation: keep each bucket's extremes so peaks survive downsampling"""
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if len(y) <= max_points:
+        return x, y
+    n = len(y)
+    bucket = np.arange(n) * max(1, max_points // 2) // n
+    # Sort by (bucket, value); the first and last of each bucket are its min and max.
+    # Missing values sort lowest so gaps stay visible in the decimated line.
+    order = np.lexsort((np.nan_to_num(y, nan=-np.inf), bucket))
+    first = np.r_[0, np.flatnonzero(np.diff(bucket[order])) + 1]
+    last = np.r_[first[1:] - 1, n - 1]
+    keep = np.unique(np.concatenate([order[first], order[last], [0, n - 1]]))
+    return x[keep], y[keep]
+
+
+def line_trace(x: Sequence, y: Sequence, name: str,
+               webgl_threshold: int = FIGURE_CACHE_CONFIG["webgl_threshold"],
+               max_points: int = FIGURE_CACHE_CONFIG["max_points_per_trace"]):
+    """Line trace that switches to WebGL and decimates once a series gets large"""
+    if len(y) > webgl_threshold:
+        x, y = decimate(x, y, max_points)
+        return go.Scattergl(x=x, y=y, name=name, mode="lines")
+    return go.Scatter(x=x, y=y, name=name, mode="lines+markers")
+
+
+class FigureCache:
+    """Figure JSON keyed on (countries, analysis type, data version).
+
+    Figures are built and serialized once per key; later reruns get the JSON
+    strings back without touching Plotly. ``st.plotly_chart`` accepts
+    ``json.loads`` of an entry directly. A new data version simply produces new
+    keys, and stale ones age out of the LRU.
+    """
+
+    def __init__(self, cache: Optional[BoundedCache] = None):
+        self.cache = cache if cache is not None else BoundedCache(
+            max_entries=FIGURE_CACHE_CONFIG["max_entries"],
+            max_bytes=FIGURE_CACHE_CONFIG["max_bytes"]
+        )
+
+    @staticmethod
+    def key(countries: List[str], analysis_type: str, version: Hashable) -> tuple:
+        return ("figures", tuple(sorted(countries)), analysis_type, version)
+
+    def get_or_build(self, countries: List[str], analysis_type: str, version: Hashable,
+                     build: Callable[[], Dict[str, go.Figure]]) -> Dict[str, str]:
+        """Cached figure JSON by name, building and serializing on a miss"""
+        key = self.key(countries, analysis_type, version)
+        figures = self.cache.get(key)
+        if figures is None:
+            figures = {name: figure.to_json() for name, figure in build().items()}
+            self.cache.put(key, figures)
+            logger.debug(f"Built {len(figures)} figures for {analysis_type} at version {version}")
+        return figures
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
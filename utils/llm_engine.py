@@ -0,0 +1,182 @@
+"""Shared asyncio execution engine for model calls.
+
+Every model call goes through one background event loop that enforces a global
+concurrency cap, per-provider token-bucket rate limits (requests and tokens per
+minute) and a bounded admission queue. Async code awaits ``LLMEngine.run``;
+synchronous Streamlit code uses ``run_sync`` / ``call_blocking``.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .config import LLM_ENGINE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class EngineOverloaded(RuntimeError):
+    """Raised when the admission queue stays full for longer than queue_timeout"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        """Wait until ``amount`` tokens are available and take them"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class ProviderLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, estimated_tokens: int):
+        await self.requests.acquire(1)
+        if estimated_tokens:
+            await self.tokens.acquire(estimated_tokens)
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    """Rough prompt size (~4 characters per token) plus the output allowance"""
+    return len(text) // 4 + max_output_tokens
+
+
+class LLMEngine:
+    def __init__(self,
+                 max_concurrency: int = LLM_ENGINE_CONFIG["max_concurrency"],
+                 max_queue_size: int = LLM_ENGINE_CONFIG["max_queue_size"],
+                 queue_timeout: float = LLM_ENGINE_CONFIG["queue_timeout"],
+                 provider_limits: Optional[Dict[str, Dict]] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.provider_limits = provider_limits or LLM_ENGINE_CONFIG["providers"]
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                           thread_name_prefix="llm-engine")
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="llm-engine-loop", daemon=True)
+        self._thread.start()
+        # Loop-bound primitives are created on the engine loop itself
+        asyncio.run_coroutine_threadsafe(self._create_primitives(), self.loop).result()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _create_primitives(self):
+        self._queue_slots = asyncio.Semaphore(self.max_queue_size)
+        self._running = asyncio.Semaphore(self.max_concurrency)
+        self._limiters = {
+            name: ProviderLimiter(limits["requests_per_minute"], limits["tokens_per_minute"])
+            for name, limits in self.provider_limits.items()
+        }
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+                      "queued": 0, "in_flight": 0}
+
+    async def _submit(self, provider: str, call: Callable[[], Awaitable], estimated_tokens: int):
+        try:
+            await asyncio.wait_for(self._queue_slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise EngineOverloaded(
+                f"LLM engine queue is full ({self.max_queue_size} pending requests)"
+            )
+
+        self.stats["submitted"] += 1
+        self.stats["queued"] += 1
+        started = False
+        try:
+            limiter = self._limiters.get(provider)
+            if limiter is not None:
+                await limiter.acquire(estimated_tokens)
+            async with self._running:
+                started = True
+                self.stats["queued"] -= 1
+                self.stats["in_flight"] += 1
+                try:
+                    result = await call()
+                    self.stats["completed"] += 1
+                    return result
+                except Exception:
+                    self.stats["failed"] += 1
+                    raise
+                finally:
+                    self.stats["in_flight"] -= 1
+        finally:
+            if not started:
+                self.stats["queued"] -= 1
+            self._queue_slots.release()
+
+    async def run(self, provider: str, call: Callable[[], Awaitable], estimated_tokens: int = 0) -> Any:
+        """Run an async model call under the engine's limits from any event loop"""
+        coro = self._submit(provider, call, estimated_tokens)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def run_sync(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the engine loop and block the calling thread for its result.
+
+        After ``timeout`` seconds the coroutine is cancelled, releasing its queue
+        and concurrency slots, and TimeoutError is raised.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except FuturesTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"LLM engine call did not finish within {timeout:.2f}s") from None
+
+    def call_blocking(self, provider: str, fn: Callable, *args, estimated_tokens: int = 0,
+                      timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking client call (e.g. boto3) in the engine's thread pool under its limits.
+
+        ``timeout`` bounds the wait including queueing; a client call already
+        running finishes in the background and its result is dropped.
+        """
+        async def call():
+            return await self.loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+        return self.run_sync(self._submit(provider, call, estimated_tokens), timeout)
+
+
+_engine: Optional[LLMEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> LLMEngine:
+    """Return the process-wide engine, starting its loop on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = LLMEngine()
+    return _engine
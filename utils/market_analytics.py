@@ -0,0 +1,180 @@
+"""Vectorized analytics over stored market data history."""
+
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .market_store import MarketStore
+
+logger = logging.getLogger(__name__)
+
+SCALAR_FIELDS = ("population", "gdp_per_capita", "internet_penetration", "smartphone_users",
+                 "streaming_revenue", "digital_payment_penetration")
+RANKED_METRICS = ("streaming_revenue", "revenue_per_capita", "population", "smartphone_users",
+                  "internet_penetration", "digital_payment_penetration")
+
+
+class MarketAnalytics:
+    """Columnar frames and aggregates over every stored snapshot.
+
+    Each country's snapshots are loaded into a snapshot frame plus long
+    genre/platform frames, and all aggregates (quarterly growth, shares,
+    rankings) are computed with vectorized pandas operations. When
+    ``store.version()`` changes only the countries written since are rebuilt,
+    so dashboard queries are just row filters on precomputed frames.
+    """
+
+    def __init__(self, store: MarketStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._countries: Dict[str, Dict[str, pd.DataFrame]] = {}
+        self._aggregates: Dict[str, pd.DataFrame] = {}
+
+    def _load(self) -> Dict[str, pd.DataFrame]:
+        version = self.store.version()
+        if version == self._version:
+            return self._aggregates
+        with self._lock:
+            if version != self._version:
+                changed = None if self._version is None else self.store.changed_since(self._version)
+                snapshots: Dict[str, List[Dict]] = {}
+                for country, data in self.store.snapshot_dicts(changed):
+                    snapshots.setdefault(country, []).append(data)
+                for country, rows in snapshots.items():
+                    self._countries[country] = self._build_country(country, rows)
+                self._aggregates = self._combine(self._countries)
+                self._version = version
+                logger.info(f"Rebuilt market aggregates for {len(snapshots)} countries at store version {version}")
+        return self._aggregates
+
+    @staticmethod
+    def _build_country(country: str, snapshots: List[Dict]) -> Dict[str, pd.DataFrame]:
+        """Frames for one country's snapshots, oldest first"""
+        snapshot_columns = ["country", "last_updated", *SCALAR_FIELDS]
+        snapshots_df = pd.DataFrame(
+            [[country, data["last_updated"], *(data.get(field) for field in SCALAR_FIELDS)]
+             for data in snapshots],
+            columns=snapshot_columns
+        )
+        snapshots_df["last_updated"] = pd.to_datetime(snapshots_df["last_updated"])
+        snapshots_df[list(SCALAR_FIELDS)] = snapshots_df[list(SCALAR_FIELDS)].astype(float)
+        snapshots_df["revenue_per_capita"] = (
+            snapshots_df["streaming_revenue"] / snapshots_df["population"].replace(0, np.nan)
+        )
+
+        # Last snapshot in each quarter, then quarter-over-quarter growth where the
+        # previous quarter is present; a gap leaves the growth undefined
+        quarters = snapshots_df.assign(quarter=snapshots_df["last_updated"].dt.to_period("Q"))
+        quarterly = quarters.drop_duplicates("quarter", keep="last").reset_index(drop=True)
+        ordinal = quarterly["last_updated"].dt.year * 4 + quarterly["last_updated"].dt.quarter
+        revenue = quarterly["streaming_revenue"]
+        growth = (revenue / revenue.shift() - 1) * 100
+        quarterly["revenue_growth"] = growth.where(ordinal.diff() == 1)
+
+        latest = snapshots[-1] if snapshots else {}
+        genres = pd.DataFrame(
+            [(country, genre, value) for genre, value in (latest.get("genre_popularity") or {}).items()],
+            columns=["country", "genre", "popularity"]
+        )
+        platforms = pd.DataFrame(
+            [(country, platform["name"], platform["market_share"], platform.get("local", False))
+             for platform in latest.get("platforms") or []],
+            columns=["country", "platform", "market_share", "local"]
+        )
+        return {
+            "latest": snapshots_df.tail(1).set_index("country"),
+            "quarterly": quarterly,
+            "genres": genres,
+            "platforms": platforms
+        }
+
+    @staticmethod
+    def _combine(countries: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+        """All countries' frames in country order, with cross-country shares and rankings"""
+        # An empty store still gets frames with the right columns
+        ordered = [countries[country] for country in sorted(countries)] or [MarketAnalytics._build_country("", [])]
+        frames = {name: pd.concat([parts[name] for parts in ordered], ignore_index=name != "latest")
+                  for name in ("latest", "quarterly", "genres", "platforms")}
+        frames["genres"]["share"] = _normalize(frames["genres"], "popularity")
+        frames["platforms"]["share"] = _normalize(frames["platforms"], "market_share")
+        latest = frames["latest"]
+        frames["rankings"] = latest[list(RANKED_METRICS)].rank(
+            ascending=False, method="min", na_option="bottom").astype(int)
+        return frames
+
+    @staticmethod
+    def _labels(countries: Optional[List[str]]) -> Optional[Dict[str, str]]:
+        """Store key -> the caller's spelling of each requested country"""
+        if countries is None:
+            return None
+        return {country.strip().lower(): country for country in countries}
+
+    @staticmethod
+    def _select(frame: pd.DataFrame, labels: Optional[Dict[str, str]], on_index: bool = False) -> pd.DataFrame:
+        keys = frame.index if on_index else frame["country"]
+        if labels is None:
+            return frame.copy()
+        selected = frame[keys.isin(list(labels))].copy()
+        if on_index:
+            selected.index = selected.index.map(labels)
+        else:
+            selected["country"] = selected["country"].map(labels)
+        return selected
+
+    def latest(self, countries: Optional[List[str]] = None) -> pd.DataFrame:
+        """Most recent snapshot per country, indexed by country"""
+        return self._select(self._load()["latest"], self._labels(countries), on_index=True)
+
+    def quarterly_trends(self, countries: Optional[List[str]] = None) -> pd.DataFrame:
+        """Streaming revenue at the end of each quarter with QoQ growth in percent"""
+        quarterly = self._select(self._load()["quarterly"], self._labels(countries))
+        return pd.DataFrame({
+            "Date": quarterly["quarter"].dt.strftime("%Y-Q%q"),
+            "Country": quarterly["country"],
+            "Revenue": quarterly["streaming_revenue"],
+            "Growth": quarterly["revenue_growth"]
+        }).reset_index(drop=True)
+
+    def genre_share(self, countries: Optional[List[str]] = None) -> pd.DataFrame:
+        """Genre popularity normalized to percent of each country's total"""
+        genres = self._select(self._load()["genres"], self._labels(countries))
+        return pd.DataFrame({
+            "Genre": genres["genre"],
+            "Popularity": genres["share"],
+            "Country": genres["country"]
+        }).reset_index(drop=True)
+
+    def platform_share(self, countries: Optional[List[str]] = None) -> pd.DataFrame:
+        """Platform market share normalized to percent of each country's total"""
+        platforms = self._select(self._load()["platforms"], self._labels(countries))
+        return pd.DataFrame({
+            "Platform": platforms["platform"],
+            "Share": platforms["share"],
+            "Local": platforms["local"],
+            "Country": platforms["country"]
+        }).reset_index(drop=True)
+
+    def rankings(self, countries: Optional[List[str]] = None) -> pd.DataFrame:
+        """1-based rank of each country per metric, across all stored countries"""
+        return self._select(self._load()["rankings"], self._labels(countries), on_index=True)
+
+    def summary(self, countries: List[str]) -> pd.DataFrame:
+        """Latest headline metrics, in the shape of DataManager.get_market_summary"""
+        latest = self.latest(countries)
+        return pd.DataFrame({
+            "Country": latest.index,
+            "Population": latest["population"].fillna(0).astype("int64").to_numpy(),
+            "Streaming Revenue": latest["streaming_revenue"].to_numpy(),
+            "Internet Penetration": latest["internet_penetration"].to_numpy(),
+            "Smartphone Users": latest["smartphone_users"].fillna(0).astype("int64").to_numpy()
+        })
+
+
+def _normalize(frame: pd.DataFrame, column: str) -> pd.Series:
+    """Each value as a percent of its country's total"""
+    totals = frame.groupby("country")[column].transform("sum")
+    return frame[column].astype(float) / totals.replace(0, np.nan) * 100
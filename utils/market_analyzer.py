@@ -1,40 +1,37 @@
+from .config import ANALYSIS_CONFIG
 from .data_manager import DataManager, MarketData
+from .figure_cache import FigureCache, line_trace
 import asyncio
-from typing import List, Dict, Any
+import logging
+import time
+from typing import List, Dict, Any, Optional, Tuple
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-import random
+
+logger = logging.getLogger(__name__)
 
 class MarketAnalyzer:
-    def __init__(self):
+    def __init__(self, data_manager: Optional[DataManager] = None):
         """Initialize the MarketAnalyzer"""
-        pass
+        self.data_manager = data_manager or DataManager()
+        self.analytics = self.data_manager.analytics
+        self.figure_cache = FigureCache()
+        self.country_timeout = ANALYSIS_CONFIG["country_timeout"]
+        self.analysis_timeout = ANALYSIS_CONFIG["analysis_timeout"]
+        self._analyses = {
+            "Market Overview": self._generate_market_overview,
+            "Cultural Fit": self._analyze_cultural_fit,
+            "Competitive Analysis": self._analyze_competition
+        }
 
     def get_market_trends(self, countries: List[str]) -> pd.DataFrame:
         """Get market trends for selected countries"""
-        data = []
-        for country in countries:
-            data.extend([
-                {"Date": "2023-Q1", "Revenue": random.uniform(10, 15), "Country": country},
-                {"Date": "2023-Q2", "Revenue": random.uniform(11, 16), "Country": country},
-                {"Date": "2023-Q3", "Revenue": random.uniform(12, 17), "Country": country},
-                {"Date": "2023-Q4", "Revenue": random.uniform(13, 18), "Country": country}
-            ])
-        return pd.DataFrame(data)
+        return self.analytics.quarterly_trends(countries)
 
     def get_genre_distribution(self, countries: List[str]) -> pd.DataFrame:
         """Get genre distribution for selected countries"""
-        genres = ["Afrobeats", "Amapiano", "Hip-Hop", "Gospel", "Traditional"]
-        data = []
-        for country in countries:
-            for genre in genres:
-                data.append({
-                    "Genre": genre,
-                    "Popularity": random.uniform(0, 100),
-                    "Country": country
-                })
-        return pd.DataFrame(data)
+        return self.analytics.genre_share(countries)
 
     def get_language_insights(self, countries: List[str]) -> pd.DataFrame:
         """Get language distribution insights"""
@@ -49,40 +46,124 @@ class MarketAnalyzer:
 
     def get_platform_share(self, countries: List[str]) -> pd.DataFrame:
         """Get streaming platform market share"""
-        platforms = ["Spotify", "Apple Music", "Boomplay", "YouTube Music"]
-        data = []
-        remaining = 100
-        for platform in platforms[:-1]:
-            share = round(random.uniform(0, remaining), 2)
-            remaining -= share
-            data.append({
-                "Platform": platform,
-                "Share": share
-            })
-        # Add the last platform with remaining share
-        data.append({
-            "Platform": platforms[-1],
-            "Share": round(remaining, 2)
-        })
-        return pd.DataFrame(data)
+        shares = self.analytics.platform_share(countries)
+        # Equal-weighted average across the selected countries that have platform data
+        combined = shares.groupby("Platform", as_index=False)["Share"].sum()
+        combined["Share"] = (combined["Share"] / max(shares["Country"].nunique(), 1)).round(2)
+        return combined.sort_values("Share", ascending=False, ignore_index=True)
+
+    def get_market_rankings(self, countries: List[str]) -> pd.DataFrame:
+        """Rank of each selected country per metric among all stored countries"""
+        return self.analytics.rankings(countries)
 
     async def analyze_market(self, countries: List[str], analysis_type: str) -> Dict[str, Any]:
+        """Run one analysis type; see analyze_markets for partial-result handling"""
+        report = await self.analyze_markets(countries, [analysis_type])
+        result = report["results"].get(analysis_type)
+        if result is None:
+            result = {"status": "error", "error": report["errors"][analysis_type]}
+        result["missing_countries"] = report["missing_countries"]
+        result["timings"] = report["timings"]
+        return result
+
+    async def analyze_markets(self, countries: List[str], analysis_types: List[str]) -> Dict[str, Any]:
+        """Fetch all countries concurrently, then run the analysis types in parallel.
+
+        Countries that time out or fail are left out and listed in
+        ``missing_countries``; an analysis that fails or times out is reported
+        in ``errors`` without affecting the others.
+        """
+        for analysis_type in analysis_types:
+            if analysis_type not in self._analyses:
+                raise ValueError(f"Unknown analysis type: {analysis_type}")
+
+        started = time.perf_counter()
+        timings = {"fetch_by_country": {}}
         # Fetch data for all countries
-        tasks = [self.data_manager.get_market_data(country) for country in countries]
-        market_data = await asyncio.gather(*tasks)
-        
-        if analysis_type == "Market Overview":
-            return self._generate_market_overview(countries, market_data)
-        elif analysis_type == "Cultural Fit":
-            return self._analyze_cultural_fit(countries, market_data)
-        elif analysis_type == "Competitive Analysis":
-            return self._analyze_competition(countries, market_data)
+        fetched = await asyncio.gather(*[self._fetch_country(country, timings) for country in countries])
+        timings["fetch"] = time.perf_counter() - started
+
+        available, market_data, missing = [], [], {}
+        for country, (data, error) in zip(countries, fetched):
+            if data is None:
+                missing[country] = error
+            else:
+                available.append(country)
+                market_data.append(data)
+
+        results, errors = {}, {}
+        if available:
+            outcomes = await asyncio.gather(*[
+                self._run_analysis(analysis_type, available, market_data, timings)
+                for analysis_type in analysis_types
+            ], return_exceptions=True)
+            for analysis_type, outcome in zip(analysis_types, outcomes):
+                if isinstance(outcome, Exception):
+                    errors[analysis_type] = str(outcome) or type(outcome).__name__
+                else:
+                    results[analysis_type] = outcome
         else:
-            raise ValueError(f"Unknown analysis type: {analysis_type}")
+            errors = {analysis_type: "No market data available for the selected countries"
+                      for analysis_type in analysis_types}
+
+        timings["total"] = time.perf_counter() - started
+        return {
+            "results": results,
+            "errors": errors,
+            "missing_countries": missing,
+            "timings": timings
+        }
+
+    async def _fetch_country(self, country: str, timings: Dict) -> Tuple[Optional[MarketData], Optional[str]]:
+        """Market data for one country, or (None, reason) so one slow country can't block the rest"""
+        start = time.perf_counter()
+        try:
+            # Timing out only stops waiting; the shared refresh keeps running for later callers
+            data = await asyncio.wait_for(self.data_manager.get_market_data(country), self.country_timeout)
+            error = None if data else "no data available"
+        except asyncio.TimeoutError:
+            logger.warning(f"Market data for {country} timed out after {self.country_timeout}s")
+            data, error = None, "timed out"
+        except Exception as e:
+            logger.error(f"Error fetching market data for {country}: {str(e)}")
+            data, error = None, str(e)
+        timings["fetch_by_country"][country] = time.perf_counter() - start
+        return data, error
+
+    async def _run_analysis(self, analysis_type: str, countries: List[str],
+                            market_data: List[MarketData], timings: Dict) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            # pandas/Plotly work runs on a thread so analysis types overlap
+            return await asyncio.wait_for(
+                asyncio.to_thread(self._analyses[analysis_type], countries, market_data),
+                self.analysis_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"{analysis_type} timed out after {self.analysis_timeout}s")
+            raise TimeoutError(f"{analysis_type} timed out")
+        except Exception as e:
+            logger.error(f"Error running {analysis_type}: {str(e)}")
+            raise
+        finally:
+            timings[analysis_type] = time.perf_counter() - start
 
     def _generate_market_overview(self, countries: List[str], market_data: List[MarketData]) -> Dict[str, Any]:
         df = self.data_manager.get_market_summary(countries)
         
+        # Pre-serialized figure JSON, rebuilt only when the stored data changes
+        figures = self.figure_cache.get_or_build(
+            countries, "Market Overview", self.data_manager.store.version(),
+            lambda: self._market_overview_figures(countries, df)
+        )
+        
+        return {
+            "data": df.to_dict("records"),
+            "figures": figures,
+            "summary": self._generate_market_summary(countries, market_data)
+        }
+
+    def _market_overview_figures(self, countries: List[str], df: pd.DataFrame) -> Dict[str, go.Figure]:
         figures = {}
         # Create visualizations using the actual scraped data
         figures["market_size"] = px.bar(
@@ -92,13 +173,99 @@ class MarketAnalyzer:
             title="Streaming Market Size by Country",
             color="Country"
         )
+
+        trends = self.get_market_trends(countries)
+        revenue = go.Figure(layout={"title": "Streaming Revenue by Quarter"})
+        for country, series in trends.groupby("Country", sort=False):
+            revenue.add_trace(line_trace(series["Date"], series["Revenue"], country))
+        figures["revenue_trend"] = revenue
         
-        # Add more visualizations...
-        
+        return figures
+
+    def _analyze_cultural_fit(self, countries: List[str], market_data: List[MarketData]) -> Dict[str, Any]:
+        languages = pd.DataFrame({
+            "Country": countries,
+            "Languages": [", ".join(data.languages) for data in market_data],
+            "Language Count": [len(data.languages) for data in market_data]
+        })
+        genres = self.get_genre_distribution(countries)
+        top_genres = genres.sort_values("Popularity", ascending=False).groupby("Country").head(3)
+
+        figures = self.figure_cache.get_or_build(
+            countries, "Cultural Fit", self.data_manager.store.version(),
+            lambda: {"genre_share": px.bar(genres, x="Country", y="Popularity", color="Genre",
+                                           title="Genre Share by Country (%)")}
+        )
+
+        leading = top_genres.groupby("Country")["Genre"].agg(", ".join)
+        summary = " ".join(
+            f"{row.Country}: top genres {leading.get(row.Country, 'unknown')}; "
+            f"languages {row.Languages or 'unknown'}."
+            for row in languages.itertuples()
+        )
+
         return {
-            "data": df.to_dict("records"),
+            "data": {
+                "languages": languages.to_dict("records"),
+                "top_genres": top_genres.to_dict("records")
+            },
             "figures": figures,
-            "summary": self._generate_market_summary(countries, market_data)
+            "summary": summary
+        }
+
+    def _analyze_competition(self, countries: List[str], market_data: List[MarketData]) -> Dict[str, Any]:
+        shares = self.analytics.platform_share(countries)
+        fraction = shares["Share"] / 100
+        grouped = shares.assign(
+            concentration=fraction ** 2,
+            local_share=shares["Share"].where(shares["Local"].astype(bool), 0.0)
+        ).groupby("Country")
+        competition = pd.DataFrame({
+            "Platforms": grouped["Platform"].count(),
+            # Herfindahl-Hirschman index on 0-10,000 scale; above 2,500 is highly concentrated
+            "HHI": (grouped["concentration"].sum() * 10000).round(0),
+            "Local Share": grouped["local_share"].sum().round(2)
+        })
+        if not shares.empty:
+            leaders = shares.loc[grouped["Share"].idxmax()].set_index("Country")
+            competition["Leader"] = leaders["Platform"]
+        competition = competition.reset_index()
+
+        figures = self.figure_cache.get_or_build(
+            countries, "Competitive Analysis", self.data_manager.store.version(),
+            lambda: {"platform_share": px.bar(shares, x="Country", y="Share", color="Platform",
+                                              title="Streaming Platform Share by Country (%)")}
+        )
+
+        if competition.empty:
+            summary = "No platform data available for the selected countries."
+        else:
+            most_open = competition.loc[competition["HHI"].idxmin()]
+            summary = (f"{most_open['Country']} is the least concentrated streaming market "
+                       f"(HHI {most_open['HHI']:.0f}); average local platform share is "
+                       f"{competition['Local Share'].mean():.1f}%.")
+
+        return {
+            "data": competition.to_dict("records"),
+            "rankings": self.get_market_rankings(countries).reset_index().to_dict("records"),
+            "figures": figures,
+            "summary": summary
         }
 
-    # Implement other analysis methods...
+    def _generate_market_summary(self, countries: List[str], market_data: List[MarketData]) -> str:
+        df = self.data_manager.get_market_summary(countries)
+        if df.empty:
+            return "No market data available for the selected countries."
+
+        largest = df.loc[df["Streaming Revenue"].idxmax()]
+        connected = df.loc[df["Internet Penetration"].idxmax()]
+        summary = [
+            f"{len(df)} markets with combined streaming revenue of ${df['Streaming Revenue'].sum():,.0f}.",
+            f"{largest['Country']} is the largest streaming market (${largest['Streaming Revenue']:,.0f}).",
+            f"{connected['Country']} has the highest internet penetration ({connected['Internet Penetration']:.0%})."
+        ]
+        growth = self.get_market_trends(countries).dropna(subset=["Growth"])
+        if not growth.empty:
+            latest_growth = growth.groupby("Country")["Growth"].last()
+            summary.append(f"Latest quarter-over-quarter revenue growth averages {latest_growth.mean():.1f}%.")
+        return " ".join(summary)
@@ -0,0 +1,212 @@
+"""Parse-once HTML extraction for the market data sources.
+
+Each source page is parsed a single time into a ``ParsedPage`` (visible text
+plus table rows) that every extractor for that source shares. Parsing uses
+lxml when it is installed and falls back to BeautifulSoup's html.parser.
+
+The functions here are module-level and return plain JSON-style values so
+``parse_source`` can run in a worker process.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# lxml refuses str input that carries an encoding declaration
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+_NUMBER = (r"((?:us)?\$|\busd\s?|€|£|₦)?\s*(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+           r"\s*(?:(billion|bn|million|mn|m|thousand|k|%)(?![a-z]))?")
+_YEAR = re.compile(r"(?:19|20)\d{2}")
+_MULTIPLIERS = {"billion": 1e9, "bn": 1e9, "million": 1e6, "mn": 1e6, "m": 1e6,
+                "thousand": 1e3, "k": 1e3}
+
+KNOWN_GENRES = ("Afrobeats", "Amapiano", "Bongo Flava", "Highlife", "Gqom", "Afro House",
+                "Kwaito", "Gospel", "Hip Hop", "Afropop", "Coupé-Décalé", "Genge", "Fuji")
+LOCAL_PLATFORMS = ("Boomplay", "Audiomack", "Mdundo", "Anghami", "uduX")
+
+
+class ParsedPage:
+    """Visible text and table rows of one HTML page"""
+
+    def __init__(self, text: str, tables: List[List[List[str]]]):
+        self.text = text
+        self.lower_text = text.lower()
+        self.tables = tables
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def parse_page(html: Optional[str], use_lxml: bool = HAS_LXML) -> ParsedPage:
+    """Parse HTML once into text and tables, skipping script/style content.
+
+    Pages lxml rejects (e.g. only comments) go through html.parser instead.
+    """
+    if not html or not html.strip():
+        return ParsedPage("", [])
+    if use_lxml:
+        try:
+            root = lxml.html.fromstring(_XML_DECLARATION.sub("", html, count=1))
+        except (etree.ParserError, ValueError):
+            return parse_page(html, use_lxml=False)
+        for node in root.xpath("//script|//style|//noscript"):
+            node.drop_tree()
+        tables = [
+            [[_clean(cell.text_content()) for cell in row.xpath("./th|./td")] for row in table.xpath(".//tr")]
+            for table in root.xpath("//table")
+        ]
+        return ParsedPage(_clean(root.text_content()), tables)
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    for node in soup(["script", "style", "noscript"]):
+        node.decompose()
+    tables = [
+        [[_clean(cell.get_text(" ")) for cell in row.find_all(["th", "td"])] for row in table.find_all("tr")]
+        for table in soup.find_all("table")
+    ]
+    return ParsedPage(_clean(soup.get_text(" ")), tables)
+
+
+def _to_number(value: str, unit: Optional[str]) -> float:
+    number = float(value.replace(",", ""))
+    return number * _MULTIPLIERS.get((unit or "").lower(), 1)
+
+
+def _find_value(page: ParsedPage, labels: Tuple[str, ...], percent: bool = False) -> Optional[float]:
+    """Number within a short window after any label, scaled by its unit.
+
+    With ``percent`` set, the first percentage is returned as a fraction.
+    Otherwise percentages (growth rates) and bare years such as "2023" are
+    skipped, and a number carrying a currency, a scale word or thousands
+    separators is preferred over a plain one later in the same window.
+    """
+    for label in labels:
+        for match in re.finditer(re.escape(label), page.lower_text):
+            window = page.lower_text[match.end():match.end() + 80]
+            plain = None
+            for number in re.finditer(_NUMBER, window):
+                currency, value, unit = number.groups()
+                if unit == "%":
+                    if percent:
+                        return float(value) / 100
+                    continue
+                if percent:
+                    continue
+                if currency or unit or "," in value:
+                    return _to_number(value, unit)
+                if plain is None and not _YEAR.fullmatch(value):
+                    plain = _to_number(value, unit)
+            if plain is not None:
+                return plain
+    return None
+
+
+def _percent_rows(page: ParsedPage, keywords: Tuple[str, ...]) -> Dict[str, float]:
+    """Label -> fraction from tables whose text mentions one of the keywords"""
+    shares = {}
+    for table in page.tables:
+        flat = " ".join(" ".join(row) for row in table).lower()
+        if not any(keyword in flat for keyword in keywords):
+            continue
+        for row in table:
+            if len(row) < 2 or not row[0]:
+                continue
+            for cell in row[1:]:
+                match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*%", cell)
+                if match:
+                    shares[row[0]] = float(match.group(1)) / 100
+                    break
+    return shares
+
+
+def extract_streaming_revenue(page: ParsedPage) -> float:
+    value = _find_value(page, ("streaming revenue", "digital revenue", "recorded music revenue"))
+    return value or 0.0
+
+
+def extract_population(page: ParsedPage) -> int:
+    return int(_find_value(page, ("population",)) or 0)
+
+
+def extract_gdp(page: ParsedPage) -> float:
+    return _find_value(page, ("gdp per capita",)) or 0.0
+
+
+def extract_internet_stats(page: ParsedPage) -> float:
+    return _find_value(page, ("internet penetration", "mobile internet penetration", "internet users"),
+                       percent=True) or 0.0
+
+
+def extract_smartphone_stats(page: ParsedPage) -> int:
+    return int(_find_value(page, ("smartphone users", "smartphone connections")) or 0)
+
+
+def extract_payment_stats(page: ParsedPage) -> float:
+    return _find_value(page, ("digital payment", "mobile money"), percent=True) or 0.0
+
+
+def extract_platform_data(page: ParsedPage) -> List[Dict]:
+    shares = _percent_rows(page, ("platform", "streaming service", "market share"))
+    return [
+        {
+            "name": name,
+            "market_share": share,
+            "monthly_active_users": 0,
+            "local": name in LOCAL_PLATFORMS,
+            "supported_countries": []
+        }
+        for name, share in shares.items()
+    ]
+
+
+def extract_genre_data(page: ParsedPage) -> Dict[str, float]:
+    shares = _percent_rows(page, ("genre",))
+    if shares:
+        return shares
+    # Fall back to "<genre> ... NN%" mentions in running text
+    for genre in KNOWN_GENRES:
+        share = _find_value(page, (genre.lower(),), percent=True)
+        if share is not None:
+            shares[genre] = share
+    return shares
+
+
+def extract_artist_data(page: ParsedPage) -> Dict[str, float]:
+    return _percent_rows(page, ("artist",))
+
+
+# MarketData fields fed by each source, with the extractor for each one
+SOURCE_FIELDS: Dict[str, Dict[str, Callable[[ParsedPage], object]]] = {
+    'ifpi': {
+        'streaming_revenue': extract_streaming_revenue
+    },
+    'worldbank': {
+        'population': extract_population,
+        'gdp_per_capita': extract_gdp
+    },
+    'gsma': {
+        'internet_penetration': extract_internet_stats,
+        'smartphone_users': extract_smartphone_stats,
+        'digital_payment_penetration': extract_payment_stats
+    },
+    'statista': {
+        'platforms': extract_platform_data,
+        'genre_popularity': extract_genre_data,
+        'artist_demographics': extract_artist_data
+    }
+}
+
+
+def parse_source(source: str, html: Optional[str], use_lxml: bool = HAS_LXML) -> Dict:
+    """Parse one source page once and run all of that source's extractors on it"""
+    page = parse_page(html, use_lxml)
+    return {field: extractor(page) for field, extractor in SOURCE_FIELDS[source].items()}
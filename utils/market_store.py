@@ -0,0 +1,141 @@
+"""SQLite-backed history of market data snapshots."""
+
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .data_scraper import MarketData
+
+logger = logging.getLogger(__name__)
+
+
+def country_key(country: str) -> str:
+    """Canonical spelling of a country name used for every cache, flight and store key"""
+    return country.strip().lower()
+
+
+class MarketStore:
+    """Stores one row per (country, last_updated) snapshot.
+
+    The composite index on (country, last_updated) makes latest-snapshot and
+    time-range lookups index seeks, so history can grow to years of snapshots.
+    Snapshots are stored as JSON and come back as typed ``MarketData``.
+    """
+
+    def __init__(self, path: str = "data/market_data.sqlite"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS market_snapshots ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "country TEXT NOT NULL, "
+            "last_updated TEXT NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "UNIQUE (country, last_updated))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_snapshots_country_updated "
+            "ON market_snapshots (country, last_updated)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _key(country: str) -> str:
+        return country_key(country)
+
+    def save(self, country: str, data: MarketData):
+        """Insert a snapshot, replacing one with the same timestamp"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO market_snapshots (country, last_updated, payload) "
+                "VALUES (?, ?, ?)",
+                (self._key(country), data.last_updated.isoformat(), json.dumps(data.to_dict()))
+            )
+            self._db.commit()
+
+    def latest(self, country: str) -> Optional[MarketData]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload FROM market_snapshots WHERE country = ? "
+                "ORDER BY last_updated DESC LIMIT 1",
+                (self._key(country),)
+            ).fetchone()
+        return MarketData.from_dict(json.loads(row[0])) if row else None
+
+    def history(self, country: str,
+                start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> List[MarketData]:
+        """Snapshots for a country in [start, end], oldest first"""
+        query = "SELECT payload FROM market_snapshots WHERE country = ?"
+        params = [self._key(country)]
+        if start is not None:
+            query += " AND last_updated >= ?"
+            params.append(start.isoformat())
+        if end is not None:
+            query += " AND last_updated <= ?"
+            params.append(end.isoformat())
+        query += " ORDER BY last_updated"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [MarketData.from_dict(json.loads(payload)) for (payload,) in rows]
+
+    def snapshot_dicts(self, countries: Optional[List[str]] = None) -> List[Tuple[str, Dict]]:
+        """Snapshots as (country, to_dict() payload), ordered by country and time.
+
+        Every country's snapshots unless ``countries`` limits them.
+        """
+        query = "SELECT country, payload FROM market_snapshots"
+        params: List[str] = []
+        if countries is not None:
+            params = [self._key(country) for country in countries]
+            query += f" WHERE country IN ({', '.join('?' * len(params))})"
+        query += " ORDER BY country, last_updated"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [(country, json.loads(payload)) for country, payload in rows]
+
+    def countries(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT country FROM market_snapshots").fetchall()
+        return [country for (country,) in rows]
+
+    def version(self) -> int:
+        """Increases whenever a snapshot is written; usable as a cache key"""
+        with self._lock:
+            row = self._db.execute("SELECT MAX(id) FROM market_snapshots").fetchone()
+        return row[0] or 0
+
+    def changed_since(self, version: int) -> List[str]:
+        """Countries with a snapshot written after ``version``"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT country FROM market_snapshots WHERE id > ?", (version,)
+            ).fetchall()
+        return [country for (country,) in rows]
+
+    def import_legacy_json(self, data_dir: str) -> int:
+        """Load old market_data_{country}_{YYYYMMDD}.json files into the store"""
+        imported = 0
+        for path in glob.glob(os.path.join(data_dir, "market_data_*_*.json")):
+            country = os.path.basename(path)[len("market_data_"):].rsplit("_", 1)[0]
+            try:
+                with open(path, "r") as f:
+                    data = MarketData.from_dict(json.load(f))
+            except Exception as e:
+                logger.warning(f"Skipping legacy market data file {path}: {str(e)}")
+                continue
+            self.save(country, data)
+            imported += 1
+        if imported:
+            logger.info(f"Imported {imported} legacy market data files from {data_dir}")
+        return imported
@@ -0,0 +1,166 @@
+"""Bounded, thread-safe in-memory cache with LRU/TTL eviction and size accounting."""
+
+import dataclasses
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+_MISSING = object()
+
+
+def approximate_size(value: Any) -> int:
+    """Rough deep size in bytes of dicts, lists, dataclasses and scalars"""
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            stack.extend(getattr(obj, field.name) for field in dataclasses.fields(obj))
+        elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+            stack.append(vars(obj))
+    return total
+
+
+class BoundedCache:
+    """LRU cache bounded by entry count and approximate bytes, with optional TTL.
+
+    All operations take a short internal lock and never block on I/O, so one
+    instance can be shared by Streamlit script threads and asyncio code alike.
+    Entry sizes come from ``sizeof`` (``approximate_size`` by default) and are
+    recorded on insert, so eviction never re-measures values.
+    """
+
+    def __init__(self,
+                 max_entries: Optional[int] = 1024,
+                 max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None,
+                 sizeof: Callable[[Any], int] = approximate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sizeof = sizeof
+        # key -> (value, size in bytes, expires_at or None)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _live(self, key: Hashable, now: float):
+        """Entry for key, dropping it first if it has expired"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is not None and now >= entry[2]:
+            self._remove(key)
+            self._stats["expirations"] += 1
+            return None
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store value, then evict least recently used entries beyond the limits"""
+        size = self.sizeof(value)
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        # Never evict the entry that was just inserted, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry now; returns how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, _, expires_at) in self._entries.items()
+                       if expires_at is not None and now >= expires_at]
+            for key in expired:
+                self._remove(key)
+            self._stats["expirations"] += len(expired)
+        return len(expired)
+
+    def keys(self) -> List[Hashable]:
+        """Snapshot of the cached keys, least recently used first"""
+        with self._lock:
+            return list(self._entries)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.put(key, value)
+
+    def __delitem__(self, key: Hashable):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Membership checks don't count as lookups or change recency
+        with self._lock:
+            return self._live(key, time.monotonic()) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.keys())
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters plus current entries, bytes and hit ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
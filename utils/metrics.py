@@ -0,0 +1,285 @@
+"""In-process metrics: stage latency histograms, token/cost counters and cache hit ratios.
+
+Instrument code with ``span`` (context manager) or ``timed`` (decorator, sync or
+async), and count things with ``get_metrics().inc`` / ``record_usage`` /
+``record_cache``. Read them back as JSON (``snapshot``) or Prometheus text
+(``to_prometheus``), or start ``serve`` to expose ``/metrics`` for scraping.
+With METRICS_CONFIG["enabled"] off every call returns after one flag check.
+"""
+
+import bisect
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import METRICS_CONFIG, MODEL_PRICING, PRICING_MULTIPLIERS
+
+logger = logging.getLogger(__name__)
+
+_NOOP = nullcontext()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def estimate_cost(model_id: str, usage: Dict, batch: bool = False) -> float:
+    """USD cost from usage_metrics-style token counts (0 for models without a price)"""
+    prices = MODEL_PRICING.get(model_id)
+    if prices is None:
+        return 0.0
+    cost = (
+        usage.get("uncached_input_tokens", 0) * prices["input"]
+        + usage.get("cache_read_input_tokens", 0) * prices["input"] * PRICING_MULTIPLIERS["cache_read"]
+        + usage.get("cache_write_input_tokens", 0) * prices["input"] * PRICING_MULTIPLIERS["cache_write"]
+        + usage.get("output_tokens", 0) * prices["output"]
+    ) / 1000
+    return cost * PRICING_MULTIPLIERS["batch"] if batch else cost
+
+
+def _timed(registry: Callable[[], "MetricsRegistry"], stage: str, labels: Dict):
+    """Decorator timing each call in ``registry().span(stage)``, for sync and async functions"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with registry().span(stage, **labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with registry().span(stage, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def _labels(labels: Dict) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Counters and histograms keyed on (name, labels), guarded by one lock"""
+
+    def __init__(self, enabled: bool = METRICS_CONFIG["enabled"],
+                 buckets: Sequence[float] = METRICS_CONFIG["latency_buckets"],
+                 namespace: str = METRICS_CONFIG["namespace"]):
+        self.enabled = enabled
+        self.buckets = sorted(buckets)
+        self.namespace = namespace
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def _span(self, stage: str, labels: Dict):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe("stage_latency_seconds", time.perf_counter() - start, stage=stage, **labels)
+            if status == "error":
+                self.inc("stage_errors_total", stage=stage, **labels)
+
+    def span(self, stage: str, **labels):
+        """Time a block into ``stage_latency_seconds{stage=...}``; errors are counted too"""
+        if not self.enabled:
+            return _NOOP
+        return self._span(stage, labels)
+
+    def timed(self, stage: str, **labels):
+        """Decorator form of ``span`` for functions and coroutine functions"""
+        return _timed(lambda: self, stage, labels)
+
+    def record_usage(self, model_id: str, usage: Dict, batch: bool = False):
+        """Token counters per model and type, plus estimated cost from MODEL_PRICING"""
+        if not self.enabled:
+            return
+        for kind in ("uncached_input", "cache_read_input", "cache_write_input", "output"):
+            tokens = usage.get(f"{kind}_tokens", 0)
+            if tokens:
+                self.inc("tokens_total", tokens, model=model_id, type=kind)
+        self.inc("llm_requests_total", model=model_id)
+        self.inc("cost_usd_total", estimate_cost(model_id, usage, batch), model=model_id)
+
+    def record_cache(self, cache: str, hit: bool):
+        self.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def cache_hit_ratios(self) -> Dict[str, float]:
+        with self._lock:
+            totals: Dict[str, List[float]] = {}
+            for (name, labels), value in self._counters.items():
+                if name != "cache_requests_total":
+                    continue
+                label_map = dict(labels)
+                hits_total = totals.setdefault(label_map["cache"], [0, 0])
+                hits_total[1] += value
+                if label_map["result"] == "hit":
+                    hits_total[0] += value
+        return {cache: hits / total for cache, (hits, total) in totals.items() if total}
+
+    def snapshot(self) -> Dict:
+        """JSON-serializable view with p50/p95 latency estimates per histogram"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{
+                "name": name,
+                "labels": dict(labels),
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95)
+            } for (name, labels), histogram in sorted(self._histograms.items())]
+        return {"counters": counters, "histograms": histograms, "cache_hit_ratios": self.cache_hit_ratios()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            seen = set()
+            for (name, labels), value in counters:
+                full = f"{self.namespace}_{name}"
+                if full not in seen:
+                    seen.add(full)
+                    lines.append(f"# TYPE {full} counter")
+                lines.append(f"{full}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in histograms:
+                full = f"{self.namespace}_{name}"
+                if full not in seen:
+                    seen.add(full)
+                    lines.append(f"# TYPE {full} histogram")
+                cumulative = 0
+                for bound, count in zip(self.buckets + [float("inf")], histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{full}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Process-wide registry configured from METRICS_CONFIG"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
+
+
+def span(stage: str, **labels):
+    return get_metrics().span(stage, **labels)
+
+
+def timed(stage: str, **labels):
+    """Like ``MetricsRegistry.timed`` but resolves the shared registry at call time"""
+    return _timed(get_metrics, stage, labels)
+
+
+def serve(port: int = METRICS_CONFIG["port"], host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus) and /metrics.json from a daemon thread"""
+    registry = get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = registry.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on port {server.server_address[1]}")
+    return server
@@ -0,0 +1,100 @@
+"""Benchmark market data HTML parsing on saved pages.
+
+Usage:
+    python -m utils.parse_benchmark [fixtures_dir] [--executor process|thread|inline] [--workers N]
+
+Fixtures are ``.html`` files named after their source (``ifpi_nigeria.html``,
+``statista-kenya.html``, ...); files without a known source prefix run every
+source's extractors. Without a folder the pages in tests/fixtures/market_pages
+are used. Prints pages/s and MB/s for each parser.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .market_parsers import HAS_LXML, SOURCE_FIELDS, parse_page
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "market_pages"
+
+
+def _source_for(path: str) -> Optional[str]:
+    prefix = re.split(r"[_\-.]", os.path.basename(path).lower(), 1)[0]
+    return prefix if prefix in SOURCE_FIELDS else None
+
+
+def _parse_fixture(job: Tuple[str, Optional[str], bool]) -> int:
+    """Parse one page once and run its extractors; returns the field count"""
+    html, source, use_lxml = job
+    page = parse_page(html, use_lxml)
+    sources = [source] if source else list(SOURCE_FIELDS)
+    return sum(1 for name in sources for extractor in SOURCE_FIELDS[name].values()
+               if extractor(page) is not None)
+
+
+def load_fixtures(folder: str) -> List[Tuple[str, Optional[str]]]:
+    fixtures = []
+    for path in sorted(Path(folder).rglob("*.htm*")):
+        fixtures.append((path.read_text(encoding="utf-8", errors="replace"), _source_for(str(path))))
+    return fixtures
+
+
+def run_benchmark(fixtures: List[Tuple[str, Optional[str]]],
+                  use_lxml: bool,
+                  executor: str = "process",
+                  workers: Optional[int] = None,
+                  repeat: int = 3) -> Dict:
+    """Parse every fixture ``repeat`` times and return throughput"""
+    jobs = [(html, source, use_lxml) for html, source in fixtures] * repeat
+    total_bytes = sum(len(html.encode("utf-8")) for html, _, _ in jobs)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    if executor == "inline":
+        list(map(_parse_fixture, jobs))
+    else:
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            list(pool.map(_parse_fixture, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "parser": "lxml" if use_lxml else "html.parser",
+        "pages": len(jobs),
+        "seconds": elapsed,
+        "pages_per_second": len(jobs) / elapsed if elapsed else 0.0,
+        "mb_per_second": total_bytes / 1e6 / elapsed if elapsed else 0.0
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark market data HTML parsing")
+    parser.add_argument("folder", nargs="?", default=str(DEFAULT_FIXTURES),
+                        help="Folder of saved .html source pages (default: bundled fixtures)")
+    parser.add_argument("--executor", choices=["process", "thread", "inline"], default="process")
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: CPU count)")
+    parser.add_argument("--repeat", type=int, default=3, help="Times to parse each fixture")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.folder)
+    if not fixtures:
+        print(f"No .html fixtures found under {args.folder}")
+        return 1
+
+    parsers = [True, False] if HAS_LXML else [False]
+    for use_lxml in parsers:
+        stats = run_benchmark(fixtures, use_lxml, args.executor, args.workers, args.repeat)
+        print(
+            f"{stats['parser']:>11} ({args.executor}): {stats['pages']} pages in {stats['seconds']:.2f}s, "
+            f"{stats['pages_per_second']:.1f} pages/s, {stats['mb_per_second']:.2f} MB/s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Versioned prompt templates and Bedrock converse prompt assembly with cache points."""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from .config import PROMPT_CONFIG
+from .context_builder import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: str
+    system: str
+    question: str  # formatted with {references} and {prompt}
+
+
+ADVICE_SYSTEM_V2 = """You are an expert in African music marketing and promotion. You advise independent \
+artists, managers and labels working in African markets and with the diaspora.
+
+How to answer:
+- Give concrete, prioritized actions the artist can take, with rough costs or effort where you can.
+- Tailor channels and tactics to the target markets: local streaming platforms (Boomplay, \
+Audiomack, Mdundo) alongside global ones, radio and TV, social platforms, mobile money for \
+payments, and data costs that shape how fans listen.
+- Respect cultural context: language, regional scenes and genres (Afrobeats, Amapiano, \
+Highlife, Bongo Flava and others), and the communities the music comes from. Never suggest \
+misrepresenting an artist's background or appropriating traditions.
+- Scale recommendations to the stated budget and say what to do first if money is tight.
+- When reference material is provided, ground your answer in it and name the source in \
+brackets. If it doesn't cover the question, say so rather than inventing figures.
+- Be concise: short sections with bullet points, no more than about 400 words unless asked."""
+
+TEMPLATES: Dict[str, Dict[str, PromptTemplate]] = {
+    "advice": {
+        # v1: the original single user message with the instructions inlined
+        "v1": PromptTemplate(
+            "advice", "v1",
+            "As an AI expert in African music marketing and promotion, please provide advice based on this context:",
+            "{references}Question: {prompt}"
+        ),
+        "v2": PromptTemplate("advice", "v2", ADVICE_SYSTEM_V2, "{references}Question: {prompt}")
+    }
+}
+
+
+def get_template(name: str, version: Optional[str] = None) -> PromptTemplate:
+    """Template by name at ``version`` (default: PROMPT_CONFIG's pinned version, else the latest)"""
+    versions = TEMPLATES[name]
+    version = version or PROMPT_CONFIG["versions"].get(name) or max(versions)
+    return versions[version]
+
+
+def format_context(context: Optional[Dict]) -> str:
+    """Deterministic context block; identical contexts give byte-identical prefixes"""
+    if not context:
+        return ""
+    lines = []
+    for key in sorted(context):
+        value = context[key]
+        if isinstance(value, (list, tuple, set)):
+            value = ", ".join(sorted(map(str, value))) or "none"
+        lines.append(f"{key}: {value}")
+    return "Marketing context:\n" + "\n".join(lines)
+
+
+def supports_prompt_caching(model_id: str) -> bool:
+    return any(family in model_id for family in PROMPT_CONFIG["cache_model_families"])
+
+
+class PromptAssembler:
+    """Builds converse ``system`` blocks and ``messages`` from a template.
+
+    The static prefix (template system text + formatted marketing context) goes
+    in the system blocks, followed by a cache point when the model supports
+    prompt caching and the prefix is long enough to be cached. Anything that
+    varies per call goes after it: the summary of older conversation turns,
+    recent turns, retrieved passages and the question.
+    """
+
+    def __init__(self, template: Optional[PromptTemplate] = None,
+                 cache_points: bool = PROMPT_CONFIG["cache_points"],
+                 min_cache_tokens: int = PROMPT_CONFIG["min_cache_tokens"]):
+        self.template = template or get_template("advice")
+        self.cache_points = cache_points
+        self.min_cache_tokens = min_cache_tokens
+
+    def caching_inactive_reason(self, model_id: str, context: Optional[Dict] = None) -> Optional[str]:
+        """Why no cache point would be sent for ``model_id`` and ``context``, or None if one would"""
+        if not self.cache_points:
+            return "cache points are disabled"
+        if not supports_prompt_caching(model_id):
+            return f"{model_id} is not in PROMPT_CONFIG['cache_model_families']"
+        prefix_tokens = count_tokens(self.template.system + format_context(context))
+        if prefix_tokens < self.min_cache_tokens:
+            return (f"the {self.template.name} {self.template.version} prefix is {prefix_tokens} tokens, "
+                    f"under min_cache_tokens ({self.min_cache_tokens})")
+        return None
+
+    def system(self, context: Optional[Dict], model_id: str, summary: str = "") -> List[Dict]:
+        blocks = [{"text": self.template.system}]
+        context_text = format_context(context)
+        if context_text:
+            blocks.append({"text": context_text})
+        if self.caching_inactive_reason(model_id, context) is None:
+            blocks.append({"cachePoint": {"type": "default"}})
+        if summary:
+            blocks.append({"text": f"Summary of earlier conversation:\n{summary}"})
+        return blocks
+
+    def messages(self, prompt: str, passages: Sequence = (), history: Sequence = ()) -> List[Dict]:
+        """Recent ``history`` turns (role/content) followed by the new question.
+
+        Converse requires the conversation to start with a user turn, so an
+        assistant turn left first by compaction is dropped.
+        """
+        turns = list(history)
+        while turns and turns[0].role != "user":
+            turns.pop(0)
+        messages = [{"role": turn.role, "content": [{"text": turn.content}]} for turn in turns]
+        messages.append({"role": "user", "content": [{"text": self.question_text(prompt, passages)}]})
+        return messages
+
+    def question_text(self, prompt: str, passages: Sequence = ()) -> str:
+        """The new user turn's text: retrieved ``passages`` followed by the question"""
+        references = ""
+        if passages:
+            references = "Reference material:\n" + "\n".join(
+                f"[{passage.source}] {passage.text}" for passage in passages
+            ) + "\n\n"
+        return self.template.question.format(references=references, prompt=prompt)
+
+
+def usage_metrics(usage: Optional[Dict]) -> Dict:
+    """Input/output token counts from a converse response or stream metadata event"""
+    usage = usage or {}
+    cache_read = usage.get("cacheReadInputTokens", 0)
+    cache_write = usage.get("cacheWriteInputTokens", 0)
+    uncached = usage.get("inputTokens", 0)
+    return {
+        "input_tokens": uncached + cache_read + cache_write,
+        "uncached_input_tokens": uncached,
+        "cache_read_input_tokens": cache_read,
+        "cache_write_input_tokens": cache_write,
+        "output_tokens": usage.get("outputTokens", 0)
+    }
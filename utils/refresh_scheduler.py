@@ -0,0 +1,147 @@
+"""Background refresh of market data before cached entries go stale."""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from .config import REFRESH_CONFIG
+from .data_manager import DataManager
+from .data_scraper import MarketData
+from .market_store import country_key
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """Proactively refreshes countries whose data is about to exceed cache_duration.
+
+    Every ``check_interval`` seconds, countries due within ``refresh_margin`` of
+    expiry are queued and refreshed in batches of ``batch_size``. Concurrent
+    refreshes of the same country share one scrape through the data manager's
+    single-flight group. Refresh outcomes, ticks and lag are also reported to
+    ``get_metrics()`` as ``market_refreshes_total{result=...}``,
+    ``market_refresh_ticks_total`` and ``market_refresh_lag_seconds``.
+    """
+
+    def __init__(self,
+                 data_manager: DataManager,
+                 countries: Optional[Iterable[str]] = None,
+                 check_interval: float = REFRESH_CONFIG["check_interval"],
+                 refresh_margin: float = REFRESH_CONFIG["refresh_margin"],
+                 batch_size: int = REFRESH_CONFIG["batch_size"]):
+        self.data_manager = data_manager
+        # Keyed the way DataManager keys its cache, flights and store
+        self.countries = list(dict.fromkeys(map(country_key, countries))) if countries is not None else None
+        self.check_interval = check_interval
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.batch_size = batch_size
+        self._queue: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"refreshes": 0, "unchanged": 0, "failures": 0, "ticks": 0}
+        self._lag: Dict[str, float] = {}
+
+    def _watched_countries(self) -> List[str]:
+        if self.countries is not None:
+            return self.countries
+        return sorted(set(self.data_manager.store.countries()) | set(self.data_manager.cache))
+
+    def _refresh_due_at(self, last_updated: datetime) -> datetime:
+        return last_updated + self.data_manager.cache_duration - self.refresh_margin
+
+    def _is_due(self, country: str, now: datetime) -> bool:
+        last_updated = self.data_manager.last_updated(country)
+        return last_updated is None or now >= self._refresh_due_at(last_updated)
+
+    def due_countries(self, now: Optional[datetime] = None) -> List[str]:
+        """Countries with no data or within refresh_margin of expiring, most overdue first"""
+        now = now or datetime.now()
+        due = [
+            (self.data_manager.last_updated(country) or datetime.min, country)
+            for country in self._watched_countries()
+            if self._is_due(country, now)
+        ]
+        return [country for _, country in sorted(due)]
+
+    async def refresh(self, country: str) -> Optional[MarketData]:
+        """Refresh one country now and record refresh metrics"""
+        country = country_key(country)
+        previous = self.data_manager.cache.get(country) or self.data_manager.store.latest(country)
+        metrics = get_metrics()
+        try:
+            data = await self.data_manager.refresh_market_data(country)
+        except Exception as e:
+            self._stats["failures"] += 1
+            metrics.inc("market_refreshes_total", result="failed")
+            logger.error(f"Background refresh of {country} failed: {str(e)}")
+            return None
+        if data is None:
+            self._stats["failures"] += 1
+            metrics.inc("market_refreshes_total", result="failed")
+            return None
+
+        self._stats["refreshes"] += 1
+        unchanged = previous is not None and replace(data, last_updated=previous.last_updated) == previous
+        if unchanged:
+            self._stats["unchanged"] += 1
+        metrics.inc("market_refreshes_total", result="unchanged" if unchanged else "changed")
+        if previous is not None:
+            # How far past its planned refresh time the country was when it completed
+            due_at = self._refresh_due_at(previous.last_updated)
+            self._lag[country] = max(0.0, (datetime.now() - due_at).total_seconds())
+            metrics.observe("market_refresh_lag_seconds", self._lag[country])
+        return data
+
+    async def tick(self):
+        """Queue due countries and refresh them in batches"""
+        self._stats["ticks"] += 1
+        get_metrics().inc("market_refresh_ticks_total")
+        for country in self.due_countries():
+            if country not in self._queue and not self.data_manager.flights.in_flight(country):
+                self._queue.append(country)
+        while self._queue:
+            batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            # Skip countries that another caller refreshed while they waited in the queue
+            now = datetime.now()
+            batch = [country for country in batch if self._is_due(country, now)]
+            await asyncio.gather(*[self.refresh(country) for country in batch])
+
+    async def run_forever(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Refresh scheduler tick failed: {str(e)}")
+            await asyncio.sleep(max(0.0, self.check_interval - (time.monotonic() - started)))
+
+    def start(self) -> asyncio.Task:
+        """Start the loop as a task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run_forever())
+        return self._task
+
+    def start_in_thread(self) -> threading.Thread:
+        """Run the scheduler on its own event loop in a daemon thread"""
+        thread = threading.Thread(target=lambda: asyncio.run(self.run_forever()),
+                                  name="market-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def metrics(self) -> Dict:
+        """Queue depth, in-flight refreshes, counters and refresh lag in seconds"""
+        metrics = dict(self._stats)
+        metrics["queue_depth"] = len(self._queue)
+        metrics["in_flight"] = len(self.data_manager.flights)
+        metrics["refresh_lag_seconds"] = dict(self._lag)
+        metrics["max_refresh_lag_seconds"] = max(self._lag.values(), default=0.0)
+        return metrics
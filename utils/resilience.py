@@ -0,0 +1,362 @@
+"""Retry, hedging, circuit-breaker and fallback handling for model calls."""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import AWS_CONFIG, RESILIENCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Bedrock error codes worth retrying; anything else (validation, access denied) fails fast
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+    "ModelTimeoutException",
+    "RequestTimeout",
+}
+
+# botocore transport errors, matched by name to avoid importing botocore internals
+RETRYABLE_EXCEPTION_NAMES = {
+    "ReadTimeoutError",
+    "ConnectTimeoutError",
+    "EndpointConnectionError",
+    "ConnectionClosedError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every candidate model's circuit breaker is open"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for throttling/availability errors and connection-level failures"""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    name = type(error).__name__
+    return name in RETRYABLE_ERROR_CODES or name in RETRYABLE_EXCEPTION_NAMES
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after ``reset_timeout``"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "half_open":
+                # Re-arm the timer so only one probe is let through per reset window
+                self.opened_at = time.monotonic()
+                return True
+            return state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of call latencies used to derive the hedging delay"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < 20:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class HedgeBudget:
+    """Token bucket limiting hedged duplicates to a fraction of calls.
+
+    Every call earns ``ratio`` of a token (up to ``burst``); a hedge spends one.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def _discard(result: Any):
+    """Release a losing attempt's response (an open converse stream holds a pooled connection)"""
+    stream = result.get("stream") if isinstance(result, dict) else None
+    if stream is not None and hasattr(stream, "close"):
+        try:
+            stream.close()
+        except Exception as e:
+            logger.debug(f"Error closing discarded stream: {str(e)}")
+
+
+class _Hedge:
+    """A duplicate attempt that starts after a delay unless the primary finishes first"""
+
+    def __init__(self):
+        self.settled = threading.Event()  # set once the primary has finished
+        self.done = threading.Event()
+        self.started = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self._abandoned = False
+        self._lock = threading.Lock()
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self.result, self.error = result, error
+            self.done.set()
+            if self._abandoned and error is None:
+                _discard(result)
+
+    def abandon(self):
+        """The primary won: release the duplicate's response whenever it arrives"""
+        with self._lock:
+            self._abandoned = True
+            if self.done.is_set() and self.error is None:
+                _discard(self.result)
+        self.settled.set()
+
+
+class ResilientCaller:
+    """Wraps a model call with retries, hedging, per-model breakers and fallback models.
+
+    ``call(model_id, fn)`` invokes ``fn(model_id)``; on repeated retryable failures
+    or an open breaker it moves on to the configured fallback model IDs, within
+    an overall ``deadline``.
+
+    Hedging: the primary attempt runs on the caller's thread. When it is still
+    running after the p-th percentile latency for that model and operation, a
+    duplicate starts on the hedge pool, if a worker is free and the hedge budget
+    allows it. A primary that fails while the duplicate is running hands over to
+    the duplicate's result instead of backing off and retrying. The duplicate
+    is abandoned (and its response released) when the primary succeeds.
+    Pass ``hedge=False`` for calls that must not be duplicated, such as streams.
+
+    The deadline is only checked between attempts unless ``fn`` can bound an
+    attempt itself: with ``attempt_timeout=True`` it is called as
+    ``fn(model_id, timeout=...)`` with the seconds left before the deadline.
+    """
+
+    def __init__(self,
+                 max_attempts: int = RESILIENCE_CONFIG["max_attempts"],
+                 base_delay: float = RESILIENCE_CONFIG["base_delay"],
+                 max_delay: float = RESILIENCE_CONFIG["max_delay"],
+                 hedge: bool = RESILIENCE_CONFIG["hedge"],
+                 hedge_percentile: float = RESILIENCE_CONFIG["hedge_percentile"],
+                 hedge_budget: float = RESILIENCE_CONFIG["hedge_budget"],
+                 hedge_workers: int = RESILIENCE_CONFIG["hedge_workers"],
+                 deadline: Optional[float] = RESILIENCE_CONFIG["deadline"],
+                 failure_threshold: int = RESILIENCE_CONFIG["failure_threshold"],
+                 reset_timeout: float = RESILIENCE_CONFIG["reset_timeout"],
+                 fallback_model_ids: Optional[List[str]] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.fallback_model_ids = (fallback_model_ids if fallback_model_ids is not None
+                                   else AWS_CONFIG.get("fallback_model_ids", []))
+        self.sleep = sleep
+        self.budget = HedgeBudget(hedge_budget, burst=max(1.0, hedge_workers))
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[Tuple[str, str], LatencyTracker] = {}
+        self._lock = threading.Lock()
+        # Hedges only start when a worker is free, so they never queue behind each other
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="hedge")
+
+    def breaker(self, model_id: str) -> CircuitBreaker:
+        with self._lock:
+            if model_id not in self._breakers:
+                self._breakers[model_id] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[model_id]
+
+    def latency(self, model_id: str, operation: str) -> LatencyTracker:
+        """Latency window per model and operation (a stream's time-to-open isn't a full call)"""
+        with self._lock:
+            key = (model_id, operation)
+            if key not in self._latency:
+                self._latency[key] = LatencyTracker()
+            return self._latency[key]
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _timed(self, fn: Callable[[str], Any], model_id: str, tracker: LatencyTracker) -> Any:
+        start = time.perf_counter()
+        result = fn(model_id)
+        tracker.record(time.perf_counter() - start)
+        return result
+
+    def _schedule_hedge(self, fn: Callable[[str], Any], model_id: str, tracker: LatencyTracker,
+                        delay: float) -> Optional[_Hedge]:
+        if not self._hedge_slots.acquire(blocking=False):
+            return None
+        hedge = _Hedge()
+
+        def run():
+            try:
+                # Cancelled for free if the primary settles within the delay
+                if hedge.settled.wait(delay) or not self.budget.spend():
+                    hedge.finish()
+                    return
+                hedge.started = True
+                with self._lock:
+                    self.stats["hedges"] += 1
+                logger.info(f"Hedging {model_id} call after {delay:.2f}s")
+                try:
+                    hedge.finish(self._timed(fn, model_id, tracker))
+                except BaseException as e:
+                    hedge.finish(error=e)
+            finally:
+                self._hedge_slots.release()
+
+        self._hedge_pool.submit(run)
+        return hedge
+
+    def _attempt(self, fn: Callable[[str], Any], model_id: str, operation: str, hedge: bool) -> Any:
+        """One logical attempt on the caller's thread, backed by a delayed duplicate if hedging"""
+        tracker = self.latency(model_id, operation)
+        self.budget.earn()
+        hedge_after = tracker.percentile(self.hedge_percentile) if self.hedge and hedge else None
+        duplicate = (self._schedule_hedge(fn, model_id, tracker, hedge_after)
+                     if hedge_after is not None else None)
+        try:
+            result = self._timed(fn, model_id, tracker)
+        except Exception:
+            if duplicate is None:
+                raise
+            duplicate.settled.set()
+            duplicate.done.wait()
+            if not duplicate.started or duplicate.error is not None:
+                raise
+            with self._lock:
+                self.stats["hedge_wins"] += 1
+            return duplicate.result
+        if duplicate is not None:
+            duplicate.abandon()
+        return result
+
+    def call(self, model_id: str, fn: Callable[..., Any], operation: str = "call",
+             hedge: bool = True, deadline: Optional[float] = None,
+             attempt_timeout: bool = False) -> Any:
+        """Call ``fn(model_id)`` with retries, falling back to cheaper models when needed.
+
+        ``operation`` names the latency window used for hedging; ``deadline``
+        (seconds, default from RESILIENCE_CONFIG) bounds the whole call including
+        retries and backoff. Raises TimeoutError once it has passed. With
+        ``attempt_timeout`` each attempt also gets the time left as ``timeout=``.
+        """
+        deadline = deadline if deadline is not None else self.deadline
+        expires = time.monotonic() + deadline if deadline else None
+        if attempt_timeout:
+            def run(candidate: str) -> Any:
+                # Evaluated when the attempt (or its hedge) starts, not when the call began
+                remaining = max(0.0, expires - time.monotonic()) if expires is not None else None
+                return fn(candidate, timeout=remaining)
+        else:
+            run = fn
+        with self._lock:
+            self.stats["calls"] += 1
+        last_error: Optional[Exception] = None
+        for candidate in [model_id] + [m for m in self.fallback_model_ids if m != model_id]:
+            breaker = self.breaker(candidate)
+            if not breaker.allow():
+                logger.warning(f"Circuit open for {candidate}, skipping")
+                continue
+
+            for attempt in range(self.max_attempts):
+                if expires is not None and time.monotonic() >= expires:
+                    raise TimeoutError(f"Deadline of {deadline}s exceeded calling {model_id}") from last_error
+                try:
+                    result = self._attempt(run, candidate, operation, hedge)
+                    breaker.record_success()
+                    if candidate != model_id:
+                        logger.warning(f"Served by fallback model {candidate}")
+                    return result
+                except Exception as e:
+                    last_error = e
+                    if not is_retryable(e):
+                        raise
+                    breaker.record_failure()
+                    if breaker.state != "closed" or attempt == self.max_attempts - 1:
+                        break
+                    delay = self._backoff(attempt)
+                    if expires is not None:
+                        delay = min(delay, max(0.0, expires - time.monotonic()))
+                    logger.warning(f"Retryable error from {candidate} ({e}); retrying in {delay:.2f}s")
+                    self.sleep(delay)
+
+        if last_error is not None:
+            raise last_error
+        raise CircuitOpenError(f"All circuits open for {model_id} and its fallbacks")
+
+
+_caller: Optional[ResilientCaller] = None
+_caller_lock = threading.Lock()
+
+
+def get_resilient_caller() -> ResilientCaller:
+    """Process-wide caller so breaker state and latency history are shared"""
+    global _caller
+    if _caller is None:
+        with _caller_lock:
+            if _caller is None:
+                _caller = ResilientCaller()
+    return _caller
@@ -0,0 +1,289 @@
+"""Two-layer cache for AI advice keyed on the question and its marketing context."""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", prompt.lower()).split())
+
+
+def normalize_context(context: Optional[Dict]) -> str:
+    """Stable JSON for a context dict; list order (e.g. target markets) is ignored"""
+    if not context:
+        return ""
+    normalized = {
+        str(k).lower(): sorted(map(str, v)) if isinstance(v, (list, tuple, set)) else v
+        for k, v in context.items()
+    }
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+# Function words that don't change what is being asked. Negations ("not", "no",
+# "without", ...) are deliberately absent: they flip the meaning of a question.
+_STOPWORDS = frozenset(
+    "a an the i we you my our your me us it its is are am be do does did can could should "
+    "would will shall may might to of in on at for with about by from and or if so that this "
+    "these those what which how please tell give some any".split()
+)
+
+
+# Request phrasing that doesn't change the topic ("best ways to ..." vs "how do I ...")
+_GENERIC_TERMS = frozenset(
+    "best good great effective effectively way ways strategy strategies tip tips advice idea ideas "
+    "help really exactly just also now right need want know like get make use using go going".split()
+)
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping so "promote", "promoting" and "promotes" compare equal"""
+    for suffix in ("ing", "ed", "es", "s", "ly"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def content_terms(normalized_prompt: str) -> Tuple[str, ...]:
+    """Stemmed topic words of a normalized prompt, in order, without stopwords or generic phrasing"""
+    return tuple(_stem(word) for word in normalized_prompt.split()
+                 if word not in _STOPWORDS and word not in _GENERIC_TERMS)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word unigrams and bigrams"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = _lcg(seed)
+        self.params = [(next(rng) % (_MERSENNE_PRIME - 1) + 1, next(rng) % _MERSENNE_PRIME)
+                       for _ in range(num_perm)]
+
+    def signature(self, normalized_prompt: str) -> Tuple[int, ...]:
+        words = normalized_prompt.split()
+        shingles = set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+        if not shingles:
+            return tuple()
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big")
+                  for s in shingles]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self.params
+        )
+
+    @staticmethod
+    def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        if not sig_a or len(sig_a) != len(sig_b):
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def _lcg(seed: int):
+    state = seed
+    while True:
+        state = (6364136223846793005 * state + 1442695040888963407) % (1 << 64)
+        yield state
+
+
+@dataclass
+class CacheEntry:
+    response: str
+    context_key: str
+    prompt_norm: str
+    created_at: float
+    signature: Tuple[int, ...] = tuple()
+    last_access: float = 0.0
+
+
+class ResponseCache:
+    """Exact-match + near-duplicate response cache with TTL, LRU and SQLite persistence.
+
+    The exact layer is keyed on the normalized prompt and context. The optional
+    near-duplicate layer (off unless ``similarity_threshold`` is set; 0.9 or
+    higher is recommended) only considers prompts with the same context and the
+    same set of stemmed topic words, ignoring stopwords, inflections and
+    generic phrasing, so rephrasings match but "TikTok ads" never answers
+    "radio ads" or a negated question. MinHash signatures over the topic words
+    and their bigrams then reject prompts that use the same words in a
+    different order. Advice for one genre/market/budget is never served for
+    another. Hits update the persisted ``last_access`` at most once per
+    ``touch_interval`` per entry.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1000,
+                 ttl_seconds: float = 12 * 3600,
+                 similarity_threshold: Optional[float] = None,
+                 path: Optional[str] = "data/response_cache.sqlite",
+                 num_perm: int = 64,
+                 touch_interval: float = 300):
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hasher = MinHasher(num_perm) if similarity_threshold else None
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._by_context: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0,
+                       "evictions": 0, "expirations": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open_db(path)
+
+    def _open_db(self, path: str):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, context_key TEXT, prompt_norm TEXT, "
+            "response TEXT, created_at REAL, last_access REAL)"
+        )
+        self._db.execute("DELETE FROM responses WHERE created_at < ?",
+                         (time.time() - self.ttl_seconds,))
+        rows = self._db.execute(
+            "SELECT key, context_key, prompt_norm, response, created_at, last_access FROM responses "
+            "ORDER BY last_access DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        # Oldest first so the most recently used entries end up at the MRU end
+        for key, context_key, prompt_norm, response, created_at, last_access in reversed(rows):
+            self._insert(key, CacheEntry(response, context_key, prompt_norm, created_at,
+                                         self._signature(prompt_norm), last_access or created_at))
+        self._db.commit()
+        logger.info(f"Loaded {len(rows)} cached responses from {path}")
+
+    def _signature(self, prompt_norm: str) -> Tuple[int, ...]:
+        return self.hasher.signature(" ".join(content_terms(prompt_norm))) if self.hasher else tuple()
+
+    def _insert(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._by_context.setdefault(entry.context_key, set()).add(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_context.get(entry.context_key)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry.context_key]
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _keys(self, prompt: str, context: Optional[Dict]) -> Tuple[str, str, str]:
+        prompt_norm = normalize_prompt(prompt)
+        context_key = _digest(normalize_context(context))
+        return _digest(f"{prompt_norm}\x00{context_key}"), context_key, prompt_norm
+
+    def get(self, prompt: str, context: Optional[Dict] = None) -> Optional[str]:
+        """Return a cached response for the prompt/context, or None"""
+        key, context_key, prompt_norm = self._keys(prompt, context)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self._stats["exact_hits"] += 1
+                self._touch(key, now)
+                return entry.response
+
+            if self.hasher:
+                match = self._find_similar(context_key, prompt_norm, now)
+                if match is not None:
+                    self._stats["similar_hits"] += 1
+                    self._touch(match, now)
+                    return self._entries[match].response
+
+            self._stats["misses"] += 1
+            return None
+
+    def _find_similar(self, context_key: str, prompt_norm: str, now: float) -> Optional[str]:
+        signature = self._signature(prompt_norm)
+        terms = set(content_terms(prompt_norm))
+        best_key, best_score = None, self.similarity_threshold
+        for key in list(self._by_context.get(context_key, ())):
+            entry = self._entries[key]
+            if self._is_expired(entry, now):
+                self._remove(key)
+                self._stats["expirations"] += 1
+                continue
+            if set(content_terms(entry.prompt_norm)) != terms:
+                continue
+            score = MinHasher.similarity(signature, entry.signature)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _touch(self, key: str, now: float):
+        self._entries.move_to_end(key)
+        entry = self._entries[key]
+        # last_access only orders entries reloaded at startup, so it may lag by touch_interval
+        if self._db is not None and now - entry.last_access >= self.touch_interval:
+            entry.last_access = now
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+
+    def put(self, prompt: str, context: Optional[Dict], response: str):
+        """Store a response, evicting least recently used entries beyond max_entries"""
+        key, context_key, prompt_norm = self._keys(prompt, context)
+        now = time.time()
+        entry = CacheEntry(response, context_key, prompt_norm, now, self._signature(prompt_norm), now)
+        with self._lock:
+            self._remove(key)
+            self._insert(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, context_key, prompt_norm, response, now, now)
+                )
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+            if self._db is not None:
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters plus the current size and hit ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["similar_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["exact_hits"] + stats["similar_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,388 @@
+"""Persistent passage index over uploaded documents and market data snapshots.
+
+Passages and BM25 postings are stored in SQLite and mirrored in memory, so a
+query is a few dictionary lookups; the mirror is reloaded when another process
+commits to the index. Uploaded documents belong to an owner (a chat session)
+and are only searched for that owner; market data is shared by everyone. BM25
+statistics (passage count, average length, document frequency) only cover
+the passages the querying owner can see. With an embedding function
+configured, normalized passage vectors are appended to a float32 file read
+through a NumPy memmap, and BM25 and vector rankings are fused with reciprocal
+rank fusion.
+
+Nothing is indexed unless a caller adds it: app.py indexes PDFs uploaded in
+the sidebar for the uploading session, and market data snapshots are indexed
+only by a DataManager constructed with ``retrieval_index``.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import RETRIEVAL_CONFIG
+from .context_builder import count_tokens, split_passages, tokenize
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[List[str]], np.ndarray]
+
+_RRF_K = 60
+
+# Owner of passages every search may return, such as market data snapshots
+SHARED = ""
+# Uploads indexed before documents had owners; no session can see them
+_LEGACY_OWNER = "legacy"
+
+
+@dataclass
+class Passage:
+    chunk_id: int
+    doc_id: str
+    page: int
+    text: str
+    tokens: int
+    owner: str = SHARED
+
+    @property
+    def source(self) -> str:
+        return f"{self.doc_id} p.{self.page}" if self.page else self.doc_id
+
+
+def sentence_transformer_embedder(model_name: str) -> Embedder:
+    """CPU embedding function backed by sentence-transformers (optional dependency)"""
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device="cpu")
+    return lambda texts: model.encode(texts, batch_size=32, convert_to_numpy=True)
+
+
+def market_data_text(country: str, data) -> str:
+    """Readable summary of a MarketData snapshot for indexing"""
+    genres = ", ".join(f"{genre} {share:.0%}" if share <= 1 else f"{genre} {share:g}"
+                       for genre, share in sorted(data.genre_popularity.items(), key=lambda item: -item[1]))
+    platforms = ", ".join(
+        f"{platform.name} ({platform.market_share:g} share{', local' if platform.local else ''})"
+        for platform in data.platforms
+    )
+    return (
+        f"{country} music market data as of {data.last_updated:%Y-%m-%d}. "
+        f"Population {data.population:,}. GDP per capita ${data.gdp_per_capita:,.0f}. "
+        f"Internet penetration {data.internet_penetration:.0%}. "
+        f"Smartphone users {data.smartphone_users:,}. "
+        f"Streaming revenue ${data.streaming_revenue:,.0f}. "
+        f"Digital payment penetration {data.digital_payment_penetration:.0%}. "
+        f"Languages: {', '.join(data.languages) or 'unknown'}. "
+        f"Genres: {genres or 'unknown'}. "
+        f"Streaming platforms: {platforms or 'unknown'}."
+    )
+
+
+class RetrievalIndex:
+    """Incrementally updated BM25 (and optional vector) index stored under ``path``.
+
+    Documents are replaced or deleted as a whole by ``(owner, doc_id)``, so two
+    sessions uploading the same filename keep separate documents. Vector rows
+    of deleted passages stay in the file until ``compact()`` rewrites it.
+    """
+
+    def __init__(self,
+                 path: str = RETRIEVAL_CONFIG["path"],
+                 embedder: Optional[Embedder] = None,
+                 chunk_tokens: int = RETRIEVAL_CONFIG["chunk_tokens"],
+                 overlap_tokens: int = RETRIEVAL_CONFIG["chunk_overlap_tokens"],
+                 k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.embedder = embedder
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.k1, self.b = k1, b
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS passages ("
+            "chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, doc_id TEXT NOT NULL, page INTEGER, "
+            "text TEXT NOT NULL, tokens INTEGER, length INTEGER, vector_row INTEGER);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, chunk_id INTEGER NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, chunk_id)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(passages)")]
+        if "owner" not in columns:
+            self._db.execute(f"ALTER TABLE passages ADD COLUMN owner TEXT NOT NULL DEFAULT '{SHARED}'")
+            self._db.execute("UPDATE passages SET owner = ? WHERE doc_id NOT LIKE 'market:%'", (_LEGACY_OWNER,))
+        self._db.execute("DROP INDEX IF EXISTS idx_passages_doc")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_passages_owner_doc ON passages (owner, doc_id)")
+        self._db.commit()
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._load()
+
+    def _load(self):
+        """Mirror passages and postings in memory for fast queries"""
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        self._passages: Dict[int, Passage] = {}
+        self._lengths: Dict[int, int] = {}
+        self._vector_rows: Dict[int, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for chunk_id, doc_id, page, text, tokens, length, vector_row, owner in self._db.execute(
+                "SELECT chunk_id, doc_id, page, text, tokens, length, vector_row, owner FROM passages"):
+            self._passages[chunk_id] = Passage(chunk_id, doc_id, page or 0, text, tokens, owner)
+            self._lengths[chunk_id] = length
+            if vector_row is not None:
+                self._vector_rows[chunk_id] = vector_row
+        for term, chunk_id, tf in self._db.execute("SELECT term, chunk_id, tf FROM postings"):
+            self._postings[term][chunk_id] = tf
+        # Per-owner passage counts and lengths, so BM25 only sees what the querying owner can
+        self._owner_passages: Counter = Counter(passage.owner for passage in self._passages.values())
+        self._owner_lengths: Counter = Counter()
+        for chunk_id, length in self._lengths.items():
+            self._owner_lengths[self._passages[chunk_id].owner] += length
+
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self._dim = int(row[0]) if row else None
+        self._remap_vectors()
+
+    def _sync(self):
+        """Reload the mirror if another connection committed since it was built"""
+        if self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._load()
+
+    @contextmanager
+    def _write(self):
+        """Write transaction against an up-to-date mirror"""
+        with self._lock:
+            # Serializes writers across processes, including their appends to the vector file
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                yield
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                self._load()
+                raise
+            self._remap_vectors()
+
+    def _remap_vectors(self):
+        self._vectors = None
+        if self._dim and os.path.exists(self._vectors_path):
+            rows = os.path.getsize(self._vectors_path) // (4 * self._dim)
+            if rows:
+                self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                          shape=(rows, self._dim))
+        # Row ids and chunk ids of live vectors, aligned for one matrix product per query
+        self._live_chunks = np.fromiter(self._vector_rows.keys(), dtype=np.int64)
+        self._live_rows = np.fromiter(self._vector_rows.values(), dtype=np.int64)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embedder(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add_document(self, doc_id: str, text: str, owner: str = SHARED):
+        """Index (or re-index) a document given as plain text"""
+        self.add_pages(doc_id, [(0, text)], owner)
+
+    def add_pages(self, doc_id: str, pages: Iterable[Tuple[int, str]], owner: str = SHARED):
+        """Index (or re-index) an owner's document from (page number, text) pairs"""
+        passages = [(page, passage) for page, text in pages
+                    for passage in split_passages(text or "", self.chunk_tokens, self.overlap_tokens)]
+        vectors = self._embed([passage for _, passage in passages]) if self.embedder and passages else None
+
+        with self._write():
+            self._delete(doc_id, owner)
+            first_row = None
+            if vectors is not None:
+                if self._dim is None:
+                    self._dim = vectors.shape[1]
+                    self._db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(self._dim),))
+                first_row = os.path.getsize(self._vectors_path) // (4 * self._dim) \
+                    if os.path.exists(self._vectors_path) else 0
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+
+            posting_rows = []
+            for position, (page, passage) in enumerate(passages):
+                terms = Counter(tokenize(passage))
+                length = sum(terms.values())
+                vector_row = first_row + position if first_row is not None else None
+                tokens = count_tokens(passage)
+                chunk_id = self._db.execute(
+                    "INSERT INTO passages (doc_id, page, text, tokens, length, vector_row, owner) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_id, page, passage, tokens, length, vector_row, owner)
+                ).lastrowid
+                posting_rows.extend((term, chunk_id, tf) for term, tf in terms.items())
+                self._passages[chunk_id] = Passage(chunk_id, doc_id, page, passage, tokens, owner)
+                self._lengths[chunk_id] = length
+                self._owner_passages[owner] += 1
+                self._owner_lengths[owner] += length
+                for term, tf in terms.items():
+                    self._postings[term][chunk_id] = tf
+                if vector_row is not None:
+                    self._vector_rows[chunk_id] = vector_row
+            self._db.executemany("INSERT INTO postings VALUES (?, ?, ?)", posting_rows)
+
+    def add_extraction(self, doc_id: str, extracted: Dict, owner: str = SHARED):
+        """Index DocumentAnalyzer output page by page"""
+        self.add_pages(doc_id, [(page["page"], page["content"])
+                                for page in extracted.get("text_content", [])], owner)
+
+    def add_market_data(self, country: str, data):
+        """Index the latest MarketData snapshot for a country, replacing the previous one"""
+        self.add_document(f"market:{country.strip().lower()}", market_data_text(country, data))
+
+    def _delete(self, doc_id: str, owner: str):
+        chunk_ids = [chunk_id for (chunk_id,) in self._db.execute(
+            "SELECT chunk_id FROM passages WHERE owner = ? AND doc_id = ?", (owner, doc_id))]
+        if not chunk_ids:
+            return
+        for chunk_id in chunk_ids:
+            passage = self._passages.pop(chunk_id)
+            for term in set(tokenize(passage.text)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._owner_passages[owner] -= 1
+            self._owner_lengths[owner] -= self._lengths.pop(chunk_id)
+            self._vector_rows.pop(chunk_id, None)
+        self._db.executemany("DELETE FROM postings WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+        self._db.execute("DELETE FROM passages WHERE owner = ? AND doc_id = ?", (owner, doc_id))
+
+    def delete(self, doc_id: str, owner: str = SHARED):
+        with self._write():
+            self._delete(doc_id, owner)
+
+    remove_document = delete
+
+    def documents(self, owner: str = SHARED) -> List[str]:
+        """Document ids visible to ``owner``: its own uploads plus shared documents"""
+        with self._lock:
+            self._sync()
+            return sorted({passage.doc_id for passage in self._passages.values()
+                           if passage.owner in (SHARED, owner)})
+
+    def scoped(self, owner: str) -> "OwnedIndex":
+        """View that adds and searches documents as ``owner``"""
+        return OwnedIndex(self, owner)
+
+    def _bm25(self, terms: Sequence[str], owners: Tuple[str, ...]) -> Dict[int, float]:
+        """Scores of ``owners``' passages, with statistics computed over those passages only"""
+        count = sum(self._owner_passages[owner] for owner in owners)
+        if not count:
+            return {}
+        average_length = sum(self._owner_lengths[owner] for owner in owners) / count
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            postings = {chunk_id: tf for chunk_id, tf in self._postings.get(term, {}).items()
+                        if self._passages[chunk_id].owner in owners}
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _vector_ranking(self, query: str, limit: int, owners: Tuple[str, ...]) -> List[int]:
+        if self._vectors is None or not len(self._live_rows):
+            return []
+        scores = self._vectors[self._live_rows] @ self._embed([query])[0]
+        ranking = []
+        for chunk_id in self._live_chunks[np.argsort(-scores)].tolist():
+            if self._passages[chunk_id].owner in owners:
+                ranking.append(chunk_id)
+                if len(ranking) == limit:
+                    break
+        return ranking
+
+    def search(self, query: str, k: int = RETRIEVAL_CONFIG["top_k"],
+               owner: Optional[str] = None) -> List[Tuple[float, Passage]]:
+        """Top-k (score, Passage) pairs, best first, from shared documents and ``owner``'s uploads"""
+        owners = (SHARED, owner) if owner else (SHARED,)
+        with self._lock:
+            self._sync()
+            if not self._passages:
+                return []
+            bm25 = self._bm25(tokenize(query), owners)
+            if self.embedder is None:
+                ranked = sorted(bm25.items(), key=lambda item: item[1], reverse=True)[:k]
+                return [(score, self._passages[chunk_id]) for chunk_id, score in ranked]
+
+            # Reciprocal rank fusion of the lexical and vector rankings
+            candidates = max(k * 4, 20)
+            lexical = sorted(bm25, key=bm25.get, reverse=True)[:candidates]
+            fused: Dict[int, float] = defaultdict(float)
+            for ranking in (lexical, self._vector_ranking(query, candidates, owners)):
+                for rank, chunk_id in enumerate(ranking):
+                    fused[chunk_id] += 1 / (_RRF_K + rank + 1)
+            ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(score, self._passages[chunk_id]) for chunk_id, score in ranked]
+
+    def compact(self):
+        """Rewrite the vector file without rows of deleted passages"""
+        with self._write():
+            if self._vectors is None:
+                return
+            chunk_ids = list(self._vector_rows)
+            live = np.array(self._vectors[[self._vector_rows[c] for c in chunk_ids]]) \
+                if chunk_ids else np.zeros((0, self._dim), dtype=np.float32)
+            self._vectors = None
+            tmp_path = f"{self._vectors_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(live.astype(np.float32).tobytes())
+            os.replace(tmp_path, self._vectors_path)
+            self._vector_rows = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+            self._db.executemany("UPDATE passages SET vector_row = ? WHERE chunk_id = ?",
+                                 [(row, chunk_id) for chunk_id, row in self._vector_rows.items()])
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+
+class OwnedIndex:
+    """One owner's view of a RetrievalIndex, with the ChunkIndex add/search interface"""
+
+    def __init__(self, index: RetrievalIndex, owner: str):
+        self.index = index
+        self.owner = owner
+
+    def add_document(self, doc_id: str, text: str):
+        self.index.add_document(doc_id, text, self.owner)
+
+    def remove_document(self, doc_id: str):
+        self.index.delete(doc_id, self.owner)
+
+    def search(self, query: str, k: int = RETRIEVAL_CONFIG["top_k"]) -> List[Tuple[float, Passage]]:
+        return self.index.search(query, k, self.owner)
+
+
+_index: Optional[RetrievalIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_retrieval_index() -> RetrievalIndex:
+    """Process-wide index, with embeddings if RETRIEVAL_CONFIG names a model"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                embedder = None
+                if RETRIEVAL_CONFIG["embedding_model"]:
+                    try:
+                        embedder = sentence_transformer_embedder(RETRIEVAL_CONFIG["embedding_model"])
+                    except ImportError:
+                        logger.warning("sentence-transformers not installed; using BM25 only")
+                _index = RetrievalIndex(embedder=embedder)
+    return _index
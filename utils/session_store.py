@@ -0,0 +1,239 @@
+"""Server-side conversation history keyed by session id, in memory or in SQLite."""
+
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import SESSION_CONFIG
+from .context_builder import ConversationMemory
+from .memory_cache import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(abc.ABC):
+    """Compacted prompt history plus a display transcript per session.
+
+    The prompt history is a serialized ConversationMemory: recent turns verbatim
+    up to ``history_tokens`` and a rolling summary of older ones up to
+    ``summary_tokens``, so what is sent to the model stays bounded however long
+    the conversation runs. The transcript is kept separately, verbatim, for
+    redisplaying the chat; it holds the newest ``max_transcript_turns`` turns.
+    Turns are stored as complete user/assistant exchanges. Subclasses provide
+    ``_read``, ``_update``, ``_transcript``, ``delete`` and ``purge_expired``;
+    a backend missing any of them can't be instantiated.
+    """
+
+    def __init__(self,
+                 history_tokens: int = SESSION_CONFIG["history_tokens"],
+                 summary_tokens: int = SESSION_CONFIG["summary_tokens"],
+                 max_turn_chars: int = SESSION_CONFIG["max_turn_chars"],
+                 max_transcript_turns: int = SESSION_CONFIG["max_transcript_turns"],
+                 ttl_seconds: float = SESSION_CONFIG["ttl_seconds"]):
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turn_chars = max_turn_chars
+        self.max_transcript_turns = max_transcript_turns
+        self.ttl_seconds = ttl_seconds
+
+    def _memory(self, state: Optional[Dict]) -> ConversationMemory:
+        return ConversationMemory.from_dict(state or {}, history_tokens=self.history_tokens,
+                                            summary_tokens=self.summary_tokens)
+
+    @abc.abstractmethod
+    def _read(self, session_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _update(self, session_id: str, change: Callable[[Optional[Dict]], Dict],
+                turns: List[Tuple[str, str]]) -> Dict:
+        """Atomically set the history to ``change(current)`` and append ``turns`` to the transcript"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _transcript(self, session_id: str) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        raise NotImplementedError
+
+    def load(self, session_id: str) -> ConversationMemory:
+        return self._memory(self._read(session_id))
+
+    def append_exchange(self, session_id: str, prompt: str, reply: str) -> ConversationMemory:
+        """Record one question and its answer, compacting older turns as needed"""
+        turns = [("user", prompt[:self.max_turn_chars]), ("assistant", reply[:self.max_turn_chars])]
+
+        def change(state: Optional[Dict]) -> Dict:
+            memory = self._memory(state)
+            for role, content in turns:
+                memory.add(role, content)
+            return memory.to_dict()
+        return self._memory(self._update(session_id, change, turns))
+
+    def messages(self, session_id: str) -> List[Dict[str, str]]:
+        """The full transcript as {"role", "content"} dicts, for redisplaying a chat"""
+        return self._transcript(session_id)
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions in this process only, LRU-bounded to ``max_sessions``"""
+
+    def __init__(self, max_sessions: int = SESSION_CONFIG["max_sessions"], **kwargs):
+        super().__init__(**kwargs)
+        # session_id -> {"history": ConversationMemory state, "transcript": [turn dicts]}
+        self._sessions = BoundedCache(max_entries=max_sessions, ttl_seconds=self.ttl_seconds)
+        self._lock = threading.Lock()
+
+    def _read(self, session_id: str) -> Optional[Dict]:
+        session = self._sessions.get(session_id)
+        return session["history"] if session else None
+
+    def _update(self, session_id: str, change: Callable[[Optional[Dict]], Dict],
+                turns: List[Tuple[str, str]]) -> Dict:
+        with self._lock:
+            session = self._sessions.get(session_id) or {"history": None, "transcript": []}
+            transcript = session["transcript"] + [{"role": role, "content": content} for role, content in turns]
+            session = {"history": change(session["history"]),
+                       "transcript": transcript[-self.max_transcript_turns:]}
+            self._sessions.put(session_id, session)
+        return session["history"]
+
+    def _transcript(self, session_id: str) -> List[Dict[str, str]]:
+        session = self._sessions.get(session_id)
+        return list(session["transcript"]) if session else []
+
+    def delete(self, session_id: str):
+        self._sessions.pop(session_id)
+
+    def purge_expired(self) -> int:
+        return self._sessions.purge_expired()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a WAL-mode SQLite file shared by every worker process on the host.
+
+    Appends run in ``BEGIN IMMEDIATE`` transactions, so two processes writing to
+    the same session serialize instead of overwriting each other's turns.
+    Sessions idle for longer than ``ttl_seconds`` are removed on open and by
+    ``purge_expired``.
+    """
+
+    def __init__(self, path: str = SESSION_CONFIG["path"], **kwargs):
+        super().__init__(**kwargs)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly in _update
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcript ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+            "PRIMARY KEY (session_id, seq))"
+        )
+        self._lock = threading.Lock()
+        purged = self.purge_expired()
+        if purged:
+            logger.info(f"Purged {purged} expired sessions from {path}")
+
+    def _read(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM sessions WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _update(self, session_id: str, change: Callable[[Optional[Dict]], Dict],
+                turns: List[Tuple[str, str]]) -> Dict:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT state, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                now = time.time()
+                expired = row is not None and now - row[1] > self.ttl_seconds
+                if expired:
+                    self._db.execute("DELETE FROM transcript WHERE session_id = ?", (session_id,))
+                state = change(json.loads(row[0]) if row and not expired else None)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(state), now)
+                )
+                last = self._db.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM transcript WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                self._db.executemany(
+                    "INSERT INTO transcript (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                    [(session_id, last + i, role, content) for i, (role, content) in enumerate(turns, 1)]
+                )
+                self._db.execute("DELETE FROM transcript WHERE session_id = ? AND seq <= ?",
+                                 (session_id, last + len(turns) - self.max_transcript_turns))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return state
+
+    def _transcript(self, session_id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT t.role, t.content FROM transcript t JOIN sessions s USING (session_id) "
+                "WHERE t.session_id = ? AND s.updated_at >= ? ORDER BY t.seq",
+                (session_id, time.time() - self.ttl_seconds)
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM transcript WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            purged = self._db.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self._db.execute("DELETE FROM transcript WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+            return purged
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide store for SESSION_CONFIG["backend"]"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if SESSION_CONFIG["backend"] == "memory":
+                    _store = InMemorySessionStore()
+                else:
+                    _store = SQLiteSessionStore()
+    return _store
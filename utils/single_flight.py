@@ -0,0 +1,70 @@
+"""Per-key coalescing of concurrent async work."""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Long-lived event loop on a daemon thread for work that outlives a request"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="single-flight", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its result.
+
+    Work executes on a shared background loop, so callers on different event
+    loops (e.g. separate Streamlit script threads) still coalesce, and work
+    started with ``spawn`` keeps running after the caller's loop has closed.
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop or get_background_loop()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def _start(self, key: Hashable, fn: Callable[[], Awaitable]) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            self.stats["calls"] += 1
+            future = asyncio.run_coroutine_threadsafe(fn(), self.loop)
+            self._inflight[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key: Hashable, future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        """Await the in-flight call for ``key``, starting ``fn()`` if there is none"""
+        # Shielded so one caller giving up doesn't cancel the work for everyone else
+        return await asyncio.shield(asyncio.wrap_future(self._start(key, fn)))
+
+    def spawn(self, key: Hashable, fn: Callable[[], Awaitable]) -> Future:
+        """Start ``fn()`` for ``key`` in the background unless it is already running"""
+        return self._start(key, fn)
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._inflight
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._inflight)
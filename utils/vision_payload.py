@@ -0,0 +1,139 @@
+"""Compact image payloads for vision model calls."""
+
+import base64
+import io
+import math
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+from .config import EPK_CONFIG
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+@dataclass
+class EncodedPage:
+    page: int
+    data: str  # base64
+    mime_type: str
+    width: int
+    height: int
+    encoded_bytes: int  # base64 size, as sent
+    baseline_bytes: int  # base64 size of the old PNG at render_scale
+    baseline_estimated: bool  # extrapolated from a thumbnail rather than measured
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.data}"
+
+
+class PayloadOptimizer:
+    """Renders PDF pages within a pixel budget and encodes them as JPEG/WebP.
+
+    JPEG and PNG are written straight from the ``fitz`` pixmap; WebP (which
+    MuPDF cannot write) goes through PIL using the pixmap buffer without a copy.
+    Each page also reports the size it would have had as before (PNG at
+    ``max_scale``), estimated from a thumbnail unless ``measure_baseline`` asks
+    for the exact encode.
+    """
+
+    def __init__(self,
+                 max_pixels: int = EPK_CONFIG["max_pixels"],
+                 image_format: str = EPK_CONFIG["image_format"],
+                 quality: int = EPK_CONFIG["image_quality"],
+                 max_scale: float = EPK_CONFIG["render_scale"],
+                 blank_threshold: Optional[float] = EPK_CONFIG["blank_threshold"],
+                 measure_baseline: bool = EPK_CONFIG["measure_baseline"],
+                 baseline_sample_scale: float = EPK_CONFIG["baseline_sample_scale"]):
+        if image_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.max_pixels = max_pixels
+        self.image_format = image_format
+        self.quality = quality
+        self.max_scale = max_scale
+        self.blank_threshold = blank_threshold
+        self.measure_baseline = measure_baseline
+        self.baseline_sample_scale = baseline_sample_scale
+
+    def scale_for(self, page) -> float:
+        """Largest scale up to max_scale that keeps the render within max_pixels"""
+        area = page.rect.width * page.rect.height
+        if area <= 0:
+            return self.max_scale
+        return min(self.max_scale, math.sqrt(self.max_pixels / area))
+
+    def is_blank(self, page) -> bool:
+        """Cheap histogram check on a tiny grayscale thumbnail"""
+        if not self.blank_threshold:
+            return False
+        thumb = page.get_pixmap(matrix=fitz.Matrix(0.1, 0.1), colorspace=fitz.csGRAY, alpha=False)
+        samples = thumb.samples
+        if not samples:
+            return True
+        histogram = Counter(samples)
+        dominant = histogram.most_common(1)[0][0]
+        # Treat values within a few levels of the dominant shade as background
+        background = sum(count for value, count in histogram.items() if abs(value - dominant) <= 8)
+        return background / len(samples) >= self.blank_threshold
+
+    def baseline_bytes(self, page) -> int:
+        """Base64 size of the page as it used to be sent: a PIL PNG rendered at max_scale.
+
+        Without ``measure_baseline`` the PNG size of a ``baseline_sample_scale``
+        thumbnail is scaled up by pixel count, at a small fraction of the old cost.
+        """
+        if self.measure_baseline:
+            from PIL import Image
+            pix = page.get_pixmap(matrix=fitz.Matrix(self.max_scale, self.max_scale), alpha=False)
+            try:
+                buffered = io.BytesIO()
+                image = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+                image.save(buffered, format="PNG")
+            finally:
+                pix = None
+            size = buffered.tell()
+        else:
+            sample = min(self.baseline_sample_scale, self.max_scale)
+            pix = page.get_pixmap(matrix=fitz.Matrix(sample, sample), alpha=False)
+            try:
+                size = len(pix.tobytes("png")) * (self.max_scale / sample) ** 2
+            finally:
+                pix = None
+        return 4 * math.ceil(size / 3)
+
+    def encode_page(self, page) -> Optional[EncodedPage]:
+        """Render and encode one page; returns None for near-blank pages"""
+        if self.is_blank(page):
+            return None
+
+        scale = self.scale_for(page)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        try:
+            if self.image_format == "jpeg":
+                payload = pix.tobytes("jpg", jpg_quality=self.quality)
+            elif self.image_format == "png":
+                payload = pix.tobytes("png")
+            else:
+                from PIL import Image
+                buffered = io.BytesIO()
+                image = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+                image.save(buffered, format="WEBP", quality=self.quality, method=4)
+                payload = buffered.getvalue()
+            width, height = pix.width, pix.height
+        finally:
+            pix = None  # release the MuPDF pixmap as soon as it is encoded
+
+        data = base64.b64encode(payload).decode("utf-8")
+        return EncodedPage(
+            page=page.number + 1,
+            data=data,
+            mime_type=MIME_TYPES[self.image_format],
+            width=width,
+            height=height,
+            encoded_bytes=len(data),
+            baseline_bytes=self.baseline_bytes(page),
+            baseline_estimated=not self.measure_baseline
+        )